@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+In-process batch engine for rendering many posters.
+
+Every job goes through two stages:
+1. Fetch: a small thread pool geocodes the city and downloads its map data
+   into the geodata cache. All network requests share one rate limiter.
+2. Render: a process pool of Agg workers loads the data back from the cache
+   and renders every requested theme for the city.
+
+Workers import the geospatial stack once, so a batch pays interpreter and
+import start-up per worker instead of per city.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import geodata_cache
+import poster_profile
+
+DEFAULT_TIMEOUT = 900  # seconds allowed per job and stage
+DEFAULT_IO_WORKERS = 2
+DEFAULT_REQUEST_INTERVAL = 1.0  # seconds between requests (Nominatim usage policy)
+# Errors that fail the same way on every attempt (bad place names, offline
+# cache misses, missing packages); results flag them as permanent
+PERMANENT_ERRORS = (ValueError, ImportError)
+
+class RateLimiter:
+    """
+    Spaces wait() calls at least min_interval seconds apart across threads.
+    """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+def make_job(city, country, themes, distance=29000, network='all', road_loader='osmnx', osm_source=None):
+    """
+    Describe one city to render in one or more themes.
+    network and road_loader are create_map_poster.NETWORK_MODES and
+    ROAD_LOADERS entries; osm_source is an optional local .osm.pbf extract
+    that replaces every download.
+    """
+    return {'city': city, 'country': country, 'themes': list(themes), 'distance': distance,
+            'network': network, 'road_loader': road_loader, 'osm_source': osm_source}
+
+def _new_result(job):
+    return {
+        'city': job['city'],
+        'country': job['country'],
+        'themes': job['themes'],
+        'distance': job['distance'],
+        'road_loader': job.get('road_loader', 'osmnx'),
+        'osm_source': job.get('osm_source'),
+        'exclude_highways': None,
+        'status': 'pending',
+        'point': None,
+        'pending_themes': [],
+        'render_keys': [],
+        'outputs': [],
+        'existing': [],
+        'fetch_s': 0.0,
+        'render_s': 0.0,
+        'error': None,
+        'permanent': False,
+        'profile': None,
+        'queue_id': job.get('queue_id'),
+    }
+
+def set_error(result, error):
+    """Mark result as failed (or timed out) by the exception error."""
+    result['status'] = 'timeout' if isinstance(error, TimeoutError) else 'failed'
+    result['error'] = f"{type(error).__name__}: {error}"
+    result['permanent'] = isinstance(error, PERMANENT_ERRORS)
+
+def split_existing_themes(job):
+    """
+    (pending themes, their render keys, existing poster paths) for job:
+    the themes still to render, and the posters already rendered.
+    """
+    import create_map_poster
+
+    pending, render_keys, existing = [], [], []
+    for theme_name in job['themes']:
+        render_key = create_map_poster.get_render_key(job['city'], job['country'],
+                                                      create_map_poster.load_theme(theme_name), job['distance'],
+                                                      network=job.get('network', 'all'))
+        existing_poster = create_map_poster.check_existing_poster(render_key)
+        if existing_poster:
+            existing.append(existing_poster)
+        else:
+            pending.append(theme_name)
+            render_keys.append(render_key)
+    return pending, render_keys, existing
+
+def fetch_job_data(job, limiter, cache_dir, profile=poster_profile.DISABLED, regions=None):
+    """
+    Geocode the city of job and fill the cache with its map data; returns
+    (point, exclude_highways). The data only depends on the city, distance,
+    network and loader, not on the themes. Jobs with an osm_source only
+    geocode; their map data is read from the index.
+    """
+    import create_map_poster
+
+    osm_source = job.get('osm_source')
+    road_loader = job.get('road_loader', 'osmnx')
+    index = create_map_poster.get_osm_index(osm_source, cache_dir) if osm_source else None
+    with profile.stage('geocode'):
+        point = create_map_poster.get_coordinates(job['city'], job['country'], throttle=limiter.wait,
+                                                  cache_file=os.path.join(cache_dir, "geocodes.json"),
+                                                  osm_index=index)
+    exclude_highways = create_map_poster.get_excluded_highways(job.get('network', 'all'), job['distance'])
+    if regions is not None and index is None:
+        regions.ensure(job, throttle=limiter.wait, profile=profile)
+    if index is None:
+        create_map_poster.fetch_map_data(point, job['distance'], cache_dir=cache_dir, throttle=limiter.wait,
+                                         show_progress=False, exclude_highways=exclude_highways,
+                                         road_loader=road_loader, profile=profile)
+    return point, exclude_highways
+
+def fetch_job(job, limiter, cache_dir, profile=False, regions=None):
+    """
+    Stage 1: skip themes that already exist, geocode the city and fill the
+    cache with its map data (see fetch_job_data()). Runs in the I/O thread
+    pool. With profile=True the result carries a poster_profile record of the
+    geocode and fetch stages. regions, a shared_regions.SharedRegions,
+    fills the cache for the city from a region shared with its neighbours.
+    """
+    result = _new_result(job)
+    start = time.perf_counter()
+    result['pending_themes'], result['render_keys'], result['existing'] = split_existing_themes(job)
+
+    if not result['pending_themes']:
+        result['status'] = 'skipped'
+        return result
+
+    stages = poster_profile.DISABLED
+    if profile:
+        stages = poster_profile.PosterProfile(city=job['city'], country=job['country'], distance=job['distance'],
+                                              themes=result['pending_themes'], network=job.get('network', 'all'),
+                                              road_loader=result['road_loader'])
+    result['point'], result['exclude_highways'] = fetch_job_data(job, limiter, cache_dir, stages, regions)
+    if profile:
+        result['profile'] = stages.to_dict()
+    result['fetch_s'] = round(time.perf_counter() - start, 2)
+    return result
+
+def _init_render_worker():
+    """Warm up a render process: Agg backend and the full import stack."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import create_map_poster  # noqa: F401
+    import lazy_imports
+    lazy_imports.preload_all()
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("render timed out")
+
+def render_job(city, country, point, distance, theme_names, cache_dir, timeout, thumbnails=None,
+               exclude_highways=None, road_loader='osmnx', osm_source=None, profile=False, render_keys=None,
+               data_cache=None):
+    """
+    Stage 2: render every pending theme for one city from cached data.
+    Runs in a render worker process; SIGALRM enforces the timeout.
+    thumbnails optionally lists thumbnail variants written from each render;
+    exclude_highways, road_loader and osm_source must match the ones used
+    by fetch_job(), and render_keys are its render store keys, one per
+    theme. With profile=True the result carries the render stages.
+    data_cache, a dict-like kept by a long-lived worker, holds map data
+    from earlier jobs so a city rendered again skips loading it.
+    """
+    import create_map_poster
+
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    try:
+        start = time.perf_counter()
+        stages = poster_profile.PosterProfile() if profile else poster_profile.DISABLED
+        # The fetch stages were recorded by fetch_job(); here the data only
+        # comes back from the cache (or the local extract index)
+        data_key = (tuple(point), distance, tuple(sorted(exclude_highways or ())), road_loader, osm_source)
+        data = data_cache.get(data_key) if data_cache is not None else None
+        if data is None:
+            with stages.stage('load'):
+                data = create_map_poster.fetch_map_data(point, distance, cache_dir=cache_dir, show_progress=False,
+                                                        exclude_highways=exclude_highways, road_loader=road_loader,
+                                                        osm_source=osm_source)
+            if data_cache is not None:
+                data_cache[data_key] = data
+        renders = [(create_map_poster.load_theme(theme_name),
+                    create_map_poster.generate_output_filename(city, theme_name, render_key))
+                   for theme_name, render_key in zip(theme_names, render_keys)]
+        create_map_poster.render_posters(city, country, point, data, renders, thumbnails=thumbnails,
+                                         profile=stages, render_keys=render_keys)
+        return {
+            'outputs': [output_file for _, output_file in renders],
+            'render_s': round(time.perf_counter() - start, 2),
+            'profile_stages': stages.stages,
+        }
+    finally:
+        signal.alarm(0)
+
+def run_batch(jobs, workers=None, io_workers=DEFAULT_IO_WORKERS, timeout=DEFAULT_TIMEOUT,
+              cache_dir=geodata_cache.CACHE_DIR, request_interval=DEFAULT_REQUEST_INTERVAL,
+              on_result=None, thumbnails=None, profile_file=None, regions=None):
+    """
+    Fetch and render every job, overlapping downloads with rendering.
+    jobs may be any iterable (e.g. job_queue.iter_claims()); it is read
+    only as the pools have room. Local extract indexes are built up front
+    for job lists; other iterables need theirs built by the caller.
+    workers is the number of render processes (default: CPU count).
+    on_result, if given, is called with each finished result dict.
+    thumbnails, if given, lists thumbnail variants rendered with each poster.
+    profile_file, if given, turns on per-stage profiling: every result gets
+    a 'profile' record (see poster_profile) that is also appended to
+    profile_file as a JSON line. regions, from
+    shared_regions.plan_shared_regions(), lets neighbouring cities share
+    one download.
+    Returns one result dict per job with a status of 'ok', 'skipped',
+    'failed' or 'timeout'.
+    """
+    import osmnx as ox
+
+    import create_map_poster
+
+    if not cache_dir:
+        raise ValueError("run_batch needs a cache_dir to hand map data to render workers")
+    # Build local extract indexes once, before threads and workers open them
+    if isinstance(jobs, (list, tuple)):
+        for osm_source in sorted({job['osm_source'] for job in jobs if job.get('osm_source')}):
+            create_map_poster.get_osm_index(osm_source, cache_dir)
+    ox.settings.requests_timeout = timeout
+    limiter = RateLimiter(request_interval)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = io_workers + 2 * workers  # jobs fetched ahead of the render pool
+    results = []
+
+    def finish(result):
+        if result['profile']:
+            record = result['profile']
+            peaks = [stage['peak_rss_mb'] for stage in record['stages'] if 'peak_rss_mb' in stage]
+            record.update(status=result['status'], outputs=result['outputs'],
+                          wall_s=round(result['fetch_s'] + result['render_s'], 3),
+                          peak_rss_mb=max(peaks) if peaks else None)
+            poster_profile.write_profile(record, profile_file)
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    def fail(result, error):
+        set_error(result, error)
+        finish(result)
+
+    # Spawned workers never inherit locks held by the fetch threads
+    context = multiprocessing.get_context('spawn')
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=_init_render_worker) as render_pool:
+        fetches = {}
+        renders = {}
+        pending = set()
+        job_source = iter(jobs)
+
+        def fill():
+            # Pull jobs only as the pools have room, so a queue is claimed gradually
+            while len(fetches) + len(renders) < max_in_flight:
+                job = next(job_source, None)
+                if job is None:
+                    return
+                future = io_pool.submit(fetch_job, job, limiter, cache_dir, bool(profile_file), regions)
+                fetches[future] = job
+                pending.add(future)
+
+        fill()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetches:
+                    job = fetches.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        fail(_new_result(job), e)
+                        continue
+                    if result['status'] == 'skipped':
+                        finish(result)
+                        continue
+                    render_future = render_pool.submit(
+                        render_job, result['city'], result['country'], result['point'],
+                        result['distance'], result['pending_themes'], cache_dir, timeout, thumbnails,
+                        result['exclude_highways'], result['road_loader'], result['osm_source'],
+                        bool(profile_file), result['render_keys'])
+                    renders[render_future] = result
+                    pending.add(render_future)
+                else:
+                    result = renders.pop(future)
+                    try:
+                        result.update(future.result())
+                    except Exception as e:
+                        fail(result, e)
+                        continue
+                    render_stages = result.pop('profile_stages')
+                    if result['profile']:
+                        result['profile']['stages'].extend(render_stages)
+                    result['status'] = 'ok'
+                    finish(result)
+            fill()
+
+    return results
+
+def print_summary(results):
+    """Print one row per city with its status, timings and outputs."""
+    print(f"{'City':<28} {'Status':<8} {'Fetch':>7} {'Render':>7}  Details")
+    print("─" * 80)
+    for result in sorted(results, key=lambda r: r['city']):
+        if result['error']:
+            details = result['error'][:60]
+        elif result['outputs']:
+            details = ', '.join(os.path.basename(path) for path in result['outputs'])
+        else:
+            details = ', '.join(os.path.basename(path) for path in result['existing'])
+        print(f"{result['city'][:28]:<28} {result['status']:<8} {result['fetch_s']:>6.1f}s "
+              f"{result['render_s']:>6.1f}s  {details}")
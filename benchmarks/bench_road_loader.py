@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark road loading: ox.graph_from_point vs the direct array loader.
+
+Both loaders start from the same Overpass data saved to disk, so only JSON
+parsing and graph/array building are measured, not the download. Each
+loader runs in its own subprocess so peak RSS is measured cleanly.
+Usage:
+  python benchmarks/bench_road_loader.py --synthetic 400
+  python benchmarks/bench_road_loader.py --city "Mexico City" --country Mexico
+  python benchmarks/bench_road_loader.py --city Guadalajara --pbf mexico-latest.osm.pbf
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import REPO_DIR, synthetic_overpass_response, to_geometry_response, write_pbf
+
+LOADERS = ['osmnx', 'overpass', 'pbf']
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_loader(loader, paths, point, dist):
+    """Load roads with one loader and return the measurements."""
+    import osmnx as ox
+
+    import geodata_cache
+    import osm_loader
+    import road_renderer
+
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if loader == 'osmnx':
+        with open(paths['nodes_ways'], 'r', encoding='utf-8') as f:
+            response = json.load(f)
+        # Serve the saved response instead of downloading it
+        ox._overpass._download_overpass_network = lambda *args, **kwargs: iter([response])
+        G = ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type='all')
+        del response
+        roads = road_renderer.build_road_arrays(geodata_cache.graph_to_arrays(G))
+    elif loader == 'overpass':
+        with open(paths['geometry'], 'r', encoding='utf-8') as f:
+            response = json.load(f)
+        roads = osm_loader.parse_overpass_ways(response, osm_loader.bbox_from_point(point, dist))
+    else:
+        roads = osm_loader.load_pbf_roads(paths['pbf'], point, dist)
+    load_s = time.perf_counter() - start
+
+    return {
+        'loader': loader,
+        'polylines': len(roads.offsets) - 1,
+        'vertices': len(roads.coords),
+        'load_s': round(load_s, 3),
+        'baseline_rss_mb': round(baseline_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'load_rss_mb': round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+def download_response(point, dist):
+    """Download the nodes + ways response osmnx would use for point/dist."""
+    import requests
+
+    import osm_loader
+
+    left, bottom, right, top = osm_loader.bbox_from_point(point, dist)
+    query = (f"[out:json][timeout:{osm_loader.OVERPASS_TIMEOUT}];"
+             f"(way{osm_loader.ALL_WAY_FILTER}({bottom},{left},{top},{right});>;);out;")
+    response = requests.post(osm_loader.OVERPASS_URL, data={'data': query}, timeout=osm_loader.OVERPASS_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def prepare_inputs(args, workdir):
+    """Write the loader inputs into workdir and return (paths, point, label)."""
+    if args.synthetic:
+        point = (19.4326, -99.1332)
+        response = synthetic_overpass_response(args.synthetic, center=point, dist=args.distance)
+        label = f"synthetic {args.synthetic}x{args.synthetic} grid"
+    else:
+        import create_map_poster
+        point = create_map_poster.get_coordinates(args.city, args.country)
+        if args.response:
+            with open(args.response, 'r', encoding='utf-8') as f:
+                response = json.load(f)
+        else:
+            response = download_response(point, args.distance)
+        label = f"{args.city}, {args.country} ({args.distance} m)"
+
+    paths = {
+        'nodes_ways': os.path.join(workdir, 'nodes_ways.json'),
+        'geometry': os.path.join(workdir, 'geometry.json'),
+        'pbf': args.pbf or os.path.join(workdir, 'roads.osm.pbf'),
+    }
+    with open(paths['nodes_ways'], 'w', encoding='utf-8') as f:
+        json.dump(response, f)
+    with open(paths['geometry'], 'w', encoding='utf-8') as f:
+        json.dump(to_geometry_response(response), f)
+    if not args.pbf:
+        try:
+            write_pbf(response, paths['pbf'])
+        except ImportError:
+            paths['pbf'] = None
+    return paths, point, label
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark road loading against ox.graph_from_point")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--synthetic', type=int, help='Side length of a synthetic street grid')
+    source.add_argument('--city', type=str, help='City to benchmark (downloaded once from Overpass)')
+    parser.add_argument('--country', type=str, default='Mexico', help='Country of --city (default: Mexico)')
+    parser.add_argument('--distance', type=int, default=29000, help='Map radius in meters (default: 29000)')
+    parser.add_argument('--response', type=str, help='Saved Overpass nodes + ways JSON to use for --city')
+    parser.add_argument('--pbf', type=str, help='.osm.pbf extract for the pbf loader (default: built from the data)')
+    parser.add_argument('--loaders', type=str, default=','.join(LOADERS),
+                        help='Comma-separated loaders to run')
+    parser.add_argument('--json', type=str, help='Also write results to this JSON file')
+    parser.add_argument('--run', choices=LOADERS, help=argparse.SUPPRESS)
+    parser.add_argument('--paths', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--point', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        point = tuple(float(value) for value in args.point.split(','))
+        print(json.dumps(run_loader(args.run, json.loads(args.paths), point, args.distance)))
+        return
+    if not args.synthetic and not args.city:
+        parser.error("one of --synthetic or --city is required")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, point, label = prepare_inputs(args, workdir)
+        print(f"🏁 Road loader benchmark: {label}")
+        for loader in args.loaders.split(','):
+            if loader == 'pbf' and not paths['pbf']:
+                print(f"  {loader:<10} skipped (pip install osmium)")
+                continue
+            cmd = [sys.executable, os.path.abspath(__file__), '--run', loader,
+                   '--paths', json.dumps(paths), '--point', f"{point[0]},{point[1]}",
+                   '--distance', str(args.distance)]
+            completed = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=REPO_DIR)
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result['source'] = label
+            results.append(result)
+            print(f"  {loader:<10} {result['polylines']:>9} lines {result['vertices']:>10} vertices  "
+                  f"load {result['load_s']:>7.2f}s  peak RSS {result['peak_rss_mb']:>8.1f} MB "
+                  f"(+{result['load_rss_mb']:.1f} MB)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
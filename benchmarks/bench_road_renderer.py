@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark road drawing: ox.plot_graph vs the packed LineCollection renderer.
+
+Each renderer runs in its own subprocess so peak RSS is measured cleanly.
+Usage:
+  python benchmarks/bench_road_renderer.py --synthetic 400
+  python benchmarks/bench_road_renderer.py --city "Mexico City" --country Mexico
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import REPO_DIR, load_graph_arrays_file, save_graph_arrays, synthetic_graph_arrays
+
+RENDERERS = ['osmnx', 'linecollection']
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_renderer(renderer, arrays_path, output_file, dpi):
+    """Render one poster-sized road layer and return the measurements."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    import create_map_poster
+    import geodata_cache
+    import road_renderer
+
+    graph_arrays = load_graph_arrays_file(arrays_path)
+    theme = create_map_poster.load_theme('noir')
+    create_map_poster.THEME = theme
+    if renderer == 'osmnx':
+        G = geodata_cache.arrays_to_graph(graph_arrays)
+        del graph_arrays
+    baseline_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(12, 16), facecolor=theme['bg'])
+    ax.set_facecolor(theme['bg'])
+    ax.set_position([0, 0, 1, 1])
+    if renderer == 'osmnx':
+        import numpy as np
+        import osmnx as ox
+        road_classes = create_map_poster.classify_roads(G)
+        ox.plot_graph(
+            G, ax=ax, bgcolor=theme['bg'], node_size=0,
+            edge_color=create_map_poster.get_road_palette(theme)[road_classes],
+            edge_linewidth=np.asarray(create_map_poster.ROAD_CLASS_WIDTHS)[road_classes].tolist(),
+            show=False, close=False
+        )
+        edges = G.number_of_edges()
+    else:
+        roads = road_renderer.build_road_arrays(graph_arrays)
+        road_classes = create_map_poster.classify_highways(roads.highways)
+        road_renderer.draw_roads(ax, roads, road_classes, create_map_poster.get_road_palette(theme),
+                                 create_map_poster.ROAD_CLASS_WIDTHS)
+        road_renderer.configure_axes(ax, road_renderer.get_road_bounds(roads))
+        edges = len(roads.offsets) - 1
+    draw_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fig.savefig(output_file, dpi=dpi, facecolor=theme['bg'])
+    plt.close(fig)
+    save_s = time.perf_counter() - start
+
+    return {
+        'renderer': renderer,
+        'edges': edges,
+        'draw_s': round(draw_s, 3),
+        'save_s': round(save_s, 3),
+        'total_s': round(draw_s + save_s, 3),
+        'baseline_rss_mb': round(baseline_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'render_rss_mb': round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+def prepare_arrays(args, workdir):
+    """Write the graph arrays to benchmark into workdir and return the path."""
+    path = os.path.join(workdir, 'graph.npz')
+    if args.synthetic:
+        save_graph_arrays(synthetic_graph_arrays(args.synthetic), path)
+        return path, f"synthetic {args.synthetic}x{args.synthetic} grid"
+
+    import create_map_poster
+    point = create_map_poster.get_coordinates(args.city, args.country)
+    save_graph_arrays(create_map_poster.fetch_graph_arrays(point, args.distance, cache_dir=args.cache_dir), path)
+    return path, f"{args.city}, {args.country} ({args.distance} m)"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark road drawing against ox.plot_graph")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--synthetic', type=int, help='Side length of a synthetic street grid')
+    source.add_argument('--city', type=str, help='City to benchmark (fetched once, then cached)')
+    parser.add_argument('--country', type=str, default='Mexico', help='Country of --city (default: Mexico)')
+    parser.add_argument('--distance', type=int, default=29000, help='Map radius in meters (default: 29000)')
+    parser.add_argument('--cache-dir', type=str, default=os.path.join(REPO_DIR, 'cache'),
+                        help='Map data cache directory')
+    parser.add_argument('--dpi', type=int, default=300, help='Output DPI (default: 300)')
+    parser.add_argument('--renderers', type=str, default=','.join(RENDERERS),
+                        help='Comma-separated renderers to run')
+    parser.add_argument('--json', type=str, help='Also write results to this JSON file')
+    parser.add_argument('--run', choices=RENDERERS, help=argparse.SUPPRESS)
+    parser.add_argument('--arrays', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--output', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_renderer(args.run, args.arrays, args.output, args.dpi)))
+        return
+    if not args.synthetic and not args.city:
+        parser.error("one of --synthetic or --city is required")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        arrays_path, label = prepare_arrays(args, workdir)
+        print(f"🏁 Road renderer benchmark: {label} @ {args.dpi} dpi")
+        for renderer in args.renderers.split(','):
+            cmd = [sys.executable, os.path.abspath(__file__), '--run', renderer,
+                   '--arrays', arrays_path, '--dpi', str(args.dpi),
+                   '--output', os.path.join(workdir, f"{renderer}.png")]
+            completed = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=REPO_DIR)
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result['source'] = label
+            results.append(result)
+            print(f"  {renderer:<15} {result['edges']:>9} edges  draw {result['draw_s']:>7.2f}s  "
+                  f"save {result['save_s']:>7.2f}s  peak RSS {result['peak_rss_mb']:>8.1f} MB "
+                  f"(+{result['render_rss_mb']:.1f} MB)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark CLI start-up: how long create_map_poster.py takes on paths that
+never render (listing themes, skipping an existing poster, a bad argument)
+compared with importing the full render stack.
+
+Every case runs as a fresh interpreter in a scratch directory holding the
+themes and one existing poster; the median of --repeat runs is reported.
+Usage:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --repeat 10 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import REPO_DIR
+
+SCRIPT = os.path.join(REPO_DIR, 'create_map_poster.py')
+
+# name -> (command arguments after the interpreter, expected exit code)
+CASES = {
+    'interpreter': (['-c', 'pass'], 0),
+    'import': (['-c', 'import create_map_poster'], 0),
+    'list-themes': ([SCRIPT, '--list-themes'], 0),
+    'existing-poster': ([SCRIPT, '-c', 'Bench City', '-C', 'Nowhere', '-t', 'noir'], 0),
+    'bad-theme': ([SCRIPT, '-c', 'Bench City', '-C', 'Nowhere', '-t', 'no_such_theme'], 1),
+    'render-stack': (['-c', 'import create_map_poster, lazy_imports; lazy_imports.preload_all()'], 0),
+}
+
+def prepare_workdir(workdir):
+    """Themes plus an existing noir poster for 'Bench City', recorded in the render store."""
+    import create_map_poster
+    import render_store
+
+    os.symlink(os.path.join(REPO_DIR, 'themes'), os.path.join(workdir, 'themes'))
+    with open(os.path.join(REPO_DIR, 'themes', 'noir.json'), encoding='utf-8') as f:
+        theme = json.load(f)
+    key = create_map_poster.get_render_key('Bench City', 'Nowhere', theme, 29000)
+    poster = os.path.join(workdir, 'posters', f"bench_city_noir_{key[:render_store.KEY_LENGTH]}.png")
+    os.makedirs(os.path.dirname(poster))
+    open(poster, 'wb').close()
+    render_store.record_render(key, poster, 'Bench City', 'Nowhere', 'noir',
+                               store_file=os.path.join(workdir, 'posters', render_store.RENDER_STORE_NAME))
+
+def time_case(args, expected, workdir, repeat):
+    """Wall times in ms of repeat runs of the interpreter with args."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable] + args, cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+        if completed.returncode != expected:
+            raise RuntimeError(f"{' '.join(args)} exited with {completed.returncode}:\n{completed.stderr}")
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark create_map_poster.py start-up paths")
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the median is reported (default: 5)')
+    parser.add_argument('--cases', type=str, default=','.join(CASES),
+                        help=f"Comma-separated cases (default: {','.join(CASES)})")
+    parser.add_argument('--json', type=str, help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        print(f"🏁 Start-up benchmark (median of {args.repeat} runs)")
+        for name in args.cases.split(','):
+            case_args, expected = CASES[name]
+            times = time_case(case_args, expected, workdir, args.repeat)
+            result = {
+                'case': name,
+                'median_ms': round(statistics.median(times), 1),
+                'min_ms': round(min(times), 1),
+                'max_ms': round(max(times), 1),
+            }
+            results.append(result)
+            print(f"  {name:<16} {result['median_ms']:>8.1f} ms  (min {result['min_ms']:.1f}, "
+                  f"max {result['max_ms']:.1f})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
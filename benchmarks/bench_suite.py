@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Reproducible offline benchmark suite.
+
+render:  times every stage of a poster render (road classification,
+         polygon plotting, road drawing, gradients, text, rasterizing and
+         saving) on stored fixtures: synthetic small/medium/metro maps,
+         synthetic street grids of increasing size, and real cities
+         captured once with --capture.
+gallery: times generate_posters_list() and generate_thumbnails() on a
+         synthetic gallery of --gallery-size posters, cold and warm.
+
+Each case runs in its own subprocess so peak RSS is measured cleanly.
+Results are written as JSON together with the commit they were measured
+on; --compare prints the change against an earlier results file.
+Usage:
+  python benchmarks/bench_suite.py --json bench-results.json
+  python benchmarks/bench_suite.py --suites render --fixtures metro,grid200,grid400 --repeat 3
+  python benchmarks/bench_suite.py --capture cdmx --city "Mexico City" --country Mexico
+  python benchmarks/bench_suite.py --compare bench-results.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fixtures import REPO_DIR, load_fixture, save_fixture
+
+SUITES = ['render', 'gallery']
+DEFAULT_FIXTURES = ['small', 'medium', 'metro', 'grid100', 'grid200', 'grid400']
+RENDER_STAGES = ['draw.classify', 'draw.polygons', 'draw.roads', 'draw.gradients', 'draw.text',
+                 'rasterize', 'savefig']
+DEFAULT_GALLERY_SIZE = 1000
+DEFAULT_GALLERY_POSTER = (600, 800)  # scaled down from 3600x4800 to keep the suite quick
+GALLERY_THEMES = ['noir', 'neon_cyberpunk', 'ocean', 'sunset', 'blueprint', 'warm_beige', 'forest', 'pastel_dream']
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_render(fixture, dpi, output_file):
+    """Render one fixture with the noir theme and return its stage times."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    import create_map_poster
+    import poster_profile
+
+    meta, data = load_fixture(fixture)
+    theme = create_map_poster.load_theme('noir')
+    create_map_poster.THEME = theme
+    profile = poster_profile.PosterProfile()
+    baseline_rss = peak_rss_mb()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        with profile.stage('draw'):
+            fig, _ = create_map_poster.draw_poster('Benchmark', 'Fixture', tuple(meta['point']), data,
+                                                   dpi=dpi, profile=profile)
+        # savefig rasterizes again; rasterize alone separates drawing from PNG encoding
+        fig.set_dpi(dpi)
+        with profile.stage('rasterize'):
+            fig.canvas.draw()
+        with profile.stage('savefig') as counts:
+            fig.savefig(output_file, dpi=dpi, facecolor=theme['bg'])
+            counts['bytes'] = os.path.getsize(output_file)
+        plt.close(fig)
+
+    roads = data['roads']
+    stages = poster_profile.stage_totals(profile.to_dict())
+    return {
+        'suite': 'render',
+        'case': fixture,
+        'dpi': dpi,
+        'polylines': len(roads.offsets) - 1,
+        'segments': len(roads.coords) - (len(roads.offsets) - 1),
+        'polygons': sum(len(data[layer]) for layer in ('water', 'parks') if data[layer] is not None),
+        'stages': {name: round(stages.get(name, 0.0), 3) for name in ['draw'] + RENDER_STAGES},
+        'total_s': round(stages['draw'] + stages['savefig'], 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'render_rss_mb': round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+def make_gallery(gallery_dir, size, poster_size, seed=0):
+    """
+    Fill gallery_dir/posters with size synthetic posters named like real
+    ones. A few distinct images are drawn and copied, so building the
+    gallery stays cheap while every file still has to be read and decoded.
+    """
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    posters_dir = os.path.join(gallery_dir, 'posters')
+    os.makedirs(posters_dir)
+    os.symlink(os.path.join(REPO_DIR, 'themes'), os.path.join(gallery_dir, 'themes'))
+
+    rng = np.random.default_rng(seed)
+    width, height = poster_size
+    templates = []
+    for index, theme in enumerate(GALLERY_THEMES):
+        image = Image.new('RGB', poster_size, tuple(int(v) for v in rng.integers(0, 60, 3)))
+        draw = ImageDraw.Draw(image)
+        color = tuple(int(v) for v in rng.integers(120, 256, 3))
+        for _ in range(400):
+            x, y = rng.integers(0, width), rng.integers(0, height)
+            if rng.random() < 0.5:
+                draw.line([(x, y), (x + rng.integers(-width // 4, width // 4), y)], fill=color, width=1)
+            else:
+                draw.line([(x, y), (x, y + rng.integers(-height // 4, height // 4))], fill=color, width=1)
+        path = os.path.join(gallery_dir, f"template_{index}.png")
+        image.save(path)
+        templates.append((theme, path))
+
+    for index in range(size):
+        theme, template = templates[index % len(templates)]
+        filename = f"city_{index:04d}_{theme}_20260101_{index // 60 % 24:02d}{index % 60:02d}00.png"
+        shutil.copyfile(template, os.path.join(posters_dir, filename))
+    return posters_dir
+
+def run_gallery(gallery_dir, workers):
+    """Time gallery list and thumbnail generation in gallery_dir, cold then warm."""
+    os.chdir(gallery_dir)
+    import generate_gallery_list
+    import generate_thumbnails
+
+    timings = {}
+
+    def timed(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            function(*args, **kwargs)
+        timings[name] = round(time.perf_counter() - start, 3)
+
+    timed('posters_list.cold', generate_gallery_list.generate_posters_list)
+    timed('posters_list.warm', generate_gallery_list.generate_posters_list)
+    timed('thumbnails.cold', generate_thumbnails.generate_thumbnails, workers=workers)
+    timed('thumbnails.warm', generate_thumbnails.generate_thumbnails, workers=workers)
+    timed('thumbnails.manifest', generate_thumbnails.update_posters_json_with_thumbnails)
+
+    posters = os.listdir('posters')
+    return {
+        'suite': 'gallery',
+        'case': f"{len([name for name in posters if name.endswith('.png')])} posters",
+        'workers': workers,
+        'stages': timings,
+        'total_s': round(sum(timings.values()), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+def run_case(args_list):
+    """Run one case in a subprocess and return its result dict."""
+    cmd = [sys.executable, os.path.abspath(__file__)] + args_list
+    completed = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=REPO_DIR)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def best_of(runs):
+    """Combine repeated runs: the minimum of every timing, the last run's counts."""
+    result = dict(runs[-1])
+    result['stages'] = {name: min(run['stages'][name] for run in runs) for name in result['stages']}
+    result['total_s'] = min(run['total_s'] for run in runs)
+    result['repeat'] = len(runs)
+    return result
+
+def environment():
+    """Commit and machine the results were measured on."""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], check=True, capture_output=True, text=True,
+                                  cwd=REPO_DIR).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def print_result(result):
+    stages = '  '.join(f"{name.replace('draw.', '')} {seconds:.2f}s" for name, seconds in result['stages'].items()
+                       if name != 'draw')
+    print(f"  {result['case']:<12} total {result['total_s']:>7.2f}s  peak RSS {result['peak_rss_mb']:>7.0f} MB  {stages}")
+
+def compare(results, baseline_file):
+    """Print every timing next to the same timing in baseline_file."""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['suite'], r['case']): r for r in baseline['results']}
+    print(f"\n📈 Compared with {(baseline['environment'].get('commit') or '?')[:10]} ({baseline_file})")
+    for result in results:
+        previous = old.get((result['suite'], result['case']))
+        if not previous:
+            continue
+        for name in ['total_s'] + list(result['stages']):
+            now = result['total_s'] if name == 'total_s' else result['stages'][name]
+            then = previous['total_s'] if name == 'total_s' else previous['stages'].get(name)
+            if then:
+                change = (now - then) / then * 100
+                flag = '  ⚠️' if change > 10 and now - then > 0.05 else ''
+                print(f"  {result['suite']:<8} {result['case']:<12} {name:<22} {then:>8.2f}s → {now:>8.2f}s "
+                      f"({change:+.0f}%){flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for rendering and gallery generation")
+    parser.add_argument('--suites', type=str, default=','.join(SUITES), help='Comma-separated suites to run')
+    parser.add_argument('--fixtures', type=str, default=','.join(DEFAULT_FIXTURES),
+                        help=f"Render fixtures: {', '.join(DEFAULT_FIXTURES)}, grid<N> or a captured name")
+    parser.add_argument('--dpi', type=int, default=300, help='Render DPI (default: 300)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is reported')
+    parser.add_argument('--gallery-size', type=int, default=DEFAULT_GALLERY_SIZE,
+                        help=f'Posters in the synthetic gallery (default: {DEFAULT_GALLERY_SIZE})')
+    parser.add_argument('--gallery-poster', type=str, default='x'.join(map(str, DEFAULT_GALLERY_POSTER)),
+                        help='Synthetic poster size as WIDTHxHEIGHT (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='Thumbnail workers (default: CPU count)')
+    parser.add_argument('--json', type=str, help='Write results to this JSON file')
+    parser.add_argument('--compare', type=str, help='Compare against an earlier --json results file')
+    parser.add_argument('--capture', type=str, metavar='NAME',
+                        help='Store --city from the map data cache as render fixture NAME and exit')
+    parser.add_argument('--city', type=str, help='City to capture')
+    parser.add_argument('--country', type=str, default='Mexico', help='Country of --city (default: Mexico)')
+    parser.add_argument('--distance', type=int, default=29000, help='Map radius to capture (default: 29000)')
+    parser.add_argument('--run-render', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--run-gallery', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--output', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_render:
+        print(json.dumps(run_render(args.run_render, args.dpi, args.output)))
+        return
+    if args.run_gallery:
+        print(json.dumps(run_gallery(args.run_gallery, args.workers)))
+        return
+    if args.capture:
+        if not args.city:
+            parser.error("--capture needs --city")
+        import create_map_poster
+        point = create_map_poster.get_coordinates(args.city, args.country)
+        data = create_map_poster.fetch_map_data(point, args.distance)
+        save_fixture(args.capture, point, args.distance, data)
+        print(f"✓ Stored fixture '{args.capture}' ({args.city}, {args.distance} m)")
+        return
+
+    suites = [name.strip() for name in args.suites.split(',') if name.strip()]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        if 'render' in suites:
+            print(f"🏁 Render stages @ {args.dpi} dpi")
+            for fixture in [name.strip() for name in args.fixtures.split(',') if name.strip()]:
+                runs = [run_case(['--run-render', fixture, '--dpi', str(args.dpi),
+                                  '--output', os.path.join(workdir, f"{fixture}.png")])
+                        for _ in range(args.repeat)]
+                results.append(best_of(runs))
+                print_result(results[-1])
+
+        if 'gallery' in suites:
+            poster_size = tuple(int(value) for value in args.gallery_poster.lower().split('x'))
+            print(f"🏁 Gallery: {args.gallery_size} posters of {poster_size[0]}x{poster_size[1]}")
+            runs = []
+            for attempt in range(args.repeat):
+                gallery_dir = os.path.join(workdir, f"gallery{attempt}")
+                make_gallery(gallery_dir, args.gallery_size, poster_size)
+                worker_args = ['--workers', str(args.workers)] if args.workers else []
+                runs.append(run_case(['--run-gallery', gallery_dir] + worker_args))
+                shutil.rmtree(gallery_dir)
+            results.append(best_of(runs))
+            print_result(results[-1])
+
+    report = {'environment': environment(), 'results': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Regression check for tiled rendering: tiled_render.save_tiled() must write
+exactly the pixels that a single-buffer savefig() of the same figure does.
+
+A synthetic fixture is drawn as a full poster and saved tiled with band
+heights that cut through thick roads, the fades and the text, then compared
+with fig.savefig() pixel by pixel. Exits non-zero on any difference.
+Usage:
+  python benchmarks/check_tiled_render.py
+  python benchmarks/check_tiled_render.py --fixture medium --cases 300:0,300:37
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+from fixtures import REPO_DIR, load_fixture
+
+# dpi:band rows (0 = tiled_render.BAND_BUFFER_BYTES)
+DEFAULT_CASES = '100:50,100:104,100:333,300:0'
+
+def compare_case(fig, layers, dpi, band_rows, workdir):
+    """Save fig tiled and in one buffer at dpi; returns (differing pixels, rows that differ)."""
+    import numpy as np
+    from PIL import Image
+
+    import create_map_poster
+    import tiled_render
+
+    bg = create_map_poster.THEME['bg']
+    full_file = os.path.join(workdir, f"full_{dpi}.png")
+    tiled_file = os.path.join(workdir, f"tiled_{dpi}_{band_rows}.png")
+    width = int(fig.get_size_inches()[0] * dpi)
+    band_bytes = band_rows * width * 4 if band_rows else tiled_render.BAND_BUFFER_BYTES
+    collections = layers['water'] + layers['parks'] + [c for c in layers['roads'] if c is not None]
+    # Tiled first, as in render_posters(), so nothing is laid out by a full draw beforehand
+    tiled_render.save_tiled(fig, layers['ax'], collections, tiled_file, dpi, bg, band_bytes=band_bytes)
+    if not os.path.exists(full_file):
+        fig.savefig(full_file, dpi=dpi, facecolor=bg)
+
+    with Image.open(full_file) as full, Image.open(tiled_file) as tiled:
+        if full.size != tiled.size:
+            raise AssertionError(f"tiled size {tiled.size} != savefig size {full.size}")
+        different = np.any(np.asarray(full.convert('RGBA')) != np.asarray(tiled.convert('RGBA')), axis=2)
+    return int(different.sum()), np.flatnonzero(different.any(axis=1))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that tiled rendering matches savefig pixel for pixel")
+    parser.add_argument('--fixture', type=str, default='small', help='Render fixture (default: small)')
+    parser.add_argument('--theme', type=str, default='noir', help='Theme (default: noir)')
+    parser.add_argument('--cases', type=str, default=DEFAULT_CASES,
+                        help=f'Comma-separated dpi:band_rows cases (default: {DEFAULT_CASES})')
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(REPO_DIR)
+    import create_map_poster
+
+    meta, data = load_fixture(args.fixture)
+    create_map_poster.THEME = create_map_poster.load_theme(args.theme)
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        with contextlib.redirect_stdout(sys.stderr):
+            fig, layers = create_map_poster.draw_poster('Tiled', 'Check', tuple(meta['point']), data)
+        print(f"🧱 Tiled render check: {args.fixture} fixture, {args.theme} theme")
+        for case in args.cases.split(','):
+            dpi, band_rows = (int(value) for value in case.split(':'))
+            pixels, rows = compare_case(fig, layers, dpi, band_rows, workdir)
+            label = f"{dpi} dpi, {band_rows or 'default'} row bands"
+            if pixels:
+                failures += 1
+                print(f"  ❌ {label:<28} {pixels} pixels differ in {len(rows)} rows (first: {rows[:8].tolist()})")
+            else:
+                print(f"  ✅ {label:<28} identical")
+        plt.close(fig)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Offline fixtures for the benchmark scripts.
+
+Synthetic street grids are built directly in the geodata_cache array format,
+so benchmarks can run without network access and at any size.
+
+Render fixtures (roads, water and parks for one map) live in
+benchmarks/data/<name>/. The synthetic ones below are generated on first
+use; real cities can be captured once from the map data cache with
+bench_suite.py --capture.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+FIXTURES_DIR = os.path.join(REPO_DIR, 'benchmarks', 'data')
+FIXTURE_CENTER = (19.4326, -99.1332)
+
+# Synthetic render fixtures: street grid side, map radius and polygon counts
+SYNTHETIC_FIXTURES = {
+    'small': {'grid': 60, 'dist': 4000, 'water': 20, 'parks': 150},
+    'medium': {'grid': 150, 'dist': 10000, 'water': 80, 'parks': 600},
+    'metro': {'grid': 400, 'dist': 29000, 'water': 300, 'parks': 2500},
+}
+
+# Roughly the highway mix of a large Mexican city graph (network_type='all')
+SYNTHETIC_HIGHWAY_MIX = {
+    'residential': 0.55,
+    'service': 0.15,
+    'footway': 0.08,
+    'tertiary': 0.07,
+    'unclassified': 0.05,
+    'secondary': 0.05,
+    'primary': 0.03,
+    'trunk': 0.01,
+    'motorway': 0.01,
+}
+
+def synthetic_graph_arrays(n, center=(19.4326, -99.1332), dist=29000, seed=0):
+    """
+    Build an n x n street grid around center as geodata_cache graph arrays.
+    Every street is two-way (two directed edges) and a third of the edges get
+    a bent three-vertex geometry, like simplified OSM edges.
+    """
+    rng = np.random.default_rng(seed)
+    lat, lon = center
+    half_lat = dist / 111320
+    half_lon = dist / (111320 * np.cos(np.deg2rad(lat)))
+
+    xs = np.linspace(lon - half_lon, lon + half_lon, n)
+    ys = np.linspace(lat - half_lat, lat + half_lat, n)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    node_ids = np.arange(n * n, dtype=np.int64)
+
+    ids = node_ids.reshape(n, n)
+    horizontal = np.column_stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()])
+    vertical = np.column_stack([ids[:-1, :].ravel(), ids[1:, :].ravel()])
+    streets = np.concatenate([horizontal, vertical])
+    edge_u = np.concatenate([streets[:, 0], streets[:, 1]])
+    edge_v = np.concatenate([streets[:, 1], streets[:, 0]])
+    n_edges = len(edge_u)
+
+    tags = list(SYNTHETIC_HIGHWAY_MIX)
+    weights = np.array(list(SYNTHETIC_HIGHWAY_MIX.values()))
+    street_highways = rng.choice(tags, size=len(streets), p=weights / weights.sum())
+    edge_highway = np.concatenate([street_highways, street_highways])
+
+    node_x = grid_x.ravel()
+    node_y = grid_y.ravel()
+    has_geometry = rng.random(n_edges) < 1 / 3
+    bend = (xs[1] - xs[0]) / 5 if n > 1 else 0.0
+    u_xy = np.column_stack([node_x[edge_u], node_y[edge_u]])
+    v_xy = np.column_stack([node_x[edge_v], node_y[edge_v]])
+    mid_xy = (u_xy + v_xy) / 2 + [bend, 0.0]
+    edge_coords = np.stack([u_xy, mid_xy, v_xy], axis=1)[has_geometry].reshape(-1, 2)
+    edge_offsets = np.zeros(n_edges + 1, dtype=np.int64)
+    np.cumsum(np.where(has_geometry, 3, 0), out=edge_offsets[1:])
+
+    return {
+        'crs': np.array('epsg:4326'),
+        'node_ids': node_ids,
+        'node_x': node_x,
+        'node_y': node_y,
+        'edge_u': edge_u,
+        'edge_v': edge_v,
+        'edge_key': np.zeros(n_edges, dtype=np.int64),
+        'edge_highway': edge_highway.astype(str),
+        'edge_offsets': edge_offsets,
+        'edge_coords': edge_coords,
+    }
+
+def save_graph_arrays(arrays, path):
+    """Write graph arrays to an .npz file readable by load_graph_arrays_file()."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+def load_graph_arrays_file(path):
+    """Read graph arrays written by save_graph_arrays() or geodata_cache."""
+    with np.load(path, allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+def synthetic_overpass_response(n, center=(19.4326, -99.1332), dist=29000, seed=0, way_length=4):
+    """
+    Build an Overpass JSON response (nodes + ways, the format osmnx requests)
+    for an n x n street grid around center. Every grid row and column is
+    split into ways of way_length segments with a random highway tag.
+    """
+    rng = np.random.default_rng(seed)
+    lat, lon = center
+    half_lat = dist / 111320
+    half_lon = dist / (111320 * np.cos(np.deg2rad(lat)))
+    xs = np.linspace(lon - half_lon, lon + half_lon, n)
+    ys = np.linspace(lat - half_lat, lat + half_lat, n)
+    ids = np.arange(1, n * n + 1, dtype=np.int64).reshape(n, n)
+
+    elements = [{'type': 'node', 'id': int(ids[row, col]), 'lat': float(ys[row]), 'lon': float(xs[col])}
+                for row in range(n) for col in range(n)]
+
+    tags = list(SYNTHETIC_HIGHWAY_MIX)
+    weights = np.array(list(SYNTHETIC_HIGHWAY_MIX.values()))
+    lines = [ids[row, :] for row in range(n)] + [ids[:, col] for col in range(n)]
+    way_id = 1
+    for line in lines:
+        for start in range(0, n - 1, way_length):
+            elements.append({
+                'type': 'way',
+                'id': way_id,
+                'nodes': [int(node_id) for node_id in line[start:start + way_length + 1]],
+                'tags': {'highway': str(rng.choice(tags, p=weights / weights.sum()))},
+            })
+            way_id += 1
+    return {'version': 0.6, 'elements': elements}
+
+def to_geometry_response(response):
+    """Rewrite a nodes + ways response as an "out geom" response (ways only)."""
+    nodes = {element['id']: element for element in response['elements'] if element['type'] == 'node'}
+    ways = []
+    for element in response['elements']:
+        if element['type'] != 'way':
+            continue
+        way = {key: value for key, value in element.items() if key != 'nodes'}
+        way['geometry'] = [{'lat': nodes[ref]['lat'], 'lon': nodes[ref]['lon']}
+                           for ref in element['nodes'] if ref in nodes]
+        ways.append(way)
+    return {'version': response.get('version', 0.6), 'elements': ways}
+
+def write_pbf(response, path):
+    """Write a nodes + ways response to an .osm.pbf file (needs osmium)."""
+    import osmium
+
+    if os.path.exists(path):
+        os.remove(path)
+    writer = osmium.SimpleWriter(path)
+    try:
+        for element in response['elements']:
+            if element['type'] == 'node':
+                writer.add_node(osmium.osm.mutable.Node(id=element['id'],
+                                                        location=(element['lon'], element['lat'])))
+        for element in response['elements']:
+            if element['type'] == 'way':
+                writer.add_way(osmium.osm.mutable.Way(id=element['id'], nodes=element['nodes'],
+                                                      tags=element.get('tags', {})))
+    finally:
+        writer.close()
+
+def synthetic_polygons(count, center=FIXTURE_CENTER, dist=29000, seed=0, max_radius=0.03):
+    """
+    Scatter count irregular polygons (buffered random walks) over the bbox
+    around center. max_radius is a fraction of dist.
+    """
+    import geopandas as gpd
+    import shapely
+
+    rng = np.random.default_rng(seed)
+    lat, lon = center
+    half_lat = dist / 111320
+    half_lon = dist / (111320 * np.cos(np.deg2rad(lat)))
+    centers = rng.uniform([lon - half_lon, lat - half_lat], [lon + half_lon, lat + half_lat], size=(count, 2))
+    radii = rng.uniform(0.1, 1.0, size=count) * max_radius * half_lat
+    polygons = []
+    for (x, y), radius in zip(centers, radii):
+        walk = np.cumsum(rng.normal(scale=radius, size=(8, 2)), axis=0) + [x, y]
+        polygons.append(shapely.LineString(walk).buffer(radius, quad_segs=8))
+    return gpd.GeoDataFrame(geometry=polygons, crs='epsg:4326')
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+def save_fixture(name, point, dist, data):
+    """Store map data ({'roads', 'water', 'parks'}) as render fixture name."""
+    path = fixture_path(name)
+    os.makedirs(path, exist_ok=True)
+    roads = data['roads']
+    with open(os.path.join(path, 'roads.npz'), 'wb') as f:
+        np.savez(f, coords=roads.coords, offsets=roads.offsets, highways=np.asarray(roads.highways, dtype=str))
+    for layer in ('water', 'parks'):
+        features = data[layer]
+        if features is not None:
+            features[[features.geometry.name]].to_parquet(os.path.join(path, f"{layer}.parquet"))
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'point': list(point), 'dist': dist}, f)
+
+def build_synthetic_fixture(name):
+    """
+    Generate a named synthetic fixture: one of SYNTHETIC_FIXTURES, or
+    'grid<N>' for an N x N street grid at metro scale without polygons.
+    """
+    import road_renderer
+
+    if name.startswith('grid') and name[4:].isdigit():
+        spec = {'grid': int(name[4:]), 'dist': 29000, 'water': 0, 'parks': 0}
+    elif name in SYNTHETIC_FIXTURES:
+        spec = SYNTHETIC_FIXTURES[name]
+    else:
+        raise ValueError(f"No fixture '{name}' in {FIXTURES_DIR} and no synthetic recipe for it")
+    roads = road_renderer.build_road_arrays(synthetic_graph_arrays(spec['grid'], FIXTURE_CENTER, spec['dist']))
+    data = {
+        'roads': roads,
+        'water': synthetic_polygons(spec['water'], FIXTURE_CENTER, spec['dist'], seed=1, max_radius=0.06),
+        'parks': synthetic_polygons(spec['parks'], FIXTURE_CENTER, spec['dist'], seed=2),
+    }
+    save_fixture(name, FIXTURE_CENTER, spec['dist'], data)
+
+def load_fixture(name):
+    """
+    Return (meta, data) for render fixture name, generating synthetic
+    fixtures on first use. data is the dict fetch_map_data() returns.
+    """
+    import geopandas as gpd
+
+    import road_renderer
+
+    path = fixture_path(name)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        build_synthetic_fixture(name)
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with np.load(os.path.join(path, 'roads.npz'), allow_pickle=False) as npz:
+        data = {'roads': road_renderer.RoadArrays(npz['coords'], npz['offsets'], npz['highways'])}
+    for layer in ('water', 'parks'):
+        layer_path = os.path.join(path, f"{layer}.parquet")
+        data[layer] = gpd.read_parquet(layer_path) if os.path.exists(layer_path) else None
+    return meta, data
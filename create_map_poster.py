@@ -1,19 +1,51 @@
-import osmnx as ox
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-import matplotlib.colors as mcolors
-import numpy as np
-from geopy.geocoders import Nominatim
-from tqdm import tqdm
 import time
+import io
 import json
+import math
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import argparse
 
+import generate_thumbnails
+import geocode_cache
+import geodata_cache
+import poster_manifest
+import poster_profile
+import render_store
+from lazy_imports import lazy_import
+
+# The geospatial and plotting stack loads on first use, so --list-themes,
+# skipped posters and argument errors return without importing it
+ox = lazy_import('osmnx')
+ox_errors = lazy_import('osmnx._errors')
+gpd = lazy_import('geopandas')
+plt = lazy_import('matplotlib.pyplot')
+mcolors = lazy_import('matplotlib.colors')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+shapely = lazy_import('shapely')
+Image = lazy_import('PIL.Image')
+osm_index = lazy_import('osm_index')
+osm_loader = lazy_import('osm_loader')
+polygon_renderer = lazy_import('polygon_renderer')
+road_renderer = lazy_import('road_renderer')
+tiled_render = lazy_import('tiled_render')
+
 THEMES_DIR = "themes"
 FONTS_DIR = "fonts"
 POSTERS_DIR = "posters"
+PREVIEWS_DIR = "previews"
+POSTER_SIZE = (12, 16)  # inches
+POSTER_DPI = 300
+OUTPUT_FORMATS = ['png', 'tiff', 'svg', 'pdf']
+VECTOR_EXTENSIONS = ('.svg', '.pdf')
+# Renders whose Agg buffer would exceed this are rasterized in bands instead
+TILED_AUTO_BYTES = 512 * 1024 * 1024
+PREVIEW_DPI = 72
+# Bump when a renderer change alters existing posters, so they are rendered again
+RENDERER_VERSION = 2
+GRADIENT_STEPS = 256  # bands per top/bottom fade
 
 def load_fonts():
     """
@@ -34,44 +66,51 @@ def load_fonts():
     
     return fonts
 
-FONTS = load_fonts()
 
 def generate_base_filename(city, theme_name):
     """
-    Generate base filename without timestamp for checking existing files.
+    Generate the {city_slug}_{theme} filename stem.
     """
     city_slug = city.lower().replace(' ', '_')
     return f"{city_slug}_{theme_name}"
 
-def check_existing_poster(city, theme_name):
+def get_render_key(city, country, theme, dist, extension='png', dpi=POSTER_DPI, network='all', point=None):
+    """
+    Render store key for a poster of city with the loaded theme dict.
+    point is only part of the key when the coordinates were given
+    explicitly (--lat/--lon) instead of geocoded.
+    """
+    return render_store.render_key(city, country, theme, dist, format=extension, dpi=dpi, network=network,
+                                   point=list(point) if point else None, renderer=RENDERER_VERSION)
+
+def check_existing_poster(render_key):
     """
-    Check if a poster already exists for the given city and theme.
+    Check if a poster was already rendered under render_key.
     Returns the path to the existing file if found, None otherwise.
     """
-    if not os.path.exists(POSTERS_DIR):
-        return None
-    
-    base_filename = generate_base_filename(city, theme_name)
-    
-    # Look for any file that starts with the base filename
-    for file in os.listdir(POSTERS_DIR):
-        if file.startswith(base_filename) and file.endswith('.png'):
-            return os.path.join(POSTERS_DIR, file)
-    
-    return None
+    return render_store.find_render(render_key, os.path.join(POSTERS_DIR, render_store.RENDER_STORE_NAME))
 
-def generate_output_filename(city, theme_name):
+def generate_output_filename(city, theme_name, render_key, extension='png'):
     """
-    Generate unique output filename with city, theme, and datetime.
+    Generate the output filename from city, theme and render key, so the
+    same render always gets the same name and different ones never clash.
     """
     if not os.path.exists(POSTERS_DIR):
         os.makedirs(POSTERS_DIR)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    city_slug = city.lower().replace(' ', '_')
-    filename = f"{city_slug}_{theme_name}_{timestamp}.png"
+    filename = f"{generate_base_filename(city, theme_name)}_{render_key[:render_store.KEY_LENGTH]}.{extension}"
     return os.path.join(POSTERS_DIR, filename)
 
+def generate_preview_filename(city, theme_name):
+    """
+    Generate the preview filename for city and theme.
+    Previews have no timestamp, so each one replaces the last.
+    """
+    if not os.path.exists(PREVIEWS_DIR):
+        os.makedirs(PREVIEWS_DIR)
+    
+    return os.path.join(PREVIEWS_DIR, f"{generate_base_filename(city, theme_name)}.png")
+
 def get_available_themes():
     """
     Scans the themes directory and returns a list of available theme names.
@@ -121,13 +160,10 @@ def load_theme(theme_name="feature_based"):
 # Load theme (can be changed via command line or input)
 THEME = None  # Will be loaded later
 
-def create_gradient_fade(ax, color, location='bottom', zorder=10):
+def get_gradient_colormap(color, location='bottom'):
     """
-    Creates a fade effect at the top or bottom of the map.
+    Builds the colormap for a top or bottom fade in the given color.
     """
-    vals = np.linspace(0, 1, 256).reshape(-1, 1)
-    gradient = np.hstack((vals, vals))
-    
     rgb = mcolors.to_rgb(color)
     my_colors = np.zeros((256, 4))
     my_colors[:, 0] = rgb[0]
@@ -136,215 +172,785 @@ def create_gradient_fade(ax, color, location='bottom', zorder=10):
     
     if location == 'bottom':
         my_colors[:, 3] = np.linspace(1, 0, 256)
-        extent_y_start = 0
-        extent_y_end = 0.25
     else:
         my_colors[:, 3] = np.linspace(0, 1, 256)
-        extent_y_start = 0.75
-        extent_y_end = 1.0
 
-    custom_cmap = mcolors.ListedColormap(my_colors)
-    
-    xlim = ax.get_xlim()
-    ylim = ax.get_ylim()
-    y_range = ylim[1] - ylim[0]
-    
-    y_bottom = ylim[0] + y_range * extent_y_start
-    y_top = ylim[0] + y_range * extent_y_end
-    
-    ax.imshow(gradient, extent=[xlim[0], xlim[1], y_bottom, y_top], 
-              aspect='auto', cmap=custom_cmap, zorder=zorder, origin='lower')
+    return mcolors.ListedColormap(my_colors)
 
-def get_edge_colors_by_type(G):
+@lru_cache(maxsize=None)
+def get_gradient_colors(color, location='bottom'):
     """
-    Assigns colors to edges based on road type hierarchy.
-    Returns a list of colors corresponding to each edge in the graph.
+    RGBA of every band of a top or bottom fade, bottom band first.
+    Cached per (color, location), so themes are only computed once per process.
     """
-    edge_colors = []
-    
-    for u, v, data in G.edges(data=True):
-        # Get the highway type (can be a list or string)
-        highway = data.get('highway', 'unclassified')
-        
-        # Handle list of highway types (take the first one)
-        if isinstance(highway, list):
-            highway = highway[0] if highway else 'unclassified'
-        
-        # Assign color based on road type
-        if highway in ['motorway', 'motorway_link']:
-            color = THEME['road_motorway']
-        elif highway in ['trunk', 'trunk_link', 'primary', 'primary_link']:
-            color = THEME['road_primary']
-        elif highway in ['secondary', 'secondary_link']:
-            color = THEME['road_secondary']
-        elif highway in ['tertiary', 'tertiary_link']:
-            color = THEME['road_tertiary']
-        elif highway in ['residential', 'living_street', 'unclassified']:
-            color = THEME['road_residential']
-        else:
-            color = THEME['road_default']
-        
-        edge_colors.append(color)
-    
-    return edge_colors
+    colors = get_gradient_colormap(color, location)(np.linspace(0, 1, GRADIENT_STEPS))
+    colors.flags.writeable = False
+    return colors
+
+@lru_cache(maxsize=None)
+def get_gradient_bands(location='bottom'):
+    """Corners of the fade bands in axes coordinates, bottom band first."""
+    y_start, y_end = (0, 0.25) if location == 'bottom' else (0.75, 1.0)
+    edges = np.linspace(y_start, y_end, GRADIENT_STEPS + 1)
+    bands = np.empty((GRADIENT_STEPS, 4, 2))
+    bands[:, :, 0] = [0, 1, 1, 0]
+    bands[:, :2, 1] = edges[:-1, None]
+    bands[:, 2:, 1] = edges[1:, None]
+    bands.flags.writeable = False
+    return bands
 
-def get_edge_widths_by_type(G):
+def create_gradient_fade(ax, color, location='bottom', zorder=10):
     """
-    Assigns line widths to edges based on road type.
-    Major roads get thicker lines.
+    Creates a fade effect at the top or bottom of the map.
+    The fade is drawn as GRADIENT_STEPS flat bands, which Agg fills far
+    faster than it resamples an image over a quarter of the poster.
+    Returns the collection so the fade can be recolored for another theme.
     """
-    edge_widths = []
-    
-    for u, v, data in G.edges(data=True):
-        highway = data.get('highway', 'unclassified')
-        
+    from matplotlib.collections import PolyCollection
+    fade = PolyCollection(get_gradient_bands(location), facecolors=get_gradient_colors(color, location),
+                          edgecolors='none', antialiased=False, transform=ax.transAxes, zorder=zorder)
+    ax.add_collection(fade, autolim=False)
+    return fade
+
+# Road classes from most to least important, with their theme color key
+# suffix and line width. get_road_palette() indexes themes in this order.
+ROAD_CLASSES = ['motorway', 'primary', 'secondary', 'tertiary', 'residential', 'default']
+ROAD_CLASS_WIDTHS = (1.2, 1.0, 0.8, 0.6, 0.4, 0.4)
+DEFAULT_ROAD_CLASS = ROAD_CLASSES.index('default')
+
+# OSM highway tag -> index into ROAD_CLASSES (anything else is 'default')
+HIGHWAY_CLASSES = {
+    'motorway': 0, 'motorway_link': 0,
+    'trunk': 1, 'trunk_link': 1, 'primary': 1, 'primary_link': 1,
+    'secondary': 2, 'secondary_link': 2,
+    'tertiary': 3, 'tertiary_link': 3,
+    'residential': 4, 'living_street': 4, 'unclassified': 4,
+}
+
+def get_edge_highways(G):
+    """
+    Extracts the highway tag of every edge in a single pass.
+    Lists of highway types collapse to their first entry.
+    """
+    highways = []
+    for _, _, highway in G.edges(data='highway', default='unclassified'):
         if isinstance(highway, list):
             highway = highway[0] if highway else 'unclassified'
-        
-        # Assign width based on road importance
-        if highway in ['motorway', 'motorway_link']:
-            width = 1.2
-        elif highway in ['trunk', 'trunk_link', 'primary', 'primary_link']:
-            width = 1.0
-        elif highway in ['secondary', 'secondary_link']:
-            width = 0.8
-        elif highway in ['tertiary', 'tertiary_link']:
-            width = 0.6
-        else:
-            width = 0.4
-        
-        edge_widths.append(width)
-    
-    return edge_widths
+        highways.append(highway)
+    return highways
+
+def classify_highways(highways):
+    """
+    Maps highway tags to ROAD_CLASSES indices.
+    The tags are turned into a categorical so the lookup runs once per
+    distinct tag rather than once per edge.
+    """
+    categories = pd.Categorical(highways)
+    lookup = np.array([HIGHWAY_CLASSES.get(tag, DEFAULT_ROAD_CLASS) for tag in categories.categories],
+                      dtype=np.int8)
+    return lookup[categories.codes] if len(lookup) else np.empty(len(categories), dtype=np.int8)
+
+def classify_roads(G):
+    """
+    Returns the road class index of every edge, in G.edges() order.
+    """
+    return classify_highways(get_edge_highways(G))
+
+def get_road_palette(theme):
+    """
+    Returns an RGBA array with one row per road class for the given theme.
+    """
+    return np.array([mcolors.to_rgba(theme[f'road_{name}']) for name in ROAD_CLASSES])
+
+_GEOLOCATOR = None
+
+def get_geolocator():
+    """
+    Returns the shared Nominatim client, creating it on first use.
+    """
+    global _GEOLOCATOR
+    if _GEOLOCATOR is None:
+        from geopy.geocoders import Nominatim
+        _GEOLOCATOR = Nominatim(user_agent="city_map_poster")
+    return _GEOLOCATOR
 
-def get_coordinates(city, country):
+def get_coordinates(city, country, throttle=None, cache_file=geocode_cache.GEOCODE_CACHE_FILE, offline=False,
+                    osm_index=None):
     """
     Fetches coordinates for a given city and country using geopy.
-    Includes rate limiting to be respectful to the geocoding service.
+    Results are kept in the geocode cache, so a city is only looked up once;
+    with offline=True a cache miss raises instead of contacting Nominatim.
+    osm_index, an optional osm_index.OsmIndex, resolves place names from a
+    local extract before falling back to Nominatim.
+    Includes rate limiting to be respectful to the geocoding service;
+    throttle, if given, is called before the request instead of sleeping.
     """
     print("Looking up coordinates...")
-    geolocator = Nominatim(user_agent="city_map_poster")
+    if cache_file:
+        cached = geocode_cache.lookup(city, country, cache_file)
+        if cached:
+            print(f"✓ Coordinates (cached): {cached['lat']}, {cached['lon']}")
+            return (cached['lat'], cached['lon'])
+    
+    if osm_index is not None:
+        place = osm_index.find_place(city, country)
+        if place:
+            print(f"✓ Coordinates (OSM extract): {place[0]}, {place[1]}")
+            return place
+    
+    if offline:
+        raise ValueError(f"No cached coordinates for {city}, {country} (offline mode). "
+                         f"Resolve them first with geocode_cities.py or pass --lat/--lon.")
+    
+    geolocator = get_geolocator()
     
     # Add a small delay to respect Nominatim's usage policy
-    time.sleep(1)
+    if throttle:
+        throttle()
+    else:
+        time.sleep(1)
     
     location = geolocator.geocode(f"{city}, {country}")
     
     if location:
         print(f"✓ Found: {location.address}")
         print(f"✓ Coordinates: {location.latitude}, {location.longitude}")
+        if cache_file:
+            geocode_cache.store(city, country, location.latitude, location.longitude,
+                                location.address, cache_file)
         return (location.latitude, location.longitude)
     else:
         raise ValueError(f"Could not find coordinates for {city}, {country}")
 
-def create_poster(city, country, point, dist, output_file):
-    print(f"\nGenerating map for {city}, {country}...")
+WATER_TAGS = {'natural': 'water', 'waterway': 'riverbank'}
+PARKS_TAGS = {'leisure': 'park', 'landuse': 'grass'}
+# Polygon layers drawn under the roads, fetched together in one query
+POLYGON_LAYERS = {'water': WATER_TAGS, 'parks': PARKS_TAGS}
+POLYGON_TAGS = {key: value for tags in POLYGON_LAYERS.values() for key, value in tags.items()}
+# Polygons are clipped to the road bounds padded a bit past the view, so cut edges stay off the poster
+POLYGON_CLIP_PADDING = 0.03
+# Areas kept when indexing a local OSM extract (--osm-source)
+INDEXED_FEATURE_TAGS = {key: [value] for key, value in POLYGON_TAGS.items()}
+
+def get_osm_index(osm_source, cache_dir=geodata_cache.CACHE_DIR):
+    """
+    Returns the osm_index.OsmIndex for a local .osm.pbf extract, building
+    it inside cache_dir the first time the extract is used.
+    """
+    return osm_index.open_index(osm_source, cache_dir or geodata_cache.CACHE_DIR, INDEXED_FEATURE_TAGS)
+
+# Ways drawn in the default road class that only read as streets up close
+MINOR_HIGHWAYS = [
+    'bridleway', 'bus_guideway', 'corridor', 'cycleway', 'elevator', 'escalator',
+    'footway', 'path', 'pedestrian', 'service', 'steps', 'track',
+]
+# Coarsest map scale (meters per output pixel) at which minor ways are fetched
+MINOR_HIGHWAYS_MAX_MPP = 5.0
+NETWORK_MODES = ['all', 'adaptive']
+# 'osmnx' builds a networkx graph; 'overpass' parses ways straight into arrays
+ROAD_LOADERS = ['osmnx', 'overpass']
+
+def get_meters_per_pixel(dist, dpi=POSTER_DPI):
+    """Map scale of a poster: the 2*dist wide bbox spans the poster width."""
+    return 2 * dist / (POSTER_SIZE[0] * dpi)
+
+def get_excluded_highways(network, dist, dpi=POSTER_DPI):
+    """
+    Returns the sorted highway values a network mode leaves out, or None to
+    fetch everything network_type='all' returns. 'adaptive' leaves out
+    highway types that would not be visible: road classes thinner than a
+    pixel at dpi, and footways, service roads and similar once a pixel
+    covers more than MINOR_HIGHWAYS_MAX_MPP meters.
+    """
+    if network == 'all':
+        return None
+    if network != 'adaptive':
+        raise ValueError(f"Unknown network mode: {network}")
     
-    # Progress bar for data fetching
-    with tqdm(total=3, desc="Fetching map data", unit="step", bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}') as pbar:
-        # 1. Fetch Street Network
-        pbar.set_description("Downloading street network")
-        G = ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type='all')
-        pbar.update(1)
-        time.sleep(0.5)  # Rate limit between requests
-        
-        # 2. Fetch Water Features
-        pbar.set_description("Downloading water features")
-        try:
-            water = ox.features_from_point(point, tags={'natural': 'water', 'waterway': 'riverbank'}, dist=dist)
-        except:
-            water = None
-        pbar.update(1)
-        time.sleep(0.3)
-        
-        # 3. Fetch Parks
-        pbar.set_description("Downloading parks/green spaces")
-        try:
-            parks = ox.features_from_point(point, tags={'leisure': 'park', 'landuse': 'grass'}, dist=dist)
-        except:
-            parks = None
-        pbar.update(1)
+    visible = get_visible_road_classes(dpi)
+    excluded = [tag for tag, road_class in HIGHWAY_CLASSES.items() if not visible[road_class]]
+    if not visible[DEFAULT_ROAD_CLASS] or get_meters_per_pixel(dist, dpi) > MINOR_HIGHWAYS_MAX_MPP:
+        excluded += MINOR_HIGHWAYS
+    return sorted(set(excluded)) or None
+
+def get_network_filter(exclude_highways):
+    """Overpass custom_filter for get_excluded_highways() output, or None."""
+    return osm_loader.build_way_filter(exclude_highways) if exclude_highways else None
+
+def get_graph_cache_key(point, dist, exclude_highways=None):
+    """geodata_cache key of the osmnx street graph around point."""
+    network_filter = get_network_filter(exclude_highways)
+    if network_filter:
+        return geodata_cache.make_cache_key('graph', point, dist, dist_type='bbox', custom_filter=network_filter)
+    return geodata_cache.make_cache_key('graph', point, dist, dist_type='bbox', network_type='all')
+
+def get_roads_cache_key(point, dist, exclude_highways=None, road_loader='osmnx'):
+    """geodata_cache key of the packed road arrays around point."""
+    return geodata_cache.make_cache_key('roads', point, dist, loader=road_loader,
+                                        exclude_highways=exclude_highways or [])
+
+def get_polygon_cache_keys(point, dist):
+    """geodata_cache keys of the POLYGON_LAYERS around point, by layer name."""
+    return {name: geodata_cache.make_cache_key('features', point, dist, tags=tags)
+            for name, tags in POLYGON_LAYERS.items()}
+
+def fetch_graph_arrays(point, dist, cache_dir=geodata_cache.CACHE_DIR, throttle=None, offline=False,
+                       exclude_highways=None, profile=poster_profile.DISABLED):
+    """
+    Returns the street network around point as geodata_cache graph arrays,
+    downloading and parsing it only on a cache miss.
+    exclude_highways lists highway values to leave out of the query (see
+    get_excluded_highways()); it is part of the cache key.
+    """
+    network_filter = get_network_filter(exclude_highways)
+    graph_key = get_graph_cache_key(point, dist, exclude_highways)
+    graph_arrays = geodata_cache.load_graph_arrays(cache_dir, graph_key) if cache_dir else None
+    if graph_arrays is None:
+        if offline:
+            raise ValueError("Street network is not in the map data cache (offline mode)")
+        if throttle:
+            throttle()
+        # osmnx downloads the ways and builds the networkx graph in one call
+        with profile.stage('fetch.roads.download') as counts:
+            G = ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type='all',
+                                    custom_filter=network_filter)
+            counts['edges'] = G.number_of_edges()
+        with profile.stage('fetch.roads.pack'):
+            graph_arrays = geodata_cache.graph_to_arrays(G)
+        del G  # only the packed arrays are needed from here on
+        if cache_dir:
+            geodata_cache.store_graph_arrays(cache_dir, graph_key, graph_arrays)
+    return graph_arrays
+
+def fetch_road_arrays(point, dist, cache_dir=geodata_cache.CACHE_DIR, throttle=None, offline=False,
+                      exclude_highways=None, road_loader='osmnx', profile=poster_profile.DISABLED):
+    """
+    Returns the roads around point as road_renderer.RoadArrays.
+    road_loader 'osmnx' goes through the networkx graph; 'overpass' asks
+    Overpass for the ways with inline geometry and packs them directly,
+    without building a graph. Road arrays already in the cache (e.g. cut
+    from a shared region, see store_map_data()) are used with either.
+    """
+    roads_key = get_roads_cache_key(point, dist, exclude_highways, road_loader)
+    roads = geodata_cache.load_road_arrays(cache_dir, roads_key) if cache_dir else None
+    if roads is not None:
+        return roads
+    if road_loader == 'osmnx':
+        graph_arrays = fetch_graph_arrays(point, dist, cache_dir=cache_dir, throttle=throttle, offline=offline,
+                                          exclude_highways=exclude_highways, profile=profile)
+        with profile.stage('fetch.roads.build'):
+            return road_renderer.build_road_arrays(graph_arrays)
+    if road_loader != 'overpass':
+        raise ValueError(f"Unknown road loader: {road_loader}")
+
+    if offline:
+        raise ValueError("Roads are not in the map data cache (offline mode)")
+    if throttle:
+        throttle()
+    with profile.stage('fetch.roads.download'):
+        roads = osm_loader.fetch_overpass_roads(point, dist, exclude_highways or (),
+                                                url=f"{ox.settings.overpass_url.rstrip('/')}/interpreter",
+                                                timeout=ox.settings.requests_timeout)
+    if cache_dir:
+        geodata_cache.store_road_arrays(cache_dir, roads_key, roads)
+    return roads
+
+def split_features(features, tags):
+    """
+    Returns the geometries of the features matching any of tags, a dict
+    of OSM key -> value like WATER_TAGS.
+    """
+    matches = pd.Series(False, index=features.index)
+    for key, value in tags.items():
+        if key in features.columns:
+            matches |= features[key] == value
+    return features.loc[matches, [features.geometry.name]]
+
+def fetch_polygon_layers(point, dist, cache_dir=geodata_cache.CACHE_DIR, throttle=None, offline=False,
+                         profile=poster_profile.DISABLED):
+    """
+    Returns {'water': ..., 'parks': ...} feature frames around point.
+    Both layers come from a single features query for POLYGON_TAGS that is
+    split locally; each layer is cached under its own key. A layer is None
+    if the download failed, and an empty frame if the area has no matches.
+    """
+    keys = get_polygon_cache_keys(point, dist)
+    layers = {name: geodata_cache.load_features(cache_dir, key) if cache_dir else None
+              for name, key in keys.items()}
+    if all(layer is not None for layer in layers.values()):
+        return layers
+    if offline:
+        raise ValueError("Water/park features are not in the map data cache (offline mode)")
+    
+    if throttle:
+        throttle()
+    try:
+        with profile.stage('fetch.polygons.download') as counts:
+            features = ox.features_from_point(point, tags=POLYGON_TAGS, dist=dist)
+            counts['features'] = len(features)
+    except ox_errors.InsufficientResponseError:
+        features = gpd.GeoDataFrame(geometry=[], crs='epsg:4326')
+    except Exception:
+        return {name: None for name in POLYGON_LAYERS}
+    
+    for name, tags in POLYGON_LAYERS.items():
+        layers[name] = split_features(features, tags)
+        if cache_dir:
+            geodata_cache.store_features(cache_dir, keys[name], layers[name])
+    return layers
+
+def fetch_map_data(point, dist, cache_dir=geodata_cache.CACHE_DIR, throttle=None, show_progress=True,
+                   offline=False, exclude_highways=None, road_loader='osmnx', osm_source=None,
+                   profile=poster_profile.DISABLED):
+    """
+    Downloads the street network, water and park features around a point.
+    Parsed results are reused from cache_dir when available; pass
+    cache_dir=None to always download, or offline=True to fail instead of
+    downloading. throttle, if given, is called before every download;
+    roads and the water/park layers are fetched concurrently.
+    exclude_highways limits the street network query (see
+    get_excluded_highways()) and road_loader picks how roads are loaded
+    (see fetch_road_arrays()). With osm_source,
+    a local .osm.pbf extract, everything is read from its index instead.
+    profile, a poster_profile.PosterProfile, records the fetch stages.
+    Returns a dict with 'roads' (RoadArrays), 'water' and 'parks' entries.
+    """
+    with profile.stage('fetch', source='osm_index' if osm_source else road_loader) as counts:
+        data = _fetch_map_data(point, dist, cache_dir, throttle, show_progress, offline,
+                               exclude_highways, road_loader, osm_source, profile)
+        roads = data['roads']
+        counts['polylines'] = len(roads.offsets) - 1
+        counts['segments'] = len(roads.coords) - counts['polylines']
+        counts['polygons'] = sum(len(data[name]) for name in POLYGON_LAYERS if data[name] is not None)
+    return data
+
+def _fetch_map_data(point, dist, cache_dir, throttle, show_progress, offline, exclude_highways, road_loader,
+                    osm_source, profile):
+    if osm_source:
+        index = get_osm_index(osm_source, cache_dir)
+        data = {
+            'roads': index.roads(point, dist, exclude_highways or ()),
+            'water': index.features(point, dist, WATER_TAGS),
+            'parks': index.features(point, dist, PARKS_TAGS),
+        }
+        print("✓ Map data read from the local OSM extract")
+        return data
+    
+    def timed(name, fetch, *args, **kwargs):
+        with profile.stage(name):
+            return fetch(*args, **kwargs)
+    
+    # Roads and the polygon layers download concurrently, so fetching takes
+    # as long as the slower of the two instead of their sum
+    from tqdm import tqdm
+    with tqdm(total=2, desc="Downloading street network, water and parks", unit="step",
+              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}', disable=not show_progress) as pbar, \
+            ThreadPoolExecutor(max_workers=2) as pool:
+        roads_future = pool.submit(timed, 'fetch.roads', fetch_road_arrays, point, dist, cache_dir=cache_dir,
+                                   throttle=throttle, offline=offline, exclude_highways=exclude_highways,
+                                   road_loader=road_loader, profile=profile)
+        polygons_future = pool.submit(timed, 'fetch.polygons', fetch_polygon_layers, point, dist,
+                                      cache_dir=cache_dir, throttle=throttle, offline=offline, profile=profile)
+        for future in as_completed([roads_future, polygons_future]):
+            pbar.set_description("✓ Street network" if future is roads_future else "✓ Water and parks")
+            pbar.update(1)
+        roads = roads_future.result()
+        layers = polygons_future.result()
     
     print("✓ All data downloaded successfully!")
+    return {'roads': roads, 'water': layers['water'], 'parks': layers['parks']}
+
+def is_map_data_cached(point, dist, cache_dir=geodata_cache.CACHE_DIR, exclude_highways=None, road_loader='osmnx'):
+    """Whether fetch_map_data() would find everything for point in cache_dir, without loading it."""
+    roads_cached = geodata_cache.has_entry(cache_dir, get_roads_cache_key(point, dist, exclude_highways, road_loader),
+                                           geodata_cache.ROADS_SUFFIX)
+    if not roads_cached and road_loader == 'osmnx':
+        roads_cached = geodata_cache.has_entry(cache_dir, get_graph_cache_key(point, dist, exclude_highways),
+                                               geodata_cache.GRAPH_SUFFIX)
+    return roads_cached and all(geodata_cache.has_entry(cache_dir, key, geodata_cache.FEATURES_SUFFIX)
+                                for key in get_polygon_cache_keys(point, dist).values())
+
+def clip_map_data(data, point, dist):
+    """
+    Cut fetch_map_data() output for a larger area down to the bbox dist
+    meters around point: roads are clipped to it, and water/park features
+    that intersect it are picked through the layers' spatial index.
+    """
+    bbox = osm_loader.bbox_from_point(point, dist)
+    roads = data['roads']
+    clipped = {'roads': osm_loader.clip_to_bbox(roads.coords, np.diff(roads.offsets), roads.highways, bbox)}
+    box = shapely.box(*bbox)
+    for name in POLYGON_LAYERS:
+        layer = data[name]
+        clipped[name] = None if layer is None else layer.iloc[layer.sindex.query(box, predicate='intersects')]
+    return clipped
+
+def store_map_data(data, point, dist, cache_dir=geodata_cache.CACHE_DIR, exclude_highways=None,
+                   road_loader='osmnx'):
+    """
+    Cache data (e.g. from clip_map_data()) as if fetch_map_data() had
+    downloaded it for point, so later fetches for point are cache hits.
+    Missing (None) layers are left out.
+    """
+    geodata_cache.store_road_arrays(cache_dir, get_roads_cache_key(point, dist, exclude_highways, road_loader),
+                                    data['roads'])
+    for name, key in get_polygon_cache_keys(point, dist).items():
+        if data[name] is not None:
+            geodata_cache.store_features(cache_dir, key, data[name])
+
+def get_visible_road_classes(dpi):
+    """
+    Returns a boolean mask over ROAD_CLASSES of the classes whose line width
+    is at least one pixel at dpi (widths are in points, 1/72 inch).
+    """
+    return np.round(np.asarray(ROAD_CLASS_WIDTHS) * dpi / 72) >= 1
+
+def simplify_polygons(features, tolerance, grid_size=None):
+    """
+    Simplifies polygon features to tolerance (in map units), dropping the
+    ones that collapse entirely. grid_size also snaps the vertices to a
+    grid of that size.
+    """
+    if features is None or features.empty:
+        return features
+    simplified = features.geometry.simplify(tolerance, preserve_topology=False)
+    if grid_size:
+        simplified = simplified.set_precision(grid_size)
+    return gpd.GeoDataFrame(geometry=simplified[~simplified.is_empty], crs=features.crs)
+
+def prepare_preview_data(data, dpi):
+    """
+    Returns map data for a low-resolution preview: water and park polygons
+    simplified to the size of one output pixel.
+    """
+    left, bottom, right, top = road_renderer.get_road_bounds(data['roads'])
+    pixel_size = (top - bottom) / (POSTER_SIZE[1] * dpi)
+    return {
+        'roads': data['roads'],
+        'water': simplify_polygons(data['water'], pixel_size),
+        'parks': simplify_polygons(data['parks'], pixel_size),
+    }
+
+def prepare_vector_data(data, dpi):
+    """
+    Returns map data for SVG/PDF output at dpi: the edges of each road
+    class merged into long polylines, each polygon layer dissolved into
+    packed polygon arrays, and all geometry snapped to the size of one
+    print pixel with the detail below it dropped.
+    """
+    roads = data['roads']
+    left, bottom, right, top = road_renderer.get_road_bounds(roads)
+    pixel_size = (top - bottom) / (POSTER_SIZE[1] * dpi)
+
+    road_classes = classify_highways(roads.highways)
+    lines = []
+    highways = []
+    for road_class, name in enumerate(ROAD_CLASSES):
+        merged = road_renderer.merge_lines(roads, np.flatnonzero(road_classes == road_class), pixel_size)
+        lines.extend(merged)
+        highways.extend([name] * len(merged))  # class names classify back to the same class
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum([len(line) for line in lines], out=offsets[1:])
+    coords = np.concatenate(lines) if lines else np.empty((0, 2))
+
+    vector_data = {'roads': road_renderer.RoadArrays(coords, offsets, np.array(highways, dtype=object))}
+    # Dissolved layers leave no hairline seams between touching polygons in vector viewers
+    clip = get_polygon_clip_bounds(roads)
+    for name in POLYGON_LAYERS:
+        simplified = simplify_polygons(data[name], pixel_size, grid_size=pixel_size)
+        vector_data[name] = polygon_renderer.build_polygon_arrays(simplified, clip, union=True)
+    return vector_data
+
+def get_polygon_clip_bounds(roads):
+    """Bounds that water and park polygons are clipped to: just past the poster's view."""
+    return road_renderer.get_view_bounds(road_renderer.get_road_bounds(roads), padding=POLYGON_CLIP_PADDING)
+
+def draw_poster(city, country, point, data, dpi=POSTER_DPI, profile=poster_profile.DISABLED):
+    """
+    Draws every poster layer with the current THEME.
+    Road classes thinner than one pixel at dpi are left out, and water
+    and park frames are packed into polygon arrays clipped to the view.
+    Returns the figure and a dict of the themed artists so that
+    apply_theme() can recolor them without redrawing the map.
+    """
+    roads = data['roads']
     
-    # 2. Setup Plot
-    print("Rendering map...")
-    fig, ax = plt.subplots(figsize=(12, 16), facecolor=THEME['bg'])
+    fig, ax = plt.subplots(figsize=POSTER_SIZE, facecolor=THEME['bg'])
     ax.set_facecolor(THEME['bg'])
     ax.set_position([0, 0, 1, 1])
     
-    # 3. Plot Layers
+    layers = {'ax': ax}
+    
     # Layer 1: Polygons
-    if water is not None and not water.empty:
-        water.plot(ax=ax, facecolor=THEME['water'], edgecolor='none', zorder=1)
-    if parks is not None and not parks.empty:
-        parks.plot(ax=ax, facecolor=THEME['parks'], edgecolor='none', zorder=2)
+    with profile.stage('draw.polygons') as counts:
+        clip = get_polygon_clip_bounds(roads)
+        counts['polygons'] = 0
+        for name, zorder in (('water', 1), ('parks', 2)):
+            polygons = data[name]
+            if not isinstance(polygons, polygon_renderer.PolygonArrays):
+                polygons = polygon_renderer.build_polygon_arrays(polygons, clip)
+            layers[name] = polygon_renderer.draw_polygons(ax, polygons, THEME[name], zorder=zorder)
+            counts['polygons'] += polygon_renderer.count_polygons(polygons)
     
     # Layer 2: Roads with hierarchy coloring
     print("Applying road hierarchy colors...")
-    edge_colors = get_edge_colors_by_type(G)
-    edge_widths = get_edge_widths_by_type(G)
-    
-    ox.plot_graph(
-        G, ax=ax, bgcolor=THEME['bg'],
-        node_size=0,
-        edge_color=edge_colors,
-        edge_linewidth=edge_widths,
-        show=False, close=False
-    )
+    with profile.stage('draw.classify'):
+        road_classes = classify_highways(roads.highways)
+        visible = get_visible_road_classes(dpi)
+        if not visible.all():
+            road_classes = np.where(visible[road_classes], road_classes, -1)
+    with profile.stage('draw.roads') as counts:
+        layers['roads'] = road_renderer.draw_roads(ax, roads, road_classes, get_road_palette(THEME),
+                                                   ROAD_CLASS_WIDTHS, zorder=1)
+        road_renderer.configure_axes(ax, road_renderer.get_road_bounds(roads))
+        counts['polylines'] = int((road_classes >= 0).sum())
     
     # Layer 3: Gradients (Top and Bottom)
-    create_gradient_fade(ax, THEME['gradient_color'], location='bottom', zorder=10)
-    create_gradient_fade(ax, THEME['gradient_color'], location='top', zorder=10)
-    
-    # 4. Typography using Roboto font
-    if FONTS:
-        font_main = FontProperties(fname=FONTS['bold'], size=60)
-        font_top = FontProperties(fname=FONTS['bold'], size=40)
-        font_sub = FontProperties(fname=FONTS['light'], size=22)
-        font_coords = FontProperties(fname=FONTS['regular'], size=14)
-    else:
-        # Fallback to system fonts
-        font_main = FontProperties(family='monospace', weight='bold', size=60)
-        font_top = FontProperties(family='monospace', weight='bold', size=40)
-        font_sub = FontProperties(family='monospace', weight='normal', size=22)
-        font_coords = FontProperties(family='monospace', size=14)
+    with profile.stage('draw.gradients'):
+        # Stretch the map over the whole poster frame
+        ax.set_aspect('auto')
+        layers['gradients'] = [
+            (create_gradient_fade(ax, THEME['gradient_color'], location='bottom', zorder=10), 'bottom'),
+            (create_gradient_fade(ax, THEME['gradient_color'], location='top', zorder=10), 'top'),
+        ]
+    
+    with profile.stage('draw.text'):
+        layers['text'] = draw_text(ax, city, country, point)
     
+    return fig, layers
+
+@lru_cache(maxsize=None)
+def get_poster_fonts():
+    """
+    The FontProperties of every poster text, built once per process
+    (text artists copy them, so they are safe to share).
+    """
+    from matplotlib.font_manager import FontProperties
+    fonts = load_fonts()
+    if fonts:
+        # Typography using Roboto font
+        return {
+            'main': FontProperties(fname=fonts['bold'], size=60),
+            'top': FontProperties(fname=fonts['bold'], size=40),
+            'sub': FontProperties(fname=fonts['light'], size=22),
+            'coords': FontProperties(fname=fonts['regular'], size=14),
+            'attr': FontProperties(fname=fonts['light'], size=8),
+        }
+    # Fallback to system fonts
+    return {
+        'main': FontProperties(family='monospace', weight='bold', size=60),
+        'top': FontProperties(family='monospace', weight='bold', size=40),
+        'sub': FontProperties(family='monospace', weight='normal', size=22),
+        'coords': FontProperties(family='monospace', size=14),
+        'attr': FontProperties(family='monospace', size=8),
+    }
+
+def draw_text(ax, city, country, point):
+    """Draws the city name, country, coordinates and attribution; returns the artists."""
+    fonts = get_poster_fonts()
     spaced_city = "  ".join(list(city.upper()))
+    text_artists = []
 
     # --- BOTTOM TEXT ---
-    ax.text(0.5, 0.14, spaced_city, transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_main, zorder=11)
+    text_artists.append(ax.text(0.5, 0.14, spaced_city, transform=ax.transAxes,
+            color=THEME['text'], ha='center', fontproperties=fonts['main'], zorder=11))
     
-    ax.text(0.5, 0.10, country.upper(), transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_sub, zorder=11)
+    text_artists.append(ax.text(0.5, 0.10, country.upper(), transform=ax.transAxes,
+            color=THEME['text'], ha='center', fontproperties=fonts['sub'], zorder=11))
     
     lat, lon = point
     coords = f"{lat:.4f}° N / {lon:.4f}° E" if lat >= 0 else f"{abs(lat):.4f}° S / {lon:.4f}° E"
     if lon < 0:
         coords = coords.replace("E", "W")
     
-    ax.text(0.5, 0.07, coords, transform=ax.transAxes,
-            color=THEME['text'], alpha=0.7, ha='center', fontproperties=font_coords, zorder=11)
+    text_artists.append(ax.text(0.5, 0.07, coords, transform=ax.transAxes,
+            color=THEME['text'], alpha=0.7, ha='center', fontproperties=fonts['coords'], zorder=11))
     
-    ax.plot([0.4, 0.6], [0.125, 0.125], transform=ax.transAxes, 
-            color=THEME['text'], linewidth=1, zorder=11)
+    text_artists.extend(ax.plot([0.4, 0.6], [0.125, 0.125], transform=ax.transAxes, 
+            color=THEME['text'], linewidth=1, zorder=11))
 
     # --- ATTRIBUTION (bottom right) ---
-    if FONTS:
-        font_attr = FontProperties(fname=FONTS['light'], size=8)
+    text_artists.append(ax.text(0.98, 0.02, "© OpenStreetMap contributors", transform=ax.transAxes,
+            color=THEME['text'], alpha=0.5, ha='right', va='bottom', 
+            fontproperties=fonts['attr'], zorder=11))
+    return text_artists
+
+def apply_theme(fig, layers):
+    """
+    Recolors an already drawn poster with the current THEME.
+    Only colors change, so no geometry is fetched or rebuilt.
+    """
+    ax = layers['ax']
+    fig.set_facecolor(THEME['bg'])
+    ax.set_facecolor(THEME['bg'])
+    
+    for collection in layers['water']:
+        collection.set_facecolor(THEME['water'])
+    for collection in layers['parks']:
+        collection.set_facecolor(THEME['parks'])
+    
+    road_renderer.recolor_roads(layers['roads'], get_road_palette(THEME))
+    
+    for fade, location in layers['gradients']:
+        fade.set_facecolor(get_gradient_colors(THEME['gradient_color'], location))
+    
+    for artist in layers['text']:
+        artist.set_color(THEME['text'])
+
+def get_render_buffer_bytes(dpi):
+    """Size of the RGBA Agg buffer a full poster render at dpi needs."""
+    return round(POSTER_SIZE[0] * dpi) * round(POSTER_SIZE[1] * dpi) * 4
+
+def get_thumbnail_source_width(variant_names):
+    """Smallest render width the thumbnail variants resize well from, or None."""
+    if not variant_names:
+        return None
+    return 2 * max(generate_thumbnails.THUMBNAIL_VARIANTS[name]['size'][0] for name in variant_names)
+
+def get_saved_image(fig, dpi):
+    """
+    Returns the Agg buffer of the last savefig() as a PIL image that shares
+    its memory (no copy), or None if the canvas holds a different render.
+    Only valid until the figure is drawn again.
+    """
+    width, height = (int(round(size * dpi)) for size in fig.get_size_inches())
+    try:
+        buffer = fig.canvas.buffer_rgba()
+    except AttributeError:
+        return None
+    if tuple(buffer.shape[:2]) != (height, width):
+        return None
+    return Image.frombuffer('RGBA', (width, height), buffer, 'raw', 'RGBA', 0, 1)
+
+def render_thumbnail_source(fig, width):
+    """
+    Rasterizes fig just wide enough for thumbnails of at least width pixels,
+    for vector posters that leave no render to reuse.
+    """
+    dpi = math.ceil(width / fig.get_size_inches()[0])  # whole DPI keeps the canvas size exact
+    fig.savefig(io.BytesIO(), format='raw', dpi=dpi, facecolor=THEME['bg'])
+    return get_saved_image(fig, dpi)
+
+def save_thumbnails(fig, output_file, variant_names, dpi=POSTER_DPI, image=None):
+    """
+    Writes thumbnail variants for a poster that was just saved, resizing
+    the in-memory render (or image, e.g. the reduced copy from a tiled
+    render) instead of decoding the PNG again.
+    Returns the gallery thumbnail path, or None if it was not requested.
+    """
+    stem = os.path.splitext(os.path.basename(output_file))[0]
+    if image is None:
+        image = get_saved_image(fig, dpi)
+    if image is None:
+        with Image.open(output_file) as saved:
+            saved.load()
+            generate_thumbnails.save_thumbnail_variants(saved, stem, variant_names=variant_names)
     else:
-        font_attr = FontProperties(family='monospace', size=8)
+        generate_thumbnails.save_thumbnail_variants(image, stem, variant_names=variant_names)
     
-    ax.text(0.98, 0.02, "© OpenStreetMap contributors", transform=ax.transAxes,
-            color=THEME['text'], alpha=0.5, ha='right', va='bottom', 
-            fontproperties=font_attr, zorder=11)
+    if 'thumb' not in variant_names:
+        return None
+    return f"{generate_thumbnails.THUMBS_DIR.as_posix()}/{stem}{generate_thumbnails.THUMBNAIL_VARIANTS['thumb']['suffix']}"
 
-    # 5. Save
-    print(f"Saving to {output_file}...")
-    plt.savefig(output_file, dpi=300, facecolor=THEME['bg'])
-    plt.close()
-    print(f"✓ Done! Poster saved as {output_file}")
+def render_posters(city, country, point, data, renders, thumbnails=None, dpi=POSTER_DPI, record=True,
+                   profile=poster_profile.DISABLED, tiled=False, render_keys=None):
+    """
+    Draws the poster once and saves it for every (theme, output_file) pair
+    in renders, recoloring the existing figure between themes.
+    thumbnails is an optional list of generate_thumbnails variant names
+    written from each render as it is saved. record=False keeps the
+    outputs out of the poster manifest (used for previews). profile
+    records the draw, savefig and thumbnail stages. tiled streams the
+    poster to disk in row bands (see tiled_render) instead of rendering
+    it into one buffer; .tif/.tiff outputs are always tiled and .svg/.pdf
+    outputs never are. render_keys, one per render, records each output
+    in the render store (see get_render_key()).
+    """
+    global THEME
+    print("Rendering map...")
+    THEME = renders[0][0]
+    with profile.stage('draw'):
+        fig, layers = draw_poster(city, country, point, data, dpi=dpi, profile=profile)
+
+    try:
+        for index, (theme, output_file) in enumerate(renders):
+            theme_name = theme.get('name', 'unnamed')
+            if theme is not THEME:
+                THEME = theme
+                print(f"Recoloring for theme: {theme_name}")
+                with profile.stage('recolor', theme=theme_name):
+                    apply_theme(fig, layers)
+            print(f"Saving to {output_file}...")
+            image = None
+            vector = output_file.lower().endswith(VECTOR_EXTENSIONS)
+            with profile.stage('savefig', theme=theme_name, dpi=dpi) as counts:
+                if not vector and (tiled or output_file.lower().endswith(('.tif', '.tiff'))):
+                    collections = layers['water'] + layers['parks'] + [c for c in layers['roads'] if c is not None]
+                    image = tiled_render.save_tiled(fig, layers['ax'], collections, output_file, dpi, THEME['bg'],
+                                                    preview_width=get_thumbnail_source_width(thumbnails))
+                else:
+                    fig.savefig(output_file, dpi=dpi, facecolor=THEME['bg'])
+                counts['bytes'] = os.path.getsize(output_file)
+            # The gallery manifest only lists formats it can show (not TIFF)
+            in_manifest = record and output_file.lower().endswith(poster_manifest.POSTER_EXTENSIONS)
+            if in_manifest:
+                manifest_file = os.path.join(os.path.dirname(output_file), "manifest.json")
+                with profile.stage('manifest'):
+                    poster_manifest.record_poster(output_file, city, country, manifest_file=manifest_file)
+            if thumbnails:
+                with profile.stage('thumbnails', variants=len(thumbnails)):
+                    if vector:
+                        image = render_thumbnail_source(fig, get_thumbnail_source_width(thumbnails))
+                    thumbnail_path = save_thumbnails(fig, output_file, thumbnails, dpi, image=image)
+                if thumbnail_path and in_manifest:
+                    poster_manifest.set_thumbnails({os.path.basename(output_file): thumbnail_path},
+                                                   manifest_file=manifest_file)
+            if record and render_keys:
+                store_file = os.path.join(os.path.dirname(output_file), render_store.RENDER_STORE_NAME)
+                render_store.record_render(render_keys[index], output_file, city, country, theme_name,
+                                           store_file=store_file)
+            print(f"✓ Done! Poster saved as {output_file}")
+    finally:
+        plt.close(fig)
+
+def create_poster(city, country, point, dist, output_file, extra_themes=None,
+                  cache_dir=geodata_cache.CACHE_DIR, offline=False, thumbnails=None, preview_dpi=None,
+                  network='all', road_loader='osmnx', osm_source=None, profile=poster_profile.DISABLED,
+                  dpi=POSTER_DPI, tiled=None, render_keys=None):
+    """
+    Fetches the map data once and renders it with the current THEME.
+    extra_themes is an optional list of (theme, output_file) pairs that are
+    rendered afterwards by recoloring the same figure.
+    preview_dpi renders a quick low-resolution preview with simplified
+    polygons instead of the full poster. network is one of NETWORK_MODES
+    and road_loader one of ROAD_LOADERS; osm_source reads everything from
+    a local .osm.pbf extract instead of downloading it. profile, a
+    poster_profile.PosterProfile, records every stage. dpi is the print
+    resolution; tiled renders in bands (None: only when a single render
+    buffer would exceed TILED_AUTO_BYTES). An .svg or .pdf output_file
+    is drawn from merged road polylines (see prepare_vector_data()).
+    render_keys lists the render store key of output_file and of each
+    extra theme output.
+    """
+    print(f"\nGenerating map for {city}, {country}...")
+    exclude_highways = get_excluded_highways(network, dist, preview_dpi or dpi)
+    data = fetch_map_data(point, dist, cache_dir=cache_dir, offline=offline, exclude_highways=exclude_highways,
+                          road_loader=road_loader, osm_source=osm_source, profile=profile)
+    renders = [(THEME, output_file)] + list(extra_themes or [])
+    if preview_dpi:
+        with profile.stage('preview.simplify'):
+            data = prepare_preview_data(data, preview_dpi)
+        render_posters(city, country, point, data, renders, dpi=preview_dpi, record=False, profile=profile)
+    else:
+        if output_file.lower().endswith(VECTOR_EXTENSIONS):
+            with profile.stage('vector.merge') as counts:
+                counts['edges'] = len(data['roads'].highways)
+                data = prepare_vector_data(data, dpi)
+                counts['polylines'] = len(data['roads'].highways)
+        if tiled is None:
+            tiled = get_render_buffer_bytes(dpi) > TILED_AUTO_BYTES
+        render_posters(city, country, point, data, renders, thumbnails=thumbnails, dpi=dpi, profile=profile,
+                       tiled=tiled, render_keys=render_keys)
 
 def print_examples():
     """Print usage examples."""
@@ -383,6 +989,12 @@ Examples:
   python create_map_poster.py -c "London" -C "UK" -t noir -d 15000              # Thames curves
   python create_map_poster.py -c "Budapest" -C "Hungary" -t copper_patina -d 8000  # Danube split
   
+  # Quick preview while trying themes (low DPI, cached data)
+  python create_map_poster.py -c "Paris" -C "France" --themes noir,sunset --preview
+  
+  # Large print, rendered in bands with bounded memory
+  python create_map_poster.py -c "Rome" -C "Italy" -t warm_beige --dpi 1200 --format tiff
+
   # List themes
   python create_map_poster.py --list-themes
 
@@ -390,7 +1002,23 @@ Options:
   --city, -c        City name (required)
   --country, -C     Country name (required)
   --theme, -t       Theme name (default: feature_based)
+  --themes          Comma-separated theme names rendered from one download
+  --all-themes      Render every available theme from one download
+  --cache-dir       Directory for cached map data (default: cache)
+  --no-cache        Always download map data, never use the cache
+  --lat, --lon      Map center coordinates (skips geocoding)
+  --offline         Never use the network; fail if data is not cached
   --distance, -d    Map radius in meters (default: 29000)
+  --network         Street network: all (default) or adaptive to the map scale
+  --road-loader     Road loading: osmnx (default) or overpass (no networkx graph)
+  --osm-source      Read map data from a local .osm.pbf extract (indexed once)
+  --dpi             Print resolution (default: 300)
+  --format          Poster format: png (default), tiff, or svg/pdf (merged vector geometry)
+  --tiled           Render in bands streamed to disk (automatic for very large prints)
+  --profile [FILE]  Append per-stage timings and memory as a JSON line (default: profile.jsonl)
+  --thumbnails      Also write thumbnails from the render
+  --preview         Quick low-resolution render into previews/
+  --preview-dpi     DPI used by --preview (default: 72)
   --list-themes     List all available themes
 
 Distance guide:
@@ -444,6 +1072,43 @@ Examples:
     parser.add_argument('--country', '-C', type=str, help='Country name')
     parser.add_argument('--theme', '-t', type=str, default='feature_based', help='Theme name (default: feature_based)')
     parser.add_argument('--distance', '-d', type=int, default=29000, help='Map radius in meters (default: 29000)')
+    parser.add_argument('--themes', type=str, help='Comma-separated theme names rendered from a single download')
+    parser.add_argument('--all-themes', action='store_true', help='Render every available theme from a single download')
+    parser.add_argument('--cache-dir', type=str, default=geodata_cache.CACHE_DIR,
+                        help=f'Directory for cached map data (default: {geodata_cache.CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='Always download map data, never use the cache')
+    parser.add_argument('--lat', type=float, help='Latitude of the map center (skips geocoding, needs --lon)')
+    parser.add_argument('--lon', type=float, help='Longitude of the map center (skips geocoding, needs --lat)')
+    parser.add_argument('--offline', action='store_true',
+                        help='Never use the network: fail if coordinates or map data are not cached')
+    parser.add_argument('--thumbnails', nargs='?', const=','.join(generate_thumbnails.DEFAULT_VARIANTS),
+                        metavar='VARIANTS',
+                        help='Also write thumbnails from the render (optional comma-separated variants, '
+                             f"default: {','.join(generate_thumbnails.DEFAULT_VARIANTS)})")
+    parser.add_argument('--network', choices=NETWORK_MODES, default='all',
+                        help="Street network to fetch: 'all' ways, or 'adaptive' to skip ways too small "
+                             "to see at this distance and DPI (default: all)")
+    parser.add_argument('--road-loader', choices=ROAD_LOADERS, default='osmnx',
+                        help="How roads are loaded: 'osmnx' graph, or 'overpass' ways parsed straight "
+                             "into arrays (default: osmnx)")
+    parser.add_argument('--osm-source', type=str, metavar='PBF',
+                        help='Read map data (and place names) from a local .osm.pbf extract; '
+                             'a spatial index is built in the cache directory on first use')
+    parser.add_argument('--preview', action='store_true',
+                        help=f'Quick low-resolution render into {PREVIEWS_DIR}/ (thin roads dropped, polygons simplified)')
+    parser.add_argument('--preview-dpi', type=int, default=PREVIEW_DPI,
+                        help=f'DPI used by --preview (default: {PREVIEW_DPI})')
+    parser.add_argument('--dpi', type=int, default=POSTER_DPI,
+                        help=f'Print resolution of the poster (default: {POSTER_DPI})')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='png',
+                        help='Poster file format; tiff is always rendered tiled, svg/pdf hold merged road '
+                             'polylines snapped to the print resolution (default: png)')
+    parser.add_argument('--tiled', action='store_true',
+                        help='Render in row bands streamed to disk, for large prints with bounded memory '
+                             f'(automatic above {TILED_AUTO_BYTES // (1024 * 1024)} MB of pixels)')
+    parser.add_argument('--profile', nargs='?', const=poster_profile.PROFILE_FILE, metavar='FILE',
+                        help='Record per-stage wall time, CPU time, peak RSS and counts, appended as a '
+                             f'JSON line to FILE (default: {poster_profile.PROFILE_FILE})')
     parser.add_argument('--list-themes', action='store_true', help='List all available themes')
     
     args = parser.parse_args()
@@ -464,40 +1129,107 @@ Examples:
         print_examples()
         os.sys.exit(1)
     
-    # Validate theme exists
-    available_themes = get_available_themes()
-    if args.theme not in available_themes:
-        print(f"Error: Theme '{args.theme}' not found.")
-        print(f"Available themes: {', '.join(available_themes)}")
+    if (args.lat is None) != (args.lon is None):
+        print("Error: --lat and --lon must be given together.")
         os.sys.exit(1)
     
+    # Validate themes exist
+    available_themes = get_available_themes()
+    if args.all_themes:
+        theme_names = available_themes
+    elif args.themes:
+        theme_names = [name.strip() for name in args.themes.split(',') if name.strip()]
+    else:
+        theme_names = [args.theme]
+    
+    for theme_name in theme_names:
+        if theme_name not in available_themes:
+            print(f"Error: Theme '{theme_name}' not found.")
+            print(f"Available themes: {', '.join(available_themes)}")
+            os.sys.exit(1)
+    
+    thumbnail_variants = None
+    if args.thumbnails:
+        thumbnail_variants = [name.strip() for name in args.thumbnails.split(',') if name.strip()]
+        unknown = [name for name in thumbnail_variants if name not in generate_thumbnails.THUMBNAIL_VARIANTS]
+        if unknown:
+            print(f"Error: Unknown thumbnail variant(s): {', '.join(unknown)}")
+            print(f"Available variants: {', '.join(generate_thumbnails.THUMBNAIL_VARIANTS)}")
+            os.sys.exit(1)
+        thumbnail_variants = generate_thumbnails.available_variants(thumbnail_variants)
+    
     print("=" * 50)
     print("City Map Poster Generator")
     print("=" * 50)
     
-    # Load theme
-    THEME = load_theme(args.theme)
+    # Check which posters already exist (previews are always rendered)
+    themes = {theme_name: load_theme(theme_name) for theme_name in theme_names}
+    explicit_point = (args.lat, args.lon) if args.lat is not None else None
+    render_keys = {theme_name: get_render_key(args.city, args.country, theme, args.distance, args.format,
+                                              args.dpi, args.network, explicit_point)
+                   for theme_name, theme in themes.items()}
+    pending_themes = []
+    for theme_name in theme_names:
+        existing_poster = None if args.preview else check_existing_poster(render_keys[theme_name])
+        if existing_poster:
+            print(f"\n📁 Poster already exists: {existing_poster}")
+            print("✓ Skipping generation (file already exists)")
+        else:
+            pending_themes.append(theme_name)
     
-    # Check if poster already exists
-    existing_poster = check_existing_poster(args.city, args.theme)
-    if existing_poster:
-        print(f"\n📁 Poster already exists: {existing_poster}")
-        print("✓ Skipping generation (file already exists)")
+    if not pending_themes:
         print("\n" + "=" * 50)
         print("✓ No generation needed - using existing poster!")
         print("=" * 50)
         os.sys.exit(0)
     
-    # Get coordinates and generate poster
+    # The first theme is rendered, the rest are recolors
+    if args.preview:
+        renders = [(themes[theme_name], generate_preview_filename(args.city, theme_name))
+                   for theme_name in pending_themes]
+    else:
+        renders = [(themes[theme_name],
+                    generate_output_filename(args.city, theme_name, render_keys[theme_name], args.format))
+                   for theme_name in pending_themes]
+    THEME, output_file = renders[0]
+    
+    profile = poster_profile.DISABLED
+    if args.profile:
+        profile = poster_profile.PosterProfile(
+            city=args.city, country=args.country, distance=args.distance, themes=pending_themes,
+            dpi=args.preview_dpi if args.preview else args.dpi, network=args.network,
+            road_loader=args.road_loader, outputs=[path for _, path in renders])
+    
+    # Get coordinates and generate poster(s)
     try:
-        coords = get_coordinates(args.city, args.country)
-        output_file = generate_output_filename(args.city, args.theme)
-        create_poster(args.city, args.country, coords, args.distance, output_file)
+        cache_dir = None if args.no_cache else args.cache_dir
+        local_index = get_osm_index(args.osm_source, cache_dir) if args.osm_source else None
+        if args.lat is not None:
+            coords = (args.lat, args.lon)
+            print(f"✓ Coordinates (from --lat/--lon): {args.lat}, {args.lon}")
+        else:
+            with profile.stage('geocode'):
+                coords = get_coordinates(args.city, args.country,
+                                         cache_file=os.path.join(cache_dir, "geocodes.json") if cache_dir else None,
+                                         offline=args.offline, osm_index=local_index)
+        create_poster(args.city, args.country, coords, args.distance, output_file,
+                      extra_themes=renders[1:], cache_dir=cache_dir, offline=args.offline,
+                      thumbnails=thumbnail_variants, preview_dpi=args.preview_dpi if args.preview else None,
+                      network=args.network, road_loader=args.road_loader, osm_source=args.osm_source,
+                      profile=profile, dpi=args.dpi, tiled=True if args.tiled else None,
+                      render_keys=[render_keys[theme_name] for theme_name in pending_themes])
         
         print("\n" + "=" * 50)
         print("✓ Poster generation complete!")
         print("=" * 50)
         
+        if args.profile:
+            record = profile.to_dict()
+            poster_profile.write_profile(record, args.profile)
+            print()
+            poster_profile.print_stages(record)
+            print(f"\n📊 Profile appended to {args.profile}")
+        
     except Exception as e:
         print(f"\n✗ Error: {e}")
         import traceback
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """
 Python script to generate map posters for all Mexican cities
-Usage: python generate_all_mexico_posters.py
+Usage: python generate_all_mexico_posters.py [--workers N] [--timeout SECONDS]
 """
 
+import argparse
+import os
 import subprocess
 import sys
 import time
@@ -11,12 +13,67 @@ from pathlib import Path
 from tqdm import tqdm
 import json
 
+import batch_engine
+import generate_thumbnails
+import geodata_cache
+import job_queue
+import poster_profile
+import render_server
+import shared_regions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate map posters for all Mexican cities")
+    parser.add_argument('--theme', '-t', type=str, default='neon_cyberpunk',
+                        help='Comma-separated theme names (default: neon_cyberpunk)')
+    parser.add_argument('--distance', '-d', type=int, default=29000, help='Map radius in meters (default: 29000)')
+    parser.add_argument('--network', choices=['all', 'adaptive'], default='all',
+                        help="Street network to fetch: 'all' ways, or 'adaptive' to skip ways too small "
+                             "to see at this distance (default: all)")
+    parser.add_argument('--road-loader', choices=['osmnx', 'overpass'], default='osmnx',
+                        help="How roads are loaded: 'osmnx' graph, or 'overpass' ways parsed straight "
+                             "into arrays (default: osmnx)")
+    parser.add_argument('--osm-source', type=str, metavar='PBF',
+                        help='Read map data and place names from a local .osm.pbf extract instead of '
+                             'downloading them (indexed once into the cache directory)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Render processes (default: number of CPU cores)')
+    parser.add_argument('--io-workers', type=int, default=batch_engine.DEFAULT_IO_WORKERS,
+                        help=f'Concurrent download threads (default: {batch_engine.DEFAULT_IO_WORKERS})')
+    parser.add_argument('--timeout', type=int, default=batch_engine.DEFAULT_TIMEOUT,
+                        help=f'Seconds allowed per city for fetching and for rendering (default: {batch_engine.DEFAULT_TIMEOUT})')
+    parser.add_argument('--cache-dir', type=str, default=geodata_cache.CACHE_DIR,
+                        help=f'Directory for cached map data (default: {geodata_cache.CACHE_DIR})')
+    parser.add_argument('--thumbnails', action='store_true',
+                        help='Write gallery thumbnails straight from each render')
+    parser.add_argument('--profile', nargs='?', const=poster_profile.PROFILE_FILE, metavar='FILE',
+                        help='Profile every city (per-stage time, CPU, peak RSS, counts), append JSON lines '
+                             f'to FILE (default: {poster_profile.PROFILE_FILE}) and print a per-city table')
+    parser.add_argument('--summary-json', type=str, help='Write the per-city result summary to this JSON file')
+    parser.add_argument('--queue', type=str, metavar='FILE',
+                        help='SQLite job queue that makes the run resumable '
+                             '(default: jobs.sqlite in the cache directory)')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Discard an interrupted run in the queue instead of resuming it '
+                             '(needed when the cities or settings have changed)')
+    parser.add_argument('--max-attempts', type=int, default=job_queue.MAX_ATTEMPTS,
+                        help=f'Attempts per city before it counts as failed, retried with exponential backoff '
+                             f'(default: {job_queue.MAX_ATTEMPTS})')
+    parser.add_argument('--no-shared-regions', action='store_true',
+                        help='Download every city on its own instead of once per group of overlapping neighbours')
+    parser.add_argument('--server', type=str, metavar='URL',
+                        help='Send the cities to a running render_server.py (e.g. http://127.0.0.1:8765) '
+                             'instead of starting local workers')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    themes = [name.strip() for name in args.theme.split(',') if name.strip()]
+    
     print("🇲🇽" + "=" * 56 + "🇲🇽")
     print("🎨          MEXICO MAP POSTER GENERATOR          🎨")
     print("🇲🇽" + "=" * 56 + "🇲🇽")
     print()
-    print("🎨 Theme: neon_cyberpunk")
+    print(f"🎨 Theme: {', '.join(themes)}")
     print("🌮 Country: Mexico")
     print("✨ Enhanced with beautiful progress tracking!")
     print()
@@ -46,12 +103,34 @@ def main():
     
     # Process each city with enhanced progress bar
     print("🚀 Starting poster generation with enhanced progress tracking...")
+    print(f"⚙️  Render workers: {args.workers or 'all cores'} | Download threads: {args.io_workers}")
     print()
     
     # Clean progress bar format for better visibility
     bar_format = "{l_bar}{bar:30}{r_bar}"
     
-    with tqdm(cities, 
+    jobs = [batch_engine.make_job(city, "Mexico", themes, args.distance, args.network, args.road_loader,
+                                  args.osm_source) for city in cities]
+    results = []
+    
+    # Resume an interrupted run from the job queue (remote runs are not queued)
+    queue_file = args.queue or os.path.join(args.cache_dir, "jobs.sqlite")
+    if not args.server:
+        try:
+            unfinished = job_queue.enqueue_jobs(jobs, queue_file, fresh=args.fresh)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        states = job_queue.count_states(queue_file)
+        total_cities = sum(states.values())
+        success = states.get('done', 0) + states.get('skipped', 0)
+        failed = states.get('failed', 0)
+        if unfinished < total_cities:
+            print(f"♻️  Resuming interrupted run: {total_cities - unfinished} of {total_cities} cities already finished")
+            print()
+    
+    with tqdm(total=total_cities,
+              initial=success + failed,
               desc="🎨 Generating Posters", 
               unit=" cities", 
               ncols=100,
@@ -61,39 +140,78 @@ def main():
               leave=True,
               dynamic_ncols=True) as pbar:
         
-        for city in pbar:
-            # Update description with current city (clean formatting)
-            city_display = f"{city[:20]}{'...' if len(city) > 20 else ''}"
-            pbar.set_description(f"🎨 Processing: {city_display}")
-            
-            # Prepare command
-            cmd = [
-                "python", "create_map_poster.py",
-                "--city", city,
-                "--country", "Mexico",
-                "--theme", "neon_cyberpunk"
-            ]
-            
-            try:
-                # Run the command
-                result = subprocess.run(cmd, check=True, capture_output=False)
+        def on_result(result):
+            nonlocal success, failed
+            if not args.server:
+                state = job_queue.complete_job(result, queue_file, max_attempts=args.max_attempts)
+                if state == 'pending':
+                    error = result['error'] or ''
+                    tqdm.write(f"\n🔁 Retrying later: {result['city']} - {error[:60]}{'...' if len(error) > 60 else ''}")
+                    return
+            if result['status'] in ('ok', 'skipped'):
                 success += 1
-                # Clean postfix with essential info
-                pbar.set_postfix_str(f"✅{success} ❌{failed}")
-                
-            except subprocess.CalledProcessError as e:
+            else:
                 failed += 1
-                pbar.set_postfix_str(f"✅{success} ❌{failed}")
-                
+                error = result['error'] or ''
                 # Show error cleanly
-                tqdm.write(f"\n🔴 Failed: {city} - {str(e)[:60]}{'...' if len(str(e)) > 60 else ''}")
-                
-            except KeyboardInterrupt:
-                tqdm.write("\n🛑 Process interrupted by user")
-                break
-            
-            # Add delay between requests to be respectful to APIs
-            time.sleep(2)
+                tqdm.write(f"\n🔴 Failed: {result['city']} - {error[:60]}{'...' if len(error) > 60 else ''}")
+            pbar.set_description(f"🎨 Finished: {result['city'][:20]}{'...' if len(result['city']) > 20 else ''}")
+            # Clean postfix with essential info
+            pbar.set_postfix_str(f"✅{success} ❌{failed}")
+            pbar.update(1)
+        
+        try:
+            if args.server:
+                results = render_server.run_remote_batch(
+                    args.server, jobs, concurrency=args.io_workers + (args.workers or 2),
+                    on_result=on_result, thumbnails=args.thumbnails)
+            else:
+                if args.osm_source:
+                    import create_map_poster
+                    create_map_poster.get_osm_index(args.osm_source, args.cache_dir)
+                regions = None
+                if not args.no_shared_regions:
+                    regions = shared_regions.plan_shared_regions(jobs, args.cache_dir)
+                    if len(regions):
+                        tqdm.write(f"🧩 {regions.count_cities()} neighbouring cities share {len(regions)} "
+                                   f"region downloads")
+                while True:
+                    results += batch_engine.run_batch(
+                        job_queue.iter_claims(queue_file),
+                        workers=args.workers,
+                        io_workers=args.io_workers,
+                        timeout=args.timeout,
+                        cache_dir=args.cache_dir,
+                        on_result=on_result,
+                        thumbnails=generate_thumbnails.available_variants(generate_thumbnails.DEFAULT_VARIANTS) if args.thumbnails else None,
+                        profile_file=args.profile,
+                        regions=regions,
+                    )
+                    retry_at = job_queue.next_retry_time(queue_file)
+                    if retry_at is None:
+                        break
+                    delay = retry_at - time.time()
+                    if delay > 0:
+                        tqdm.write(f"\n⏳ Waiting {delay:.0f}s before retrying failed cities...")
+                        time.sleep(delay)
+                # Keep the last attempt of every retried city
+                results = list({result['queue_id']: result for result in results}.values())
+        except KeyboardInterrupt:
+            tqdm.write("\n🛑 Process interrupted by user")
+            if not args.server:
+                tqdm.write(f"♻️  Run the same command again to resume from {queue_file}")
+    
+    if results:
+        print()
+        batch_engine.print_summary(results)
+        if args.profile:
+            print()
+            poster_profile.print_profile_table([result['profile'] for result in results if result['profile']])
+            print(f"\n📊 Stage profiles appended to {args.profile}")
+        if args.summary_json:
+            with open(args.summary_json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print(f"\n📄 Summary written to {args.summary_json}")
     
     # Print enhanced summary
     print()
@@ -1,134 +1,118 @@
 #!/usr/bin/env python3
 """
 Script to generate a JSON list of all poster files for the GitHub Pages gallery
+
+Poster metadata comes from posters/manifest.json, which the renderer updates
+as it writes posters. Only files added, changed or removed since the last run
+are looked at again.
 """
 
+import glob
 import json
-import os
 from pathlib import Path
 
+import poster_manifest
+import render_store
+
+# Popular Mexican cities for highlighting
+POPULAR_CITIES = [
+    'Mexico City', 'Guadalajara', 'Monterrey', 'Puebla', 'Tijuana',
+    'León', 'Juárez', 'Torreón', 'Querétaro', 'San Luis Potosí'
+]
+
+# Map theme display names
+THEME_DISPLAY_MAP = {
+    'neon_cyberpunk': 'Neon Cyberpunk',
+    'contrast_zones': 'Contrast Zones',
+    'noir': 'Noir',
+    'blueprint': 'Blueprint',
+    'forest': 'Forest',
+    'ocean': 'Ocean',
+    'sunset': 'Sunset',
+    'autumn': 'Autumn',
+    'warm_beige': 'Warm Beige'
+}
+
+OUTPUT_FILE = Path("posters-list.json")
+THUMBS_DIR = Path("thumbnails")
+# Thumbnail formats offered ahead of the JPEG thumbnail, smallest first
+THUMBNAIL_SOURCES = (('.avif', 'image/avif'), ('.webp', 'image/webp'))
+
+def poster_list_entry(entry):
+    """Convert a manifest entry into a posters-list.json record."""
+    theme = entry['theme']
+    poster_info = {
+        'city': entry['city'],
+        'country': entry['country'],
+        'filename': entry['filename'],
+        'path': entry['path'],
+        'theme': theme,
+        'themeDisplay': THEME_DISPLAY_MAP.get(theme, theme.replace('_', ' ').title()),
+        'isPopular': entry['city'] in POPULAR_CITIES,
+        'size': entry['bytes'],
+    }
+    if entry.get('thumbnailPath'):
+        poster_info['thumbnailPath'] = entry['thumbnailPath']
+        stem = Path(entry['thumbnailPath']).with_suffix('')
+        sources = [{'path': f"{stem}{suffix}", 'type': mime} for suffix, mime in THUMBNAIL_SOURCES
+                   if Path(f"{stem}{suffix}").exists()]
+        if sources:
+            poster_info['thumbnailSources'] = sources
+    return poster_info
+
+def remove_superseded_posters(posters_dir, thumbs_dir=THUMBS_DIR):
+    """
+    One-time migration from timestamped filenames: delete each legacy
+    poster (and its thumbnails) once its keyed replacement is recorded in
+    the render store. Returns the removed poster filenames.
+    """
+    store_file = Path(posters_dir) / render_store.RENDER_STORE_NAME
+    removed = []
+    for path in map(Path, render_store.find_superseded_posters(str(store_file))):
+        for thumbnail in thumbs_dir.glob(f"{glob.escape(path.stem)}_*"):
+            thumbnail.unlink()
+        path.unlink()
+        removed.append(path.name)
+    return removed
+
+def write_posters_list(entries, output_file=OUTPUT_FILE):
+    """
+    Write posters-list.json from manifest entries.
+    The file is left untouched when its content would not change.
+    """
+    posters_list = [poster_list_entry(entries[filename]) for filename in sorted(entries)]
+    content = json.dumps(posters_list, indent=2, ensure_ascii=False)
+    if output_file.exists() and output_file.read_text(encoding='utf-8') == content:
+        return posters_list, False
+    output_file.write_text(content, encoding='utf-8')
+    return posters_list, True
+
 def generate_posters_list():
     """Generate a JSON file listing all poster files"""
-    posters_dir = Path("posters")
-    posters_list = []
-    
-    # Popular Mexican cities for highlighting
-    popular_cities = [
-        'Mexico City', 'Guadalajara', 'Monterrey', 'Puebla', 'Tijuana',
-        'León', 'Juárez', 'Torreón', 'Querétaro', 'San Luis Potosí'
-    ]
-    
-    print("🔍 Scanning posters directory...")
-    
+    posters_dir = Path(poster_manifest.POSTERS_DIR)
+
+    print("🔍 Updating poster manifest...")
+
     if not posters_dir.exists():
         print("❌ Posters directory not found!")
         return
-    
-    # Find all image files in the posters directory
-    image_extensions = ['.png', '.jpg', '.jpeg', '.svg', '.pdf']
-    poster_files = []
-    
-    for ext in image_extensions:
-        poster_files.extend(posters_dir.glob(f"*{ext}"))
-    
-    print(f"📊 Found {len(poster_files)} poster files")
-    
-    for poster_file in sorted(poster_files):
-        # Extract city name from filename - handle Mexican cities properly
-        filename_parts = poster_file.stem.split('_')
-        
-        # Map known Mexican cities from filename format
-        city_mapping = {
-            'mexico': 'Mexico City',
-            'guadalajara': 'Guadalajara',
-            'monterrey': 'Monterrey', 
-            'puebla': 'Puebla',
-            'tijuana': 'Tijuana',
-            'león': 'León',
-            'juárez': 'Juárez',
-            'torreón': 'Torreón',
-            'querétaro': 'Querétaro',
-            'nuevo': 'Nuevo Laredo'  # Handle nuevo_laredo case
-        }
-        
-        if len(filename_parts) >= 1:
-            city_key = filename_parts[0].lower()
-            if city_key in city_mapping:
-                city = city_mapping[city_key]
-            elif city_key == 'nuevo' and len(filename_parts) >= 2 and filename_parts[1] == 'laredo':
-                city = 'Nuevo Laredo'
-            else:
-                # Capitalize first letter for unknown cities
-                city = filename_parts[0].replace('_', ' ').title()
-        else:
-            city = poster_file.stem.replace('_', ' ').title()
-        
-        # Extract theme from filename (format: city_theme_timestamp.png)
-        import re
-        
-        # Remove timestamp from filename first
-        filename_no_ext = poster_file.stem
-        # Remove timestamp pattern (20YYMMDD_HHMMSS)
-        filename_clean = re.sub(r'_\d{8}_\d{6}$', '', filename_no_ext)
-        
-        # Default theme
-        theme = 'neon_cyberpunk'
-        
-        # Split into parts
-        parts = filename_clean.split('_')
-        
-        # Extract theme based on city pattern
-        if len(parts) >= 2:
-            if parts[0].lower() == 'mexico' and len(parts) >= 4:
-                # mexico_city_theme_parts
-                theme_parts = parts[2:]
-            elif parts[0].lower() == 'nuevo' and len(parts) >= 4:
-                # nuevo_laredo_theme_parts
-                theme_parts = parts[2:]
-            else:
-                # city_theme_parts
-                theme_parts = parts[1:]
-            
-            if theme_parts:
-                theme = '_'.join(theme_parts)
-        
-        # Map theme display names
-        theme_display_map = {
-            'neon_cyberpunk': 'Neon Cyberpunk',
-            'contrast_zones': 'Contrast Zones', 
-            'noir': 'Noir',
-            'blueprint': 'Blueprint',
-            'forest': 'Forest',
-            'ocean': 'Ocean',
-            'sunset': 'Sunset',
-            'autumn': 'Autumn',
-            'warm_beige': 'Warm Beige'
-        }
-        
-        theme_display = theme_display_map.get(theme, theme.replace('_', ' ').title())
-        
-        poster_info = {
-            'city': city,
-            'country': 'Mexico',
-            'filename': poster_file.name,
-            'path': f"posters/{poster_file.name}",
-            'theme': theme,
-            'themeDisplay': theme_display,
-            'isPopular': city in popular_cities,
-            'size': poster_file.stat().st_size if poster_file.exists() else 0
-        }
-        
-        posters_list.append(poster_info)
-        print(f"✅ Added: {city}")
-    
-    # Write JSON file
-    output_file = Path("posters-list.json")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(posters_list, f, indent=2, ensure_ascii=False)
-    
-    print(f"\n🎉 Generated {output_file} with {len(posters_list)} posters")
+
+    for filename in remove_superseded_posters(posters_dir):
+        print(f"🧹 Replaced by a keyed render: {filename}")
+    entries, changed, removed = poster_manifest.update_manifest(str(posters_dir))
+    print(f"📊 {len(entries)} posters in manifest ({len(changed)} new or changed, {len(removed)} removed)")
+    for filename in changed:
+        print(f"✅ Added: {entries[filename]['city']} ({filename})")
+    for filename in removed:
+        print(f"🗑️  Removed: {filename}")
+
+    posters_list, written = write_posters_list(entries)
+    if written:
+        print(f"\n🎉 Generated {OUTPUT_FILE} with {len(posters_list)} posters")
+    else:
+        print(f"\n⏭️  {OUTPUT_FILE} is up to date ({len(posters_list)} posters)")
     print(f"📁 Popular cities found: {len([p for p in posters_list if p['isPopular']])}")
-    
+
     return posters_list
 
 def main():
@@ -152,4 +136,4 @@ def main():
         print("   python generate_all_mexico_posters.py")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
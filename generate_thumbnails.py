@@ -3,15 +3,142 @@
 Script to generate thumbnails for all posters in the gallery
 """
 
+import argparse
+import importlib.util
 import os
-import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from PIL import Image
 
-def generate_thumbnails():
+import generate_gallery_list
+import poster_manifest
+from lazy_imports import lazy_import
+
+# Pillow loads on first use; create_map_poster imports this module for its
+# variant names only
+Image = lazy_import('PIL.Image')
+features = lazy_import('PIL.features')
+
+THUMBS_DIR = Path("thumbnails")
+POSTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Output variants: box size (width x height), format and encoder options.
+# Padded variants are centered on a white card of exactly that size (gallery
+# cards); the others are fitted inside the box.
+THUMBNAIL_VARIANTS = {
+    'thumb': {'suffix': '_thumb.jpg', 'size': (400, 300), 'format': 'JPEG',
+              'options': {'quality': 85, 'optimize': True}, 'pad': True},
+    'thumb_webp': {'suffix': '_thumb.webp', 'size': (400, 300), 'format': 'WEBP',
+                   'options': {'quality': 80, 'method': 4}, 'pad': True},
+    'thumb_avif': {'suffix': '_thumb.avif', 'size': (400, 300), 'format': 'AVIF',
+                   'options': {'quality': 60}, 'pad': True},
+    'preview': {'suffix': '_preview.jpg', 'size': (1200, 1600), 'format': 'JPEG',
+                'options': {'quality': 85, 'optimize': True}, 'pad': False},
+    'preview_webp': {'suffix': '_preview.webp', 'size': (1200, 1600), 'format': 'WEBP',
+                     'options': {'quality': 80, 'method': 4}, 'pad': False},
+}
+DEFAULT_VARIANTS = ['thumb', 'thumb_webp', 'thumb_avif']
+
+def available_variants(names):
+    """Drop variants whose format this Pillow build cannot encode."""
+    codecs = {'WEBP': features.check('webp'), 'AVIF': features.check('avif')}
+    return [name for name in names if codecs.get(THUMBNAIL_VARIANTS[name]['format'], True)]
+
+def _fit_size(image_size, box):
+    """Largest size with the image's aspect ratio that fits inside box."""
+    img_ratio = image_size[0] / image_size[1]
+    box_ratio = box[0] / box[1]
+    if img_ratio > box_ratio:
+        # Image is wider, fit to width
+        return box[0], max(1, int(box[0] / img_ratio))
+    # Image is taller, fit to height
+    return max(1, int(box[1] * img_ratio)), box[1]
+
+def _flatten(img):
+    """Composite transparency onto white and return an RGB image."""
+    if img.mode in ('RGBA', 'LA'):
+        white_bg = Image.new('RGB', img.size, 'white')
+        white_bg.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
+        return white_bg
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+def make_thumbnail_variants(img, variant_names):
+    """
+    Resize one decoded image into every requested variant.
+    Sizes are produced largest first; each step shrinks by an integer factor
+    with Image.reduce() down to about twice the target and reuses that buffer
+    for the smaller sizes, so LANCZOS only runs over a small image.
+    Returns {variant name: RGB image}.
+    """
+    resized = {}
+    source = img
+    for box in sorted({THUMBNAIL_VARIANTS[name]['size'] for name in variant_names}, reverse=True):
+        target = _fit_size(img.size, box)
+        factor = min(source.width // (2 * target[0]), source.height // (2 * target[1]))
+        if factor >= 2:
+            source = source.reduce(factor)
+        resized[box] = _flatten(source.resize(target, Image.LANCZOS))
+
+    variants = {}
+    for name in variant_names:
+        variant = THUMBNAIL_VARIANTS[name]
+        image = resized[variant['size']]
+        if variant['pad'] and image.size != variant['size']:
+            # Center the resized image on a white card
+            card = Image.new('RGB', variant['size'], 'white')
+            card.paste(image, ((variant['size'][0] - image.width) // 2,
+                               (variant['size'][1] - image.height) // 2))
+            image = card
+        variants[name] = image
+    return variants
+
+def save_thumbnail_variants(img, stem, thumbs_dir=THUMBS_DIR, variant_names=DEFAULT_VARIANTS):
+    """
+    Write every variant of an already decoded poster image.
+    Returns a list of (path, bytes) for the written files.
+    """
+    os.makedirs(thumbs_dir, exist_ok=True)
+    written = []
+    for name, image in make_thumbnail_variants(img, variant_names).items():
+        variant = THUMBNAIL_VARIANTS[name]
+        path = os.path.join(thumbs_dir, f"{stem}{variant['suffix']}")
+        image.save(path, variant['format'], **variant['options'])
+        written.append((path, os.path.getsize(path)))
+    return written
+
+def thumbnail_poster(poster_path, thumbs_dir=THUMBS_DIR, variant_names=DEFAULT_VARIANTS):
+    """Decode one poster once and write all its variants. Runs in a worker process."""
+    start = time.perf_counter()
+    with Image.open(poster_path) as img:
+        if img.format == 'JPEG':
+            # Let libjpeg decode at reduced scale straight away
+            largest = max(THUMBNAIL_VARIANTS[name]['size'] for name in variant_names)
+            img.draft('RGB', (largest[0] * 2, largest[1] * 2))
+        source_size = img.size
+        img.load()
+        written = save_thumbnail_variants(img, Path(poster_path).stem, thumbs_dir, variant_names)
+    return {
+        'poster': poster_path,
+        'poster_bytes': os.path.getsize(poster_path),
+        'source_size': source_size,
+        'written': written,
+        'seconds': time.perf_counter() - start,
+    }
+
+def _is_up_to_date(poster_file, thumbs_dir, variant_names):
+    poster_time = poster_file.stat().st_mtime
+    for name in variant_names:
+        thumb_path = thumbs_dir / f"{poster_file.stem}{THUMBNAIL_VARIANTS[name]['suffix']}"
+        if not thumb_path.exists() or thumb_path.stat().st_mtime < poster_time:
+            return False
+    return True
+
+def generate_thumbnails(workers=None, variant_names=DEFAULT_VARIANTS, force=False):
     """Generate thumbnails for all poster images"""
     posters_dir = Path("posters")
-    thumbs_dir = Path("thumbnails")
+    thumbs_dir = THUMBS_DIR
     
     print("🖼️  Generating thumbnails for better performance...")
     print("=" * 60)
@@ -19,165 +146,110 @@ def generate_thumbnails():
     # Create thumbnails directory if it doesn't exist
     thumbs_dir.mkdir(exist_ok=True)
     
-    # Thumbnail settings
-    THUMB_SIZE = (400, 300)  # Width x Height for gallery cards
-    QUALITY = 85  # JPEG quality (1-100)
-    
     if not posters_dir.exists():
         print("❌ Posters directory not found!")
         return []
     
-    # Find all image files
-    image_extensions = ['.png', '.jpg', '.jpeg']
-    poster_files = []
-    
-    for ext in image_extensions:
-        poster_files.extend(posters_dir.glob(f"*{ext}"))
-    
+    variant_names = available_variants(variant_names)
+    poster_files = sorted(p for p in posters_dir.iterdir() if p.suffix.lower() in POSTER_EXTENSIONS)
     print(f"📊 Found {len(poster_files)} poster files")
+    print(f"🎛️  Variants: {', '.join(variant_names)}")
     
-    generated_count = 0
-    skipped_count = 0
-    
+    # Skip posters whose thumbnails already exist and are newer than the original
+    pending = []
     for poster_file in poster_files:
-        # Create thumbnail filename
-        thumb_filename = f"{poster_file.stem}_thumb.jpg"
-        thumb_path = thumbs_dir / thumb_filename
-        
-        # Check if thumbnail already exists and is newer than original
-        if thumb_path.exists():
-            poster_time = poster_file.stat().st_mtime
-            thumb_time = thumb_path.stat().st_mtime
-            
-            if thumb_time >= poster_time:
-                print(f"⏭️  Skipping (exists): {poster_file.name}")
-                skipped_count += 1
+        if not force and _is_up_to_date(poster_file, thumbs_dir, variant_names):
+            continue
+        pending.append(poster_file)
+    skipped_count = len(poster_files) - len(pending)
+    
+    generated_count = 0
+    total_original = 0
+    total_thumbs = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = {pool.submit(thumbnail_poster, str(poster_file), str(thumbs_dir), variant_names): poster_file
+                   for poster_file in pending}
+        for future in as_completed(futures):
+            poster_file = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ Error processing {poster_file.name}: {e}")
                 continue
-        
-        try:
-            # Open and process image
-            with Image.open(poster_file) as img:
-                # Convert RGBA to RGB if necessary (for PNG with transparency)
-                if img.mode in ('RGBA', 'LA'):
-                    # Create white background
-                    white_bg = Image.new('RGB', img.size, 'white')
-                    if img.mode == 'RGBA':
-                        white_bg.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
-                    else:
-                        white_bg.paste(img)
-                    img = white_bg
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Calculate thumbnail size maintaining aspect ratio
-                img_ratio = img.width / img.height
-                thumb_ratio = THUMB_SIZE[0] / THUMB_SIZE[1]
-                
-                if img_ratio > thumb_ratio:
-                    # Image is wider, fit to width
-                    new_width = THUMB_SIZE[0]
-                    new_height = int(THUMB_SIZE[0] / img_ratio)
-                else:
-                    # Image is taller, fit to height
-                    new_height = THUMB_SIZE[1]
-                    new_width = int(THUMB_SIZE[1] * img_ratio)
-                
-                # Resize with high-quality resampling
-                thumbnail = img.resize((new_width, new_height), Image.LANCZOS)
-                
-                # Create final thumbnail with padding if needed
-                final_thumb = Image.new('RGB', THUMB_SIZE, 'white')
-                
-                # Center the resized image
-                x_offset = (THUMB_SIZE[0] - new_width) // 2
-                y_offset = (THUMB_SIZE[1] - new_height) // 2
-                final_thumb.paste(thumbnail, (x_offset, y_offset))
-                
-                # Save thumbnail
-                final_thumb.save(thumb_path, 'JPEG', quality=QUALITY, optimize=True)
-                
-                # Get file sizes
-                original_size = poster_file.stat().st_size
-                thumb_size = thumb_path.stat().st_size
-                reduction = (1 - thumb_size / original_size) * 100
-                
-                print(f"✅ Generated: {thumb_filename}")
-                print(f"   📏 Size: {new_width}x{new_height} (from {img.width}x{img.height})")
-                print(f"   💾 Size: {thumb_size//1024}KB (was {original_size//1024}KB, {reduction:.1f}% reduction)")
-                
-                generated_count += 1
-                
-        except Exception as e:
-            print(f"❌ Error processing {poster_file.name}: {e}")
+            
+            thumb_bytes = sum(size for _, size in result['written'])
+            total_original += result['poster_bytes']
+            total_thumbs += thumb_bytes
+            generated_count += 1
+            width, height = result['source_size']
+            print(f"✅ Generated: {poster_file.stem} ({len(result['written'])} variants from {width}x{height}, "
+                  f"{thumb_bytes//1024}KB, {result['seconds']:.2f}s)")
     
     print()
     print("=" * 60)
     print(f"🎉 Thumbnail generation complete!")
     print(f"   ✅ Generated: {generated_count}")
     print(f"   ⏭️  Skipped: {skipped_count}")
+    print(f"   ⏱️  Time: {time.perf_counter() - start:.1f}s")
     print(f"   📁 Thumbnails saved to: {thumbs_dir}")
     
-    # Calculate total savings
-    if generated_count > 0:
-        total_original = sum(f.stat().st_size for f in poster_files)
-        total_thumbs = sum(f.stat().st_size for f in thumbs_dir.glob("*.jpg"))
-        total_savings = (1 - total_thumbs / total_original) * 100 if total_original > 0 else 0
-        
+    # Savings of the newly generated thumbnails
+    if generated_count > 0 and total_original > 0:
+        total_savings = (1 - total_thumbs / total_original) * 100
         print(f"   💾 Total size reduction: {total_savings:.1f}%")
         print(f"   🚀 Gallery will load {total_savings:.1f}% faster!")
 
 def update_posters_json_with_thumbnails():
-    """Update the posters JSON to include thumbnail paths"""
-    print("\n🔄 Updating posters-list.json with thumbnail paths...")
+    """Record thumbnail paths in the poster manifest and refresh posters-list.json"""
+    print("\n🔄 Updating poster manifest with thumbnail paths...")
     
-    json_file = Path("posters-list.json")
     thumbs_dir = Path("thumbnails")
+    entries, _, _ = poster_manifest.update_manifest()
     
-    if not json_file.exists():
-        print("❌ posters-list.json not found!")
-        return
-    
-    # Read current JSON
-    with open(json_file, 'r', encoding='utf-8') as f:
-        posters = json.load(f)
-    
-    updated_count = 0
+    # Only posters without a known thumbnail need to be checked
+    thumbnails = {}
+    for filename, entry in entries.items():
+        if entry.get('thumbnailPath'):
+            continue
+        thumb_filename = f"{Path(filename).stem}_thumb.jpg"
+        if (thumbs_dir / thumb_filename).exists():
+            thumbnails[filename] = f"thumbnails/{thumb_filename}"
     
-    for poster in posters:
-        # Generate expected thumbnail filename
-        poster_filename = Path(poster['filename'])
-        thumb_filename = f"{poster_filename.stem}_thumb.jpg"
-        thumb_path = thumbs_dir / thumb_filename
-        
-        if thumb_path.exists():
-            poster['thumbnailPath'] = f"thumbnails/{thumb_filename}"
-            updated_count += 1
-        else:
-            # Fallback to original image if thumbnail doesn't exist
-            poster['thumbnailPath'] = poster['path']
+    entries = poster_manifest.set_thumbnails(thumbnails)
+    _, written = generate_gallery_list.write_posters_list(entries)
     
-    # Write updated JSON
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(posters, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ Updated {updated_count} entries with thumbnail paths")
+    print(f"✅ Updated {len(thumbnails)} entries with thumbnail paths")
+    if written:
+        print("✅ Rewrote posters-list.json")
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate gallery thumbnails for all posters")
+    parser.add_argument('--workers', '-w', type=int, help='Thumbnail processes (default: CPU count)')
+    parser.add_argument('--variants', type=str, default=','.join(DEFAULT_VARIANTS),
+                        help=f"Comma-separated variants: {', '.join(THUMBNAIL_VARIANTS)} "
+                             f"(default: {','.join(DEFAULT_VARIANTS)})")
+    parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that are up to date')
+    args = parser.parse_args()
+    
+    variant_names = [name.strip() for name in args.variants.split(',') if name.strip()]
+    unknown = [name for name in variant_names if name not in THUMBNAIL_VARIANTS]
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(unknown)}")
+    
     print("🖼️  THUMBNAIL GENERATOR")
     print("🚀 Optimizing gallery performance with thumbnails")
     print("=" * 60)
     
     # Check if PIL is available
-    try:
-        from PIL import Image
-        print("✅ PIL (Pillow) found - ready to generate thumbnails")
-    except ImportError:
+    if importlib.util.find_spec('PIL') is None:
         print("❌ PIL (Pillow) not found!")
         print("📦 Install with: pip install Pillow")
         return
+    print("✅ PIL (Pillow) found - ready to generate thumbnails")
     
     # Generate thumbnails
-    generate_thumbnails()
+    generate_thumbnails(workers=args.workers, variant_names=variant_names, force=args.force)
     
     # Update JSON
     update_posters_json_with_thumbnails()
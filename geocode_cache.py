@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Persistent geocode store for get_coordinates().
+
+Resolved coordinates are kept in a JSON index keyed by a normalized
+"city, country" string, so re-rendering a city never waits on Nominatim.
+"""
+
+import json
+import os
+import threading
+import unicodedata
+from datetime import datetime
+
+import geodata_cache
+
+GEOCODE_CACHE_FILE = os.path.join(geodata_cache.CACHE_DIR, "geocodes.json")
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (mtime, entries)
+
+def normalize_query(city, country):
+    """
+    Normalize a city/country pair into the store key.
+    Case, Unicode composition and repeated whitespace are ignored.
+    """
+    def clean(text):
+        return " ".join(unicodedata.normalize('NFC', text).split()).casefold()
+    return f"{clean(city)}, {clean(country)}"
+
+def load_geocodes(path=GEOCODE_CACHE_FILE):
+    """
+    Return every stored entry as a dict keyed by normalized query.
+    The file is only re-read when it changed on disk.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable geocode cache {path}: {e}")
+            entries = {}
+        _loaded[path] = (mtime, entries)
+        return entries
+
+def lookup(city, country, path=GEOCODE_CACHE_FILE):
+    """
+    Return the stored entry for city/country, or None on a miss.
+    Entries are dicts with 'lat', 'lon', 'address' and 'resolved'.
+    """
+    return load_geocodes(path).get(normalize_query(city, country))
+
+def store(city, country, lat, lon, address=None, path=GEOCODE_CACHE_FILE):
+    """
+    Add or replace the entry for city/country.
+    Entries written by other processes since the last read are kept.
+    """
+    entry = {
+        'city': city,
+        'country': country,
+        'lat': lat,
+        'lon': lon,
+        'address': address,
+        'resolved': datetime.now().isoformat(timespec='seconds'),
+    }
+    with _lock:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        entries[normalize_query(city, country)] = entry
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, path)
+        _loaded[path] = (os.path.getmtime(path), entries)
+    return entry
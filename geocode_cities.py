@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script to pre-resolve coordinates for a whole cities file into the geocode cache
+Usage: python geocode_cities.py [--cities-file mexico_cities_full.txt] [--country Mexico]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import batch_engine
+import geocode_cache
+import geodata_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve coordinates for every city in a file once")
+    parser.add_argument('--cities-file', type=str, default='mexico_cities_full.txt',
+                        help='File with one city per line (default: mexico_cities_full.txt)')
+    parser.add_argument('--country', '-C', type=str, default='Mexico', help='Country of the cities (default: Mexico)')
+    parser.add_argument('--cache-dir', type=str, default=geodata_cache.CACHE_DIR,
+                        help=f'Cache directory holding geocodes.json (default: {geodata_cache.CACHE_DIR})')
+    parser.add_argument('--refresh', action='store_true', help='Look up cities again even if already cached')
+    args = parser.parse_args()
+
+    cities_file = Path(args.cities_file)
+    if not cities_file.exists():
+        print(f"❌ Error: cities file not found: {cities_file}")
+        sys.exit(1)
+
+    with open(cities_file, 'r', encoding='utf-8') as f:
+        cities = [line.strip() for line in f if line.strip()]
+
+    cache_file = os.path.join(args.cache_dir, "geocodes.json")
+    if args.refresh:
+        missing = cities
+    else:
+        missing = [city for city in cities if not geocode_cache.lookup(city, args.country, cache_file)]
+
+    print("📍 GEOCODE PRE-RESOLVER")
+    print("=" * 50)
+    print(f"📋 Cities file: {cities_file.name} ({len(cities)} cities)")
+    print(f"💾 Geocode cache: {cache_file}")
+    print(f"✅ Already cached: {len(cities) - len(missing)}")
+    print(f"🔍 To resolve: {len(missing)}")
+    print()
+
+    if not missing:
+        print("🎉 Every city is already resolved - batch runs need no geocoding!")
+        return
+
+    import create_map_poster
+
+    limiter = batch_engine.RateLimiter(batch_engine.DEFAULT_REQUEST_INTERVAL)
+    failed = []
+    for i, city in enumerate(missing, 1):
+        print(f"[{i}/{len(missing)}] {city}")
+        try:
+            if args.refresh:
+                lat, lon = create_map_poster.get_coordinates(city, args.country, throttle=limiter.wait,
+                                                             cache_file=None)
+                geocode_cache.store(city, args.country, lat, lon, path=cache_file)
+            else:
+                create_map_poster.get_coordinates(city, args.country, throttle=limiter.wait,
+                                                  cache_file=cache_file)
+        except Exception as e:
+            print(f"   ❌ {e}")
+            failed.append(city)
+
+    print()
+    print("=" * 50)
+    print(f"✅ Resolved: {len(missing) - len(failed)}")
+    print(f"❌ Failed: {len(failed)}")
+    for city in failed:
+        print(f"   └─ {city}")
+
+if __name__ == "__main__":
+    main()
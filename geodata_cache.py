@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for parsed map data.
+
+Street graphs are stored as compact NumPy arrays and water/park layers as
+GeoParquet, so a warm re-render skips both the Overpass download and the
+JSON -> networkx build. Entries are content-addressed by their query
+parameters and evicted least-recently-used once the cache exceeds its cap.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from lazy_imports import lazy_import
+
+# Loaded on first use: importing the cache for CACHE_DIR stays cheap
+gpd = lazy_import('geopandas')
+nx = lazy_import('networkx')
+np = lazy_import('numpy')
+shapely = lazy_import('shapely')
+road_renderer = lazy_import('road_renderer')
+
+CACHE_DIR = "cache"
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+CACHE_VERSION = 1
+
+GRAPH_SUFFIX = ".graph.npz"
+FEATURES_SUFFIX = ".features.parquet"
+ROADS_SUFFIX = ".roads.npz"
+
+def make_cache_key(kind, point, dist, **params):
+    """
+    Build a stable cache key from the query that produced the data.
+    Coordinates are rounded to ~1 m so re-geocoded points still hit.
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'kind': kind,
+        'point': [round(point[0], 5), round(point[1], 5)],
+        'dist': dist,
+        'params': params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+def _entry_path(cache_dir, key, suffix):
+    return os.path.join(cache_dir, f"{key}{suffix}")
+
+def has_entry(cache_dir, key, suffix):
+    """Whether an entry for key with suffix (e.g. ROADS_SUFFIX) is cached, without loading it."""
+    return bool(cache_dir) and os.path.exists(_entry_path(cache_dir, key, suffix))
+
+def _touch(path):
+    """Mark an entry as recently used for LRU eviction."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _atomic_write(path, write):
+    """Write through a temporary file so readers never see partial entries."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # A unique name per call, so threads writing the same key never share it
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def graph_to_arrays(G):
+    """
+    Flatten a street graph into the arrays stored on disk.
+    Only what the poster renderer uses is kept: node positions, edge
+    endpoints, the (first) highway tag and any edge geometry.
+    """
+    node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+    node_x = np.array([G.nodes[n]['x'] for n in node_ids], dtype=np.float64)
+    node_y = np.array([G.nodes[n]['y'] for n in node_ids], dtype=np.float64)
+
+    edge_u, edge_v, edge_key, highways = [], [], [], []
+    offsets = [0]
+    coords = []
+    for u, v, k, data in G.edges(keys=True, data=True):
+        edge_u.append(u)
+        edge_v.append(v)
+        edge_key.append(k)
+
+        highway = data.get('highway', 'unclassified')
+        if isinstance(highway, list):
+            highway = highway[0] if highway else 'unclassified'
+        highways.append(highway)
+
+        geometry = data.get('geometry')
+        if geometry is not None:
+            coords.append(shapely.get_coordinates(geometry))
+        offsets.append(offsets[-1] + (len(coords[-1]) if geometry is not None else 0))
+
+    return {
+        'crs': np.array(str(G.graph.get('crs', 'epsg:4326'))),
+        'node_ids': node_ids,
+        'node_x': node_x,
+        'node_y': node_y,
+        'edge_u': np.array(edge_u, dtype=np.int64),
+        'edge_v': np.array(edge_v, dtype=np.int64),
+        'edge_key': np.array(edge_key, dtype=np.int64),
+        'edge_highway': np.array(highways, dtype=str),
+        'edge_offsets': np.array(offsets, dtype=np.int64),
+        'edge_coords': np.concatenate(coords) if coords else np.empty((0, 2)),
+    }
+
+def arrays_to_graph(arrays):
+    """
+    Rebuild a MultiDiGraph that osmnx can plot from stored arrays.
+    """
+    G = nx.MultiDiGraph(crs=str(arrays['crs']))
+    G.add_nodes_from(
+        (int(n), {'x': float(x), 'y': float(y)})
+        for n, x, y in zip(arrays['node_ids'], arrays['node_x'], arrays['node_y'])
+    )
+
+    offsets = arrays['edge_offsets']
+    counts = np.diff(offsets)
+    has_geometry = counts > 0
+    geometries = np.full(len(counts), None, dtype=object)
+    if has_geometry.any():
+        indices = np.repeat(np.arange(has_geometry.sum()), counts[has_geometry])
+        geometries[has_geometry] = shapely.linestrings(arrays['edge_coords'], indices=indices)
+
+    edges = []
+    for u, v, k, highway, geometry in zip(arrays['edge_u'].tolist(), arrays['edge_v'].tolist(),
+                                          arrays['edge_key'].tolist(), arrays['edge_highway'].tolist(),
+                                          geometries):
+        data = {'highway': highway}
+        if geometry is not None:
+            data['geometry'] = geometry
+        edges.append((u, v, k, data))
+    G.add_edges_from(edges)
+    return G
+
+def load_graph_arrays(cache_dir, key):
+    """
+    Return the cached street graph arrays for key, or None on a miss.
+    """
+    path = _entry_path(cache_dir, key, GRAPH_SUFFIX)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+    except Exception as e:
+        print(f"⚠ Ignoring unreadable cache entry {path}: {e}")
+        return None
+    _touch(path)
+    return arrays
+
+def store_graph_arrays(cache_dir, key, arrays, max_bytes=CACHE_MAX_BYTES):
+    """Store street graph arrays and enforce the cache size cap."""
+    path = _entry_path(cache_dir, key, GRAPH_SUFFIX)
+
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    _atomic_write(path, write)
+    evict(cache_dir, max_bytes)
+
+def load_road_arrays(cache_dir, key):
+    """
+    Return cached road_renderer.RoadArrays for key, or None on a miss.
+    """
+    path = _entry_path(cache_dir, key, ROADS_SUFFIX)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            roads = road_renderer.RoadArrays(npz['coords'], npz['offsets'], npz['highways'])
+    except Exception as e:
+        print(f"⚠ Ignoring unreadable cache entry {path}: {e}")
+        return None
+    _touch(path)
+    return roads
+
+def store_road_arrays(cache_dir, key, roads, max_bytes=CACHE_MAX_BYTES):
+    """Store road_renderer.RoadArrays and enforce the cache size cap."""
+    path = _entry_path(cache_dir, key, ROADS_SUFFIX)
+
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, coords=roads.coords, offsets=roads.offsets, highways=roads.highways.astype(str))
+
+    _atomic_write(path, write)
+    evict(cache_dir, max_bytes)
+
+def load_features(cache_dir, key):
+    """
+    Return the cached feature GeoDataFrame for key, or None on a miss.
+    """
+    path = _entry_path(cache_dir, key, FEATURES_SUFFIX)
+    if not os.path.exists(path):
+        return None
+    try:
+        features = gpd.read_parquet(path)
+    except Exception as e:
+        print(f"⚠ Ignoring unreadable cache entry {path}: {e}")
+        return None
+    _touch(path)
+    return features
+
+def store_features(cache_dir, key, features, max_bytes=CACHE_MAX_BYTES):
+    """
+    Store a feature GeoDataFrame and enforce the cache size cap.
+    Only the geometry column is kept; OSM tag columns are never drawn.
+    """
+    geometry_only = features[[features.geometry.name]]
+    path = _entry_path(cache_dir, key, FEATURES_SUFFIX)
+    _atomic_write(path, lambda tmp_path: geometry_only.to_parquet(tmp_path))
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """
+    Delete least-recently-used entries until the cache fits in max_bytes.
+    Returns the number of entries removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith((GRAPH_SUFFIX, FEATURES_SUFFIX, ROADS_SUFFIX)):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
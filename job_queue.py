@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Persistent batch job queue.
+
+Batch jobs (see batch_engine.make_job()) are kept in a SQLite table with
+their state, attempts, timings and errors, so an interrupted batch resumes
+where it stopped: finished cities are not looked at again, and cities that
+were being worked on by a process that died go back to pending. Failures
+are retried with exponential backoff, and several batch processes can
+share one queue file, each claiming jobs as it has room for them.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+
+import geodata_cache
+
+JOB_QUEUE_FILE = os.path.join(geodata_cache.CACHE_DIR, "jobs.sqlite")
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 30  # seconds before the first retry, doubled for each further one
+BACKOFF_MAX = 600
+
+JOB_FIELDS = ('city', 'country', 'themes', 'distance', 'network', 'road_loader', 'osm_source')
+UNFINISHED_STATES = ('pending', 'running')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    city TEXT NOT NULL,
+    country TEXT NOT NULL,
+    themes TEXT NOT NULL,
+    distance INTEGER NOT NULL,
+    network TEXT NOT NULL,
+    road_loader TEXT NOT NULL,
+    osm_source TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    fetch_s REAL,
+    render_s REAL,
+    outputs TEXT,
+    error TEXT,
+    updated REAL,
+    UNIQUE (city, country, themes, distance, network, road_loader, osm_source)
+)
+"""
+
+def _connect(queue_file):
+    os.makedirs(os.path.dirname(queue_file) or '.', exist_ok=True)
+    connection = sqlite3.connect(queue_file, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(SCHEMA)
+    return connection
+
+def _row_values(job):
+    values = dict(job, themes=json.dumps(list(job['themes'])), osm_source=job.get('osm_source') or '')
+    return [values[field] for field in JOB_FIELDS]
+
+def _row_to_job(row):
+    job = {field: row[field] for field in JOB_FIELDS}
+    job['themes'] = json.loads(job['themes'])
+    job['osm_source'] = job['osm_source'] or None
+    job['queue_id'] = row['id']
+    return job
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _owner_alive(owner):
+    """Whether the process that claimed a job still runs (only checkable on this host)."""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def enqueue_jobs(jobs, queue_file=JOB_QUEUE_FILE, fresh=False):
+    """
+    Add jobs to the queue. While an earlier run of the same jobs is
+    unfinished the queue is resumed and every job keeps its state;
+    otherwise (or with fresh=True) the previous run is cleared first.
+    Raises ValueError if an unfinished run holds a different job list.
+    Jobs claimed by processes that are no longer running go back to
+    pending. Returns the number of unfinished jobs.
+    """
+    rows = list(dict.fromkeys(tuple(_row_values(job)) for job in jobs))
+    with closing(_connect(queue_file)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            unfinished = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", UNFINISHED_STATES).fetchone()[0]
+            if fresh or not unfinished:
+                connection.execute("DELETE FROM jobs")
+            else:
+                queued = {tuple(row) for row in connection.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs")}
+                if queued != set(rows):
+                    raise ValueError(f"{queue_file} holds an unfinished run with other cities or settings "
+                                     f"({len(queued)} jobs); resume it with the same command or start over with --fresh")
+            for row in connection.execute("SELECT id, claimed_by FROM jobs WHERE state = 'running'").fetchall():
+                if not _owner_alive(row['claimed_by']):
+                    connection.execute("UPDATE jobs SET state = 'pending', claimed_by = NULL WHERE id = ?",
+                                       (row['id'],))
+            connection.executemany(
+                f"INSERT OR IGNORE INTO jobs ({', '.join(JOB_FIELDS)}, updated) "
+                f"VALUES ({', '.join('?' * (len(JOB_FIELDS) + 1))})",
+                [list(row) + [time.time()] for row in rows])
+            count = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", UNFINISHED_STATES).fetchone()[0]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    return count
+
+def claim_job(queue_file=JOB_QUEUE_FILE):
+    """
+    Mark the next ready pending job as running by this process and return
+    it (a batch_engine job dict with its queue_id), or None if no job is
+    ready now.
+    """
+    with closing(_connect(queue_file)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            "SELECT * FROM jobs WHERE state = 'pending' AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 1",
+            (time.time(),)).fetchone()
+        if row is not None:
+            connection.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, claimed_by = ?, updated = ? "
+                "WHERE id = ?", (_owner(), time.time(), row['id']))
+        connection.execute("COMMIT")
+    return _row_to_job(row) if row is not None else None
+
+def iter_claims(queue_file=JOB_QUEUE_FILE):
+    """Claim ready jobs one at a time, as the consumer asks for them."""
+    while True:
+        job = claim_job(queue_file)
+        if job is None:
+            return
+        yield job
+
+def get_backoff(attempts):
+    """Seconds to wait before retrying a job that failed attempts times."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+def complete_job(result, queue_file=JOB_QUEUE_FILE, max_attempts=MAX_ATTEMPTS):
+    """
+    Store a batch_engine result for its job (result['queue_id']). Failed
+    jobs go back to pending after get_backoff() unless the result is
+    flagged permanent (see batch_engine.PERMANENT_ERRORS) or max_attempts
+    is used up. Returns the new state.
+    """
+    with closing(_connect(queue_file)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        attempts = connection.execute("SELECT attempts FROM jobs WHERE id = ?",
+                                      (result['queue_id'],)).fetchone()['attempts']
+        next_attempt = 0
+        if result['status'] == 'ok':
+            state = 'done'
+        elif result['status'] == 'skipped':
+            state = 'skipped'
+        elif result.get('permanent') or attempts >= max_attempts:
+            state = 'failed'
+        else:
+            state = 'pending'
+            next_attempt = time.time() + get_backoff(attempts)
+        connection.execute(
+            "UPDATE jobs SET state = ?, next_attempt = ?, claimed_by = NULL, fetch_s = ?, render_s = ?, "
+            "outputs = ?, error = ?, updated = ? WHERE id = ?",
+            (state, next_attempt, result['fetch_s'], result['render_s'],
+             json.dumps(result['outputs'] or result['existing']), result['error'], time.time(), result['queue_id']))
+        connection.execute("COMMIT")
+    return state
+
+def next_retry_time(queue_file=JOB_QUEUE_FILE):
+    """
+    When the earliest pending job becomes ready (a time.time() value), or
+    None if nothing is pending.
+    """
+    with closing(_connect(queue_file)) as connection:
+        return connection.execute("SELECT MIN(next_attempt) FROM jobs WHERE state = 'pending'").fetchone()[0]
+
+def count_states(queue_file=JOB_QUEUE_FILE):
+    """Number of jobs in each state, e.g. {'done': 40, 'failed': 2}."""
+    with closing(_connect(queue_file)) as connection:
+        return dict(connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
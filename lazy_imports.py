@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Deferred module imports for the command line scripts.
+
+lazy_import('numpy') returns a stand-in that imports numpy the first time one
+of its attributes is used. Modules bind the heavy geospatial and plotting
+stack this way, so commands that never render (--list-themes, skipping a
+poster that already exists, argument errors) do not spend seconds importing
+osmnx, geopandas and matplotlib.
+"""
+
+import importlib
+
+_modules = []  # every LazyModule created, for preload_all()
+
+class LazyModule:
+    """A module that is imported on first attribute access."""
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        if self._module is None:
+            object.__setattr__(self, '_module', importlib.import_module(self._name))
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    """
+    The module called name (dotted names work), imported on first use.
+    Import errors surface at that first use instead of at import time.
+    """
+    module = LazyModule(name)
+    _modules.append(module)
+    return module
+
+def preload_all():
+    """Import every lazily bound module now, e.g. to warm up a worker process."""
+    for module in list(_modules):
+        module._load()
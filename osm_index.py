@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+On-disk spatial index of a local OSM .osm.pbf extract.
+
+The extract is read once (needs the optional osmium package) into an index
+directory that serves every later (point, dist) query without network:
+
+- roads: every drawn highway way packed into memory-mappable NumPy arrays,
+  with a tile -> ways lookup on a TILE_DEG degree grid
+- features: water/park areas as GeoParquet (queried through a spatial index)
+- places: named place nodes with the areas they are in, so city names
+  resolve without Nominatim
+"""
+
+import json
+import os
+import shutil
+import unicodedata
+from array import array
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import osm_loader
+
+try:
+    import osmium
+except ImportError:  # optional, only needed to build an index
+    osmium = None
+
+INDEX_VERSION = 2
+TILE_DEG = 0.1  # tile edge in degrees (~11 km)
+TILE_ROW = 10000  # tile key = row * TILE_ROW + column
+PLACE_RANKS = {'city': 0, 'town': 1, 'village': 2, 'suburb': 3, 'hamlet': 4}
+# Place tags naming the country and regions a place is in, used to tell same-named places apart
+PLACE_AREA_TAGS = ('is_in', 'is_in:country', 'is_in:state', 'is_in:province', 'is_in:region',
+                   'addr:country', 'addr:state', 'addr:province')
+
+_opened = {}  # index_dir -> OsmIndex
+
+def _tile_coords(lon, lat):
+    return (np.floor((np.asarray(lon) + 180) / TILE_DEG).astype(np.int64),
+            np.floor((np.asarray(lat) + 90) / TILE_DEG).astype(np.int64))
+
+def _normalize_name(name):
+    return " ".join(unicodedata.normalize('NFC', name).split()).casefold()
+
+def _normalize_area(name):
+    """_normalize_name() without accents, so 'México' and 'Mexico' match."""
+    decomposed = unicodedata.normalize('NFD', _normalize_name(name))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def default_index_dir(pbf_path, cache_dir):
+    """Index directory for pbf_path inside cache_dir."""
+    stem = os.path.basename(pbf_path).split('.')[0]
+    return os.path.join(cache_dir, 'osm-index', stem)
+
+def _source_signature(pbf_path, feature_tags):
+    stat = os.stat(pbf_path)
+    return {
+        'version': INDEX_VERSION,
+        'source': os.path.abspath(pbf_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'feature_tags': {key: sorted(values) for key, values in sorted(feature_tags.items())},
+    }
+
+def _place_areas(tags):
+    """Normalized names of the areas a place node says it is in."""
+    areas = set()
+    for key in PLACE_AREA_TAGS:
+        for area in tags.get(key, '').replace(';', ',').split(','):
+            if area.strip():
+                areas.add(_normalize_area(area))
+    return sorted(areas)
+
+def _matching_tag(tags, feature_tags):
+    for key, values in feature_tags.items():
+        value = tags.get(key)
+        if value is not None and value in values:
+            return f"{key}={value}"
+    return None
+
+def build_index(pbf_path, index_dir, feature_tags):
+    """
+    Read pbf_path once and write the index to index_dir.
+    feature_tags maps OSM keys to the values whose areas are indexed,
+    e.g. {'natural': ['water'], 'leisure': ['park']}.
+    """
+    if osmium is None:
+        raise ImportError("Building an OSM index needs the osmium package: pip install osmium")
+
+    lons = array('d')
+    lats = array('d')
+    counts = array('q')
+    highways = []
+    feature_wkb = []
+    feature_kinds = []
+    places = {}
+    wkb_factory = osmium.geom.WKBFactory()
+
+    # Only tagged objects that can be indexed reach Python; node locations and
+    # areas are still assembled from the untagged nodes and member ways
+    keys = sorted({'highway', 'place'} | set(feature_tags))
+    processor = (osmium.FileProcessor(pbf_path)
+                 .with_filter(osmium.filter.KeyFilter(*keys))
+                 .with_locations()
+                 .with_areas())
+    for obj in processor:
+        if obj.is_way():
+            tags = dict(obj.tags)
+            if not osm_loader.is_drawn_way(tags):
+                continue
+            start = len(lons)
+            for node in obj.nodes:
+                location = node.location
+                if location.valid():
+                    lons.append(location.lon)
+                    lats.append(location.lat)
+            if len(lons) - start < 2:
+                del lons[start:], lats[start:]
+                continue
+            counts.append(len(lons) - start)
+            highways.append(tags['highway'])
+        elif obj.is_area():
+            kind = _matching_tag(obj.tags, feature_tags)
+            if kind is None:
+                continue
+            try:
+                feature_wkb.append(wkb_factory.create_multipolygon(obj))
+            except RuntimeError:
+                continue  # broken multipolygon
+            feature_kinds.append(kind)
+        elif obj.is_node():
+            rank = PLACE_RANKS.get(obj.tags.get('place'))
+            name = obj.tags.get('name')
+            if rank is None or not name or not obj.location.valid():
+                continue
+            places.setdefault(_normalize_name(name), []).append(
+                [obj.location.lat, obj.location.lon, rank, name, _place_areas(obj.tags)])
+
+    tmp_dir = f"{index_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    coords = np.column_stack([np.frombuffer(lons, dtype=np.float64), np.frombuffer(lats, dtype=np.float64)])
+    way_counts = np.frombuffer(counts, dtype=np.int64)
+    offsets = np.zeros(len(way_counts) + 1, dtype=np.int64)
+    np.cumsum(way_counts, out=offsets[1:])
+
+    # Tile lookup: every way is listed under each tile its bbox touches
+    if len(way_counts):
+        starts = offsets[:-1]
+        min_x, min_y = _tile_coords(np.minimum.reduceat(coords[:, 0], starts),
+                                    np.minimum.reduceat(coords[:, 1], starts))
+        max_x, max_y = _tile_coords(np.maximum.reduceat(coords[:, 0], starts),
+                                    np.maximum.reduceat(coords[:, 1], starts))
+    else:
+        min_x = min_y = max_x = max_y = np.empty(0, dtype=np.int64)
+    tile_keys = [min_y * TILE_ROW + min_x]
+    tile_ways = [np.arange(len(way_counts), dtype=np.int64)]
+    for way in np.flatnonzero((max_x > min_x) | (max_y > min_y)):
+        for row in range(min_y[way], max_y[way] + 1):
+            for column in range(min_x[way], max_x[way] + 1):
+                if row != min_y[way] or column != min_x[way]:
+                    tile_keys.append(np.array([row * TILE_ROW + column]))
+                    tile_ways.append(np.array([way]))
+    tile_keys = np.concatenate(tile_keys)
+    tile_ways = np.concatenate(tile_ways)
+    order = np.argsort(tile_keys, kind='stable')
+    unique_keys, tile_starts = np.unique(tile_keys[order], return_index=True)
+    tile_offsets = np.append(tile_starts, len(order)).astype(np.int64)
+
+    np.save(os.path.join(tmp_dir, 'way_coords.npy'), coords)
+    np.save(os.path.join(tmp_dir, 'way_offsets.npy'), offsets)
+    np.save(os.path.join(tmp_dir, 'way_highways.npy'), np.array(highways, dtype=str))
+    np.save(os.path.join(tmp_dir, 'tile_keys.npy'), unique_keys)
+    np.save(os.path.join(tmp_dir, 'tile_offsets.npy'), tile_offsets)
+    np.save(os.path.join(tmp_dir, 'tile_ways.npy'), tile_ways[order])
+
+    features = gpd.GeoDataFrame({'kind': feature_kinds},
+                                geometry=shapely.from_wkb(feature_wkb), crs='epsg:4326')
+    features.to_parquet(os.path.join(tmp_dir, 'features.parquet'), write_covering_bbox=True)
+
+    with open(os.path.join(tmp_dir, 'places.json'), 'w', encoding='utf-8') as f:
+        json.dump(places, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(_source_signature(pbf_path, feature_tags), f, indent=2)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(index_dir) or '.', exist_ok=True)
+    os.replace(tmp_dir, index_dir)
+    return {'ways': len(way_counts), 'vertices': len(coords), 'features': len(features), 'places': len(places)}
+
+class OsmIndex:
+    """Read side of an index written by build_index()."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        load = lambda name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r')
+        self.way_coords = load('way_coords')
+        self.way_offsets = load('way_offsets')
+        self.way_highways = load('way_highways')
+        self.tile_keys = load('tile_keys')
+        self.tile_offsets = load('tile_offsets')
+        self.tile_ways = load('tile_ways')
+        self._features = None
+        self._places = None
+
+    def _ways_in_bbox(self, bbox):
+        left, bottom, right, top = bbox
+        min_x, min_y = _tile_coords(left, bottom)
+        max_x, max_y = _tile_coords(right, top)
+        rows, columns = np.meshgrid(np.arange(min_y, max_y + 1), np.arange(min_x, max_x + 1), indexing='ij')
+        keys = (rows * TILE_ROW + columns).ravel()
+        positions = np.searchsorted(self.tile_keys, keys)
+        found = positions < len(self.tile_keys)
+        found[found] = self.tile_keys[positions[found]] == keys[found]
+        slices = [self.tile_ways[self.tile_offsets[p]:self.tile_offsets[p + 1]] for p in positions[found]]
+        return np.unique(np.concatenate(slices)) if slices else np.empty(0, dtype=np.int64)
+
+    def roads(self, point, dist, exclude_highways=()):
+        """Drawn ways around point as RoadArrays, like osm_loader.fetch_overpass_roads()."""
+        bbox = osm_loader.bbox_from_point(point, dist)
+        ways = self._ways_in_bbox(bbox)
+        highways = np.asarray(self.way_highways[ways])
+        if exclude_highways:
+            keep = ~np.isin(highways, list(exclude_highways))
+            ways, highways = ways[keep], highways[keep]
+
+        starts = np.asarray(self.way_offsets[ways])
+        counts = np.asarray(self.way_offsets[ways + 1]) - starts
+        vertex_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=vertex_offsets[1:])
+        vertex_index = np.repeat(starts - vertex_offsets[:-1], counts) + np.arange(vertex_offsets[-1])
+        coords = np.asarray(self.way_coords[vertex_index]).reshape(-1, 2)
+        return osm_loader.clip_to_bbox(coords, counts, highways, bbox)
+
+    def features(self, point, dist, tags):
+        """Indexed areas matching tags that intersect the bbox around point."""
+        if self._features is None:
+            self._features = gpd.read_parquet(os.path.join(self.index_dir, 'features.parquet'))
+        kinds = {f"{key}={value}" for key, values in tags.items()
+                 for value in ([values] if isinstance(values, str) else values)}
+        bbox = shapely.box(*osm_loader.bbox_from_point(point, dist))
+        hits = self._features.iloc[self._features.sindex.query(bbox, predicate='intersects')]
+        return hits[hits['kind'].isin(kinds)][[hits.geometry.name]]
+
+    def find_place(self, name, country=None):
+        """
+        (lat, lon) of the highest-ranked place called name, or None.
+        Places tagged as being in country win over the others. When
+        several places still tie, the name is reported as ambiguous and
+        None is returned, so the caller can fall back to a geocoder.
+        """
+        if self._places is None:
+            with open(os.path.join(self.index_dir, 'places.json'), 'r', encoding='utf-8') as f:
+                self._places = json.load(f)
+        candidates = self._places.get(_normalize_name(name), [])
+        if country:
+            in_country = [place for place in candidates if _normalize_area(country) in place[4]]
+            candidates = in_country or candidates
+        if not candidates:
+            return None
+        best_rank = min(place[2] for place in candidates)
+        best = [place for place in candidates if place[2] == best_rank]
+        if len(best) > 1:
+            areas = "; ".join(", ".join(place[4]) or f"{place[0]:.3f}, {place[1]:.3f}" for place in best[:5])
+            print(f"⚠️  {len(best)} places called {name} in the OSM extract ({areas})")
+            return None
+        return (best[0][0], best[0][1])
+
+def open_index(pbf_path, cache_dir, feature_tags):
+    """
+    Return the OsmIndex for pbf_path, building it first if it is missing or
+    the extract (or the indexed tags) changed since it was built.
+    """
+    index_dir = default_index_dir(pbf_path, cache_dir)
+    if index_dir in _opened:
+        return _opened[index_dir]
+
+    try:
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            current = json.load(f) == _source_signature(pbf_path, feature_tags)
+    except (OSError, ValueError):
+        current = False
+    if not current:
+        print(f"🗂️  Building OSM index for {pbf_path} (one-time)...")
+        stats = build_index(pbf_path, index_dir, feature_tags)
+        print(f"✓ Indexed {stats['ways']:,} ways, {stats['features']:,} areas, {stats['places']:,} places")
+
+    _opened[index_dir] = OsmIndex(index_dir)
+    return _opened[index_dir]
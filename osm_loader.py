@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Road loader that skips the networkx graph entirely.
+
+The poster only needs road polylines and their highway tag, so OSM ways are
+read from Overpass JSON or a local .osm.pbf straight into
+road_renderer.RoadArrays: one polyline per way, clipped to the query bbox.
+No nodes dicts, edge dicts, simplification or shapely geometries are built.
+"""
+
+import re
+
+import numpy as np
+import requests
+
+import road_renderer
+
+try:
+    import osmium
+except ImportError:  # optional, only needed for .osm.pbf input
+    osmium = None
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_TIMEOUT = 180  # seconds
+EARTH_RADIUS_M = 6_371_009  # same radius osmnx uses for bboxes
+
+# Ways osmnx leaves out of network_type='all' (matched like Overpass "!~")
+EXCLUDED_HIGHWAYS_PATTERN = 'abandoned|construction|no|planned|platform|proposed|raceway|razed|rest_area|services'
+ALL_WAY_FILTER = f'["highway"]["area"!~"yes"]["highway"!~"{EXCLUDED_HIGHWAYS_PATTERN}"]'
+
+def bbox_from_point(point, dist):
+    """Returns (left, bottom, right, top) dist meters around point, like osmnx."""
+    lat, lon = point
+    delta_lat = np.rad2deg(dist / EARTH_RADIUS_M)
+    delta_lon = delta_lat / np.cos(np.deg2rad(lat))
+    return (lon - delta_lon, lat - delta_lat, lon + delta_lon, lat + delta_lat)
+
+def build_way_filter(exclude_highways=()):
+    """
+    Overpass way filter for network_type='all' minus the highway values in
+    exclude_highways (matched exactly).
+    """
+    if not exclude_highways:
+        return ALL_WAY_FILTER
+    return f'{ALL_WAY_FILTER}["highway"!~"^({"|".join(sorted(set(exclude_highways)))})$"]'
+
+def is_drawn_way(tags, exclude_highways=()):
+    """The same test as build_way_filter(), applied to a way's tag dict."""
+    highway = tags.get('highway')
+    if not highway or highway in exclude_highways:
+        return False
+    if re.search('yes', tags.get('area', '')):
+        return False
+    return not re.search(EXCLUDED_HIGHWAYS_PATTERN, highway)
+
+def build_overpass_query(point, dist, exclude_highways=(), timeout=OVERPASS_TIMEOUT):
+    """Overpass QL for every drawn way in the bbox, with inline geometry."""
+    left, bottom, right, top = bbox_from_point(point, dist)
+    return (f"[out:json][timeout:{timeout}];"
+            f"(way{build_way_filter(exclude_highways)}({bottom},{left},{top},{right}););"
+            f"out tags geom qt;")
+
+def clip_to_bbox(coords, counts, highways, bbox):
+    """
+    Cut polylines down to their runs of vertices inside bbox, dropping runs
+    shorter than two vertices. Returns RoadArrays with one row per run.
+    """
+    left, bottom, right, top = bbox
+    inside = ((coords[:, 0] >= left) & (coords[:, 0] <= right) &
+              (coords[:, 1] >= bottom) & (coords[:, 1] <= top))
+
+    way_index = np.repeat(np.arange(len(counts)), counts)
+    way_start = np.zeros(len(coords), dtype=bool)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    way_start[starts[starts < len(coords)]] = True
+    previous_inside = np.concatenate([[False], inside[:-1]])
+    run_start = inside & (way_start | ~previous_inside)
+
+    run_id = np.cumsum(run_start)[inside] - 1
+    run_lengths = np.bincount(run_id, minlength=run_start.sum())
+    kept_runs = run_lengths >= 2
+    kept_vertices = kept_runs[run_id]
+
+    offsets = np.zeros(kept_runs.sum() + 1, dtype=np.int64)
+    np.cumsum(run_lengths[kept_runs], out=offsets[1:])
+    run_highways = np.asarray(highways)[way_index[run_start]][kept_runs]
+    return road_renderer.RoadArrays(coords[inside][kept_vertices], offsets, run_highways.astype(str))
+
+def parse_overpass_ways(response, bbox, exclude_highways=()):
+    """
+    Convert an Overpass JSON response into RoadArrays clipped to bbox.
+    Handles both "out geom" responses (ways carry their coordinates) and
+    the node + way responses osmnx requests (ways reference node ids).
+    """
+    elements = response.get('elements', [])
+    ways = [element for element in elements
+            if element['type'] == 'way' and is_drawn_way(element.get('tags', {}), exclude_highways)]
+    highways = [way['tags']['highway'] for way in ways]
+
+    if ways and 'geometry' in ways[0]:
+        counts = np.fromiter((len(way['geometry']) for way in ways), dtype=np.int64, count=len(ways))
+        coords = np.array([(point['lon'], point['lat']) for way in ways for point in way['geometry']],
+                          dtype=np.float64).reshape(-1, 2)
+    else:
+        nodes = [element for element in elements if element['type'] == 'node']
+        node_ids = np.fromiter((node['id'] for node in nodes), dtype=np.int64, count=len(nodes))
+        node_xy = np.array([(node['lon'], node['lat']) for node in nodes], dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(node_ids)
+        counts = np.fromiter((len(way['nodes']) for way in ways), dtype=np.int64, count=len(ways))
+        refs = np.fromiter((ref for way in ways for ref in way['nodes']), dtype=np.int64, count=counts.sum())
+        positions = np.searchsorted(node_ids, refs, sorter=order).clip(max=max(len(order) - 1, 0))
+        coords = node_xy[order[positions]] if len(order) else np.empty((0, 2))
+        # Refs to nodes missing from the response are treated as outside the bbox
+        if len(order):
+            coords[node_ids[order[positions]] != refs] = np.nan
+
+    return clip_to_bbox(coords, counts, highways, bbox)
+
+def fetch_overpass_roads(point, dist, exclude_highways=(), url=OVERPASS_URL, timeout=OVERPASS_TIMEOUT):
+    """Download the drawn ways around point from Overpass as RoadArrays."""
+    query = build_overpass_query(point, dist, exclude_highways, timeout)
+    response = requests.post(url, data={'data': query}, timeout=timeout)
+    response.raise_for_status()
+    return parse_overpass_ways(response.json(), bbox_from_point(point, dist), exclude_highways)
+
+def load_pbf_roads(path, point, dist, exclude_highways=()):
+    """
+    Read the drawn ways around point from a local .osm.pbf extract.
+    Needs the optional osmium package (pip install osmium). The whole file
+    is scanned; ways without any vertex in the bbox are skipped early.
+    """
+    if osmium is None:
+        raise ImportError("Reading .osm.pbf files needs the osmium package: pip install osmium")
+
+    bbox = bbox_from_point(point, dist)
+    left, bottom, right, top = bbox
+    highways = []
+    counts = []
+    lons = []
+    lats = []
+    processor = (osmium.FileProcessor(path, osmium.osm.NODE | osmium.osm.WAY)
+                 .with_locations()
+                 .with_filter(osmium.filter.KeyFilter('highway')))
+    for way in processor:
+        if not way.is_way() or not is_drawn_way(dict(way.tags), exclude_highways):
+            continue
+        way_lons = []
+        way_lats = []
+        for node in way.nodes:
+            location = node.location
+            if location.valid():
+                way_lons.append(location.lon)
+                way_lats.append(location.lat)
+        if not any(left <= x <= right and bottom <= y <= top for x, y in zip(way_lons, way_lats)):
+            continue
+        highways.append(way.tags['highway'])
+        counts.append(len(way_lons))
+        lons.extend(way_lons)
+        lats.extend(way_lats)
+
+    coords = np.column_stack([np.array(lons, dtype=np.float64), np.array(lats, dtype=np.float64)])
+    return clip_to_bbox(coords, np.array(counts, dtype=np.int64), highways, bbox)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Polygon renderer that draws water and park layers from packed arrays.
+
+Only the geometry of a layer is kept: its polygons are clipped to the
+poster's view and their ring vertices stored in one (N, 2) coordinate
+buffer, with offset arrays marking rings and polygons. Each layer is
+drawn as a single PathCollection, which avoids the per-row shapely
+objects and patches that GeoDataFrame.plot builds.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import shapely
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+
+# coords: (N, 2) float array of x/y ring vertices, back to back; every ring is closed
+# ring_offsets: (R + 1,) int array, ring i spans coords[ring_offsets[i]:ring_offsets[i + 1]]
+# polygon_offsets: (P + 1,) int array, polygon j is rings polygon_offsets[j]:polygon_offsets[j + 1],
+#                  its exterior first and then its holes
+PolygonArrays = namedtuple('PolygonArrays', ['coords', 'ring_offsets', 'polygon_offsets'])
+
+POLYGON_TYPE_ID = 3  # shapely.get_type_id() of a Polygon
+
+def _offsets(index, count):
+    """Offsets array for items grouped by the sorted index array."""
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(index, minlength=count), out=offsets[1:])
+    return offsets
+
+def build_polygon_arrays(features, bbox=None, union=False):
+    """
+    Pack the polygons of features (a GeoDataFrame, GeoSeries or array of
+    shapely geometries; None packs nothing) into PolygonArrays.
+    Multi-part geometries are split into polygons and anything that is not
+    a polygon (OSM nodes and lines) is dropped. bbox, (left, bottom, right,
+    top), clips the polygons to it. union dissolves the layer into the
+    fewest polygons, so overlapping features share a single outline.
+    """
+    if features is None:
+        features = []
+    polygons = shapely.get_parts(np.asarray(getattr(features, 'geometry', features), dtype=object))
+    polygons = polygons[shapely.get_type_id(polygons) == POLYGON_TYPE_ID]
+    if bbox is not None and len(polygons):
+        polygons = shapely.get_parts(shapely.clip_by_rect(polygons, *bbox))
+        polygons = polygons[shapely.get_type_id(polygons) == POLYGON_TYPE_ID]
+    if union and len(polygons):
+        polygons = shapely.get_parts(shapely.union_all(polygons))
+        polygons = polygons[shapely.get_type_id(polygons) == POLYGON_TYPE_ID]
+    polygons = polygons[~shapely.is_empty(polygons)]
+
+    # Holes wind against their exterior so they stay open under the nonzero fill rule
+    polygons = shapely.orient_polygons(polygons)
+    rings, polygon_index = shapely.get_rings(polygons, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    return PolygonArrays(coords, _offsets(ring_index, len(rings)), _offsets(polygon_index, len(polygons)))
+
+def count_polygons(polygons):
+    """Number of polygons in PolygonArrays."""
+    return len(polygons.polygon_offsets) - 1
+
+def polygon_paths(polygons):
+    """One compound Path per polygon (exterior and holes), sharing polygons.coords."""
+    coords, ring_offsets, polygon_offsets = polygons
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[ring_offsets[:-1]] = Path.MOVETO
+    codes[ring_offsets[1:] - 1] = Path.CLOSEPOLY
+    vertex_offsets = ring_offsets[polygon_offsets].tolist()
+    return [Path(coords[start:end], codes[start:end])
+            for start, end in zip(vertex_offsets[:-1], vertex_offsets[1:])]
+
+def draw_polygons(ax, polygons, color, zorder=1):
+    """
+    Draw polygons as one PathCollection filled with color.
+    Returns a list with the collection (empty when there are no polygons),
+    for recoloring with set_facecolor().
+    """
+    if count_polygons(polygons) == 0:
+        return []
+    collection = PathCollection(polygon_paths(polygons), facecolors=[color], edgecolors='none',
+                                linewidths=0, zorder=zorder, snap=False)
+    ax.add_collection(collection, autolim=False)
+    return [collection]
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Persistent manifest of every poster in the gallery.
+
+The renderer records each poster as it is written (city, country, theme,
+dimensions, size, mtime, content hash), and thumbnail generation adds the
+thumbnail path. Gallery generation then only has to look at files whose
+size or mtime changed instead of re-parsing every poster on every run.
+"""
+
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked writes
+    fcntl = None
+
+POSTERS_DIR = "posters"
+THEMES_DIR = "themes"
+MANIFEST_FILE = os.path.join(POSTERS_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+POSTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.svg', '.pdf')
+
+# Legacy filename prefixes for cities whose slug spans several words
+CITY_MAPPING = {
+    'mexico': 'Mexico City',
+    'nuevo': 'Nuevo Laredo',
+}
+
+@contextmanager
+def _locked(manifest_file):
+    """Serialize read-modify-write cycles between render processes."""
+    os.makedirs(os.path.dirname(manifest_file) or '.', exist_ok=True)
+    with open(f"{manifest_file}.lock", 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """Return the manifest entries as a dict keyed by poster filename."""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('posters', {})
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(entries, manifest_file=MANIFEST_FILE):
+    """Atomically write the manifest entries."""
+    tmp_path = f"{manifest_file}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'posters': entries}, f,
+                  indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, manifest_file)
+
+def _known_themes():
+    if not os.path.isdir(THEMES_DIR):
+        return []
+    # Longest first so e.g. 'monochrome_blue' wins over a shorter suffix
+    return sorted((f[:-5] for f in os.listdir(THEMES_DIR) if f.endswith('.json')), key=len, reverse=True)
+
+def parse_poster_filename(filename):
+    """
+    Recover (city, theme) from a poster filename for files the renderer
+    did not record. Format: {city_slug}_{theme}_{render key}.{ext}, or
+    {city_slug}_{theme}_{YYYYMMDD_HHMMSS}.{ext} for older posters
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    # Remove the render key (12 hex digits) or legacy timestamp (20YYMMDD_HHMMSS)
+    stem = re.sub(r'_(?:[0-9a-f]{12}|\d{8}_\d{6})$', '', stem)
+
+    for theme in _known_themes():
+        if stem.endswith(f"_{theme}"):
+            city_slug = stem[:-len(theme) - 1]
+            return city_slug.replace('_', ' ').title(), theme
+
+    # Unknown theme: assume a one-word city unless it is a known prefix
+    parts = stem.split('_')
+    if parts[0].lower() in CITY_MAPPING and len(parts) >= 4:
+        return CITY_MAPPING[parts[0].lower()], '_'.join(parts[2:])
+    if len(parts) >= 2:
+        return parts[0].title(), '_'.join(parts[1:])
+    return stem.replace('_', ' ').title(), 'neon_cyberpunk'
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _image_size(path):
+    """Read raster dimensions from the file header, or (None, None)."""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+def describe_poster(path, city=None, country=None, theme=None, previous=None):
+    """
+    Build the manifest entry for a poster file. Missing city/theme fall
+    back to the previous entry, then to parsing the filename.
+    """
+    previous = previous or {}
+    filename = os.path.basename(path)
+    parsed_city, parsed_theme = parse_poster_filename(filename)
+    stat = os.stat(path)
+    width, height = _image_size(path)
+    return {
+        'filename': filename,
+        'path': f"{POSTERS_DIR}/{filename}",
+        'city': city or previous.get('city') or parsed_city,
+        'country': country or previous.get('country') or 'Mexico',
+        'theme': theme or previous.get('theme') or parsed_theme,
+        'width': width,
+        'height': height,
+        'bytes': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': _file_hash(path),
+        'thumbnailPath': previous.get('thumbnailPath'),
+    }
+
+def record_poster(path, city, country, theme=None, manifest_file=MANIFEST_FILE):
+    """
+    Add or refresh the manifest entry for a freshly written poster.
+    Called by the renderer right after saving.
+    """
+    with _locked(manifest_file):
+        entries = load_manifest(manifest_file)
+        filename = os.path.basename(path)
+        entries[filename] = describe_poster(path, city, country, theme, previous=entries.get(filename))
+        save_manifest(entries, manifest_file)
+        return entries[filename]
+
+def set_thumbnails(thumbnails, manifest_file=MANIFEST_FILE):
+    """Record thumbnail paths, given as {poster filename: thumbnail path}."""
+    with _locked(manifest_file):
+        entries = load_manifest(manifest_file)
+        changed = False
+        for filename, thumbnail_path in thumbnails.items():
+            entry = entries.get(filename)
+            if entry is not None and entry.get('thumbnailPath') != thumbnail_path:
+                entry['thumbnailPath'] = thumbnail_path
+                changed = True
+        if changed:
+            save_manifest(entries, manifest_file)
+        return entries
+
+def update_manifest(posters_dir=POSTERS_DIR, manifest_file=MANIFEST_FILE):
+    """
+    Bring the manifest in line with the posters directory.
+    Only new files and files whose size or mtime changed are described
+    again; entries for deleted files are dropped.
+    Returns (entries, changed filenames, removed filenames).
+    """
+    with _locked(manifest_file):
+        entries = load_manifest(manifest_file)
+        seen = set()
+        changed = []
+        with os.scandir(posters_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.lower().endswith(POSTER_EXTENSIONS):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                previous = entries.get(entry.name)
+                if previous and previous.get('bytes') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+                    continue
+                entries[entry.name] = describe_poster(entry.path, previous=previous)
+                changed.append(entry.name)
+
+        removed = [filename for filename in entries if filename not in seen]
+        for filename in removed:
+            del entries[filename]
+
+        if changed or removed:
+            save_manifest(entries, manifest_file)
+        return entries, sorted(changed), sorted(removed)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Per-stage profiling for poster renders.
+
+A PosterProfile records wall time, CPU time and peak RSS for every stage of
+one poster job (geocoding, downloads, drawing, savefig, ...) together with
+counts such as road segments and polygons. Each job is written as one JSON
+line, so runs can be appended to the same file and compared over time.
+
+Dotted stage names are sub-stages: 'fetch.roads.download' is part of
+'fetch.roads', which is part of 'fetch'. Stages started from different
+threads (roads and polygons download concurrently) may overlap.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+PROFILE_FILE = "profile.jsonl"
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class PosterProfile:
+    """
+    Collects the stages of one poster job. info holds job-level fields
+    (city, themes, dpi, ...) that are written along with the stages.
+    A disabled profile hands out throwaway count dicts and records nothing.
+    """
+
+    def __init__(self, enabled=True, **info):
+        self.enabled = enabled
+        self.info = info
+        self.stages = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._started = datetime.now().isoformat(timespec='seconds')
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """
+        Time the body of a with block as stage name. The dict it yields
+        (pre-filled with counts) can be updated with counts found inside.
+        CPU time is measured for the calling thread only.
+        """
+        if not self.enabled:
+            yield dict(counts)
+            return
+        rss_before = peak_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield counts
+        finally:
+            record = {
+                'stage': name,
+                'wall_s': round(time.perf_counter() - wall, 3),
+                'cpu_s': round(time.thread_time() - cpu, 3),
+            }
+            rss_after = peak_rss_mb()
+            if rss_after is not None:
+                record['peak_rss_mb'] = round(rss_after, 1)
+                record['peak_rss_growth_mb'] = round(rss_after - rss_before, 1)
+            record.update(counts)
+            with self._lock:
+                self.stages.append(record)
+
+    def to_dict(self):
+        """The JSON-serializable record of this job."""
+        peaks = [stage['peak_rss_mb'] for stage in self.stages if 'peak_rss_mb' in stage]
+        return {
+            **self.info,
+            'started': self._started,
+            'wall_s': round(time.perf_counter() - self._start, 3),
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'stages': list(self.stages),
+        }
+
+DISABLED = PosterProfile(enabled=False)
+
+def write_profile(record, profile_file=PROFILE_FILE):
+    """Append one job record (a to_dict() result) as a JSON line."""
+    os.makedirs(os.path.dirname(profile_file) or '.', exist_ok=True)
+    with open(profile_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def stage_totals(record):
+    """Sum wall time per stage name over a record (themes add up)."""
+    totals = {}
+    for stage in record.get('stages', []):
+        totals[stage['stage']] = totals.get(stage['stage'], 0.0) + stage['wall_s']
+    return totals
+
+def stage_count(record, name, key):
+    """The count key of the first stage called name, or None."""
+    for stage in record.get('stages', []):
+        if stage['stage'] == name and key in stage:
+            return stage[key]
+    return None
+
+def print_stages(record):
+    """Print the stages of one job as a table."""
+    print(f"{'Stage':<28} {'Wall':>8} {'CPU':>8} {'Peak RSS':>10}  Counts")
+    print("─" * 80)
+    for stage in record['stages']:
+        counts = ', '.join(f"{key}={value}" for key, value in stage.items()
+                           if key not in ('stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'peak_rss_growth_mb'))
+        peak = stage.get('peak_rss_mb')
+        peak = f"{peak:>7.0f} MB" if peak is not None else f"{'-':>10}"
+        print(f"{stage['stage'][:28]:<28} {stage['wall_s']:>7.2f}s {stage['cpu_s']:>7.2f}s {peak}  {counts}")
+    print(f"{'total':<28} {record['wall_s']:>7.2f}s")
+
+# Columns of the per-city table: (header, stage name)
+TABLE_STAGES = [
+    ('Geocode', 'geocode'),
+    ('Fetch', 'fetch'),
+    ('Load', 'load'),
+    ('Draw', 'draw'),
+    ('Save', 'savefig'),
+    ('Thumbs', 'thumbnails'),
+]
+
+def print_profile_table(records):
+    """
+    Print one row per job, slowest first, with the main stage times, peak
+    RSS and the drawn road and polygon counts, followed by the median of
+    each column.
+    """
+    rows = []
+    for record in records:
+        totals = stage_totals(record)
+        rows.append({
+            'city': record.get('city', '?'),
+            'times': [totals.get(name) for _, name in TABLE_STAGES],
+            'total': sum(totals.get(name, 0.0) for _, name in TABLE_STAGES),
+            'peak': record.get('peak_rss_mb'),
+            'roads': stage_count(record, 'draw.roads', 'polylines'),
+            'polygons': stage_count(record, 'draw.polygons', 'polygons'),
+        })
+    if not rows:
+        return
+    rows.sort(key=lambda row: row['total'], reverse=True)
+
+    def cell(value, width, fmt):
+        return f"{format(value, fmt):>{width}}" if value is not None else f"{'-':>{width}}"
+
+    header = ''.join(f"{title:>8}" for title, _ in TABLE_STAGES)
+    print(f"{'City':<24}{header}{'Total':>8}{'Peak MB':>9}{'Roads':>10}{'Polygons':>9}")
+    print("─" * (24 + 8 * len(TABLE_STAGES) + 36))
+    for row in rows:
+        times = ''.join(cell(value, 8, '.1f') for value in row['times'])
+        print(f"{row['city'][:24]:<24}{times}{row['total']:>8.1f}{cell(row['peak'], 9, '.0f')}"
+              f"{cell(row['roads'], 10, ',')}{cell(row['polygons'], 9, ',')}")
+
+    def median(values):
+        values = sorted(value for value in values if value is not None)
+        return values[len(values) // 2] if values else None
+
+    times = ''.join(cell(median(row['times'][i] for row in rows), 8, '.1f') for i in range(len(TABLE_STAGES)))
+    print(f"{'median':<24}{times}{median(row['total'] for row in rows):>8.1f}"
+          f"{cell(median(row['peak'] for row in rows), 9, '.0f')}")
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Long-running poster render server.
+
+Keeps the batch engine's pools alive between requests: fetch threads share
+one rate limiter, and render worker processes import the geospatial stack,
+load fonts and keep the map data of recently rendered cities in memory.
+A request then costs the render itself instead of a cold interpreter.
+
+API (JSON over HTTP):
+  POST /render     {"city", "country", "theme" or "themes", "distance",
+                    "network", "road_loader", "thumbnails", "wait"}
+                   waits for the result, or with "wait": false answers
+                   202 with a job id right away
+  GET  /jobs/<id>  the job's result so far
+  GET  /health     worker and job counts
+
+Usage:
+  python render_server.py --port 8765 --workers 2
+  curl -X POST localhost:8765/render -d '{"city": "Oaxaca", "country": "Mexico", "theme": "noir"}'
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import batch_engine
+import geodata_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_DATASETS = 2  # city datasets each render worker keeps in memory
+MAX_FINISHED_JOBS = 1000  # finished results kept for GET /jobs/<id>
+REQUEST_DEFAULTS = {'distance': 29000, 'network': 'all', 'road_loader': 'osmnx', 'thumbnails': False, 'wait': True}
+
+class DatasetCache(OrderedDict):
+    """Map data of the most recently rendered cities, oldest dropped first."""
+
+    def __init__(self, max_entries):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+_datasets = None  # DatasetCache of this render worker
+
+def _init_server_worker(max_datasets):
+    """Warm up a render process and give it a dataset cache."""
+    global _datasets
+    batch_engine._init_render_worker()
+    _datasets = DatasetCache(max_datasets) if max_datasets else None
+
+def _render_in_worker(*args):
+    """batch_engine.render_job() with this worker's dataset cache."""
+    return batch_engine.render_job(*args, data_cache=_datasets)
+
+def dataset_key(job):
+    """Jobs with the same key render from the same map data, whatever their themes."""
+    return (job['city'].casefold(), job['country'].casefold(), job['distance'], job.get('network', 'all'),
+            job.get('road_loader', 'osmnx'), job.get('osm_source'))
+
+class RenderService:
+    """
+    Runs render jobs on long-lived pools. Identical jobs submitted while
+    one is in flight share its result instead of rendering twice, and
+    jobs for the same map data (e.g. one city in several themes) share
+    one fetch.
+    """
+
+    def __init__(self, workers=None, io_workers=batch_engine.DEFAULT_IO_WORKERS,
+                 timeout=batch_engine.DEFAULT_TIMEOUT, cache_dir=geodata_cache.CACHE_DIR,
+                 request_interval=batch_engine.DEFAULT_REQUEST_INTERVAL, max_datasets=DEFAULT_DATASETS):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.limiter = batch_engine.RateLimiter(request_interval)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers)
+        # Drives each job through both stages; the pools above bound the actual work
+        self.job_pool = ThreadPoolExecutor(max_workers=io_workers + self.workers)
+        self.render_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                               initializer=_init_server_worker, initargs=(max_datasets,))
+        for _ in range(self.workers):
+            self.render_pool.submit(int)  # start and warm up every worker now, not on the first request
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job id -> result dict
+        self._in_flight = {}  # job signature -> (job id, future)
+        self._fetches = {}  # dataset_key() -> future of batch_engine.fetch_job_data()
+
+    def submit(self, job, thumbnails=None):
+        """Queue job (see batch_engine.make_job()); returns (job id, future of its result)."""
+        signature = json.dumps([job, thumbnails], sort_keys=True)
+        with self._lock:
+            if signature in self._in_flight:
+                return self._in_flight[signature]
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = dict(batch_engine._new_result(job), id=job_id)
+            future = self.job_pool.submit(self._run, job_id, job, thumbnails)
+            self._in_flight[signature] = (job_id, future)
+        future.add_done_callback(lambda _: self._finish(signature))
+        return job_id, future
+
+    def _finish(self, signature):
+        with self._lock:
+            self._in_flight.pop(signature, None)
+            finished = [job_id for job_id, result in self._jobs.items() if result['status'] != 'pending']
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+
+    def _fetch(self, job):
+        """Future of the map data fetch for job, shared with in-flight jobs for the same data."""
+        key = dataset_key(job)
+        with self._lock:
+            future = self._fetches.get(key)
+            if future is not None:
+                return future
+            future = self.io_pool.submit(batch_engine.fetch_job_data, job, self.limiter, self.cache_dir)
+            self._fetches[key] = future
+        future.add_done_callback(lambda _: self._finish_fetch(key, future))
+        return future
+
+    def _finish_fetch(self, key, future):
+        with self._lock:
+            if self._fetches.get(key) is future:
+                del self._fetches[key]
+
+    def _run(self, job_id, job, thumbnails):
+        result = self._jobs[job_id]
+        start = time.perf_counter()
+        try:
+            result['pending_themes'], result['render_keys'], result['existing'] = \
+                batch_engine.split_existing_themes(job)
+            if not result['pending_themes']:
+                result['status'] = 'skipped'
+            else:
+                result['point'], result['exclude_highways'] = self._fetch(job).result(timeout=self.timeout)
+                result['fetch_s'] = round(time.perf_counter() - start, 2)
+                render = self.render_pool.submit(
+                    _render_in_worker, result['city'], result['country'], result['point'], result['distance'],
+                    result['pending_themes'], self.cache_dir, self.timeout, thumbnails,
+                    result['exclude_highways'], result['road_loader'], result['osm_source'], False,
+                    result['render_keys'])
+                result.update(render.result())
+                result.pop('profile_stages', None)
+                result['status'] = 'ok'
+        except Exception as e:
+            batch_engine.set_error(result, e)
+        return result
+
+    def get(self, job_id):
+        """The result dict of job_id, or None if unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [result['status'] for result in self._jobs.values()]
+        return {'status': 'ok', 'workers': self.workers,
+                'jobs': {status: statuses.count(status) for status in sorted(set(statuses))}}
+
+    def shutdown(self):
+        self.job_pool.shutdown(wait=False, cancel_futures=True)
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        self.render_pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_render_request(body):
+    """
+    Validate a POST /render body. Returns (job, thumbnails, wait) or
+    raises ValueError with a message for the client.
+    """
+    import create_map_poster
+    import generate_thumbnails
+
+    try:
+        request = json.loads(body or b'{}')
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(request, dict):
+        raise ValueError("Request body must be a JSON object")
+    request = dict(REQUEST_DEFAULTS, **request)
+    if not request.get('city') or not request.get('country'):
+        raise ValueError("'city' and 'country' are required")
+    themes = request.get('themes') or [request.get('theme') or 'feature_based']
+    if isinstance(themes, str):
+        themes = [name.strip() for name in themes.split(',') if name.strip()]
+    unknown = sorted(set(themes) - set(create_map_poster.get_available_themes()))
+    if unknown:
+        raise ValueError(f"Unknown theme(s): {', '.join(unknown)}")
+    if request['network'] not in create_map_poster.NETWORK_MODES:
+        raise ValueError(f"'network' must be one of {', '.join(create_map_poster.NETWORK_MODES)}")
+    if request['road_loader'] not in create_map_poster.ROAD_LOADERS:
+        raise ValueError(f"'road_loader' must be one of {', '.join(create_map_poster.ROAD_LOADERS)}")
+    try:
+        distance = int(request['distance'])
+    except (TypeError, ValueError):
+        raise ValueError("'distance' must be a number of meters")
+    job = batch_engine.make_job(request['city'], request['country'], themes, distance,
+                                request['network'], request['road_loader'])
+    thumbnails = None
+    if request['thumbnails']:
+        thumbnails = generate_thumbnails.available_variants(generate_thumbnails.DEFAULT_VARIANTS)
+    return job, thumbnails, bool(request['wait'])
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of the server's RenderService."""
+
+    server_version = "MapPosterRender/1.0"
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/health':
+            self._send_json(200, service.stats())
+        elif self.path.startswith('/jobs/'):
+            result = service.get(self.path[len('/jobs/'):])
+            if result is None:
+                self._send_json(404, {'error': 'Unknown job'})
+            else:
+                self._send_json(200, result)
+        else:
+            self._send_json(404, {'error': f"No such endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_json(404, {'error': f"No such endpoint: {self.path}"})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            job, thumbnails, wait = parse_render_request(body)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        job_id, future = self.server.service.submit(job, thumbnails)
+        if not wait:
+            self._send_json(202, {'id': job_id, 'status': 'pending'})
+            return
+        result = future.result()
+        self._send_json(200 if result['status'] in ('ok', 'skipped') else 500, result)
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+def submit_render(server_url, city, country, themes, distance=29000, network='all', road_loader='osmnx',
+                  thumbnails=False, timeout=None):
+    """
+    Client side: render city on the server at server_url and wait for it.
+    Returns the server's result dict (same shape as batch_engine results).
+    """
+    body = json.dumps({'city': city, 'country': country, 'themes': list(themes), 'distance': distance,
+                       'network': network, 'road_loader': road_loader, 'thumbnails': thumbnails}).encode('utf-8')
+    request = urllib.request.Request(f"{server_url.rstrip('/')}/render", data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        payload = json.load(e)
+        if 'status' in payload:
+            return payload  # a failed render
+        raise RuntimeError(f"Render server rejected {city}: {payload.get('error', e)}")
+
+def run_remote_batch(server_url, jobs, concurrency=4, on_result=None, thumbnails=False):
+    """
+    batch_engine.run_batch() against a running server: submits jobs
+    (batch_engine.make_job() dicts) with up to concurrency in flight.
+    Returns one result dict per job.
+    """
+    def render(job):
+        try:
+            return submit_render(server_url, job['city'], job['country'], job['themes'], job['distance'],
+                                 job['network'], job['road_loader'], thumbnails)
+        except Exception as e:
+            result = batch_engine._new_result(job)
+            batch_engine.set_error(result, e)
+            return result
+
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(render, job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result:
+                on_result(future.result())
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve poster renders over HTTP from warm worker processes")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Render processes (default: number of CPU cores)')
+    parser.add_argument('--io-workers', type=int, default=batch_engine.DEFAULT_IO_WORKERS,
+                        help=f'Concurrent download threads (default: {batch_engine.DEFAULT_IO_WORKERS})')
+    parser.add_argument('--timeout', type=int, default=batch_engine.DEFAULT_TIMEOUT,
+                        help=f'Seconds allowed per job for fetching and for rendering (default: {batch_engine.DEFAULT_TIMEOUT})')
+    parser.add_argument('--cache-dir', type=str, default=geodata_cache.CACHE_DIR,
+                        help=f'Directory for cached map data (default: {geodata_cache.CACHE_DIR})')
+    parser.add_argument('--keep-datasets', type=int, default=DEFAULT_DATASETS,
+                        help=f'City datasets each worker keeps in memory, 0 to always reload (default: {DEFAULT_DATASETS})')
+    args = parser.parse_args()
+
+    service = RenderService(workers=args.workers, io_workers=args.io_workers, timeout=args.timeout,
+                            cache_dir=args.cache_dir, max_datasets=args.keep_datasets)
+    server = ThreadingHTTPServer((args.host, args.port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"🚀 Render server on http://{args.host}:{server.server_port} ({service.workers} render workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Indexed store of rendered posters.
+
+Every poster is recorded under a render key: a hash of everything that
+decides what it looks like (the normalized city and country, the theme's
+contents, the distance, the output options and the renderer version).
+Checking whether a poster exists is then one primary-key lookup instead
+of a directory scan, and editing a theme JSON or changing the distance
+only misses the posters it actually affects.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import closing
+
+import geocode_cache
+
+POSTERS_DIR = "posters"
+RENDER_STORE_NAME = "renders.sqlite"  # kept next to the posters it records
+RENDER_STORE_FILE = os.path.join(POSTERS_DIR, RENDER_STORE_NAME)
+KEY_LENGTH = 12  # hex digits of the render key used in output filenames
+# {city}_{theme}_{render key}.{ext}, and {city}_{theme}_{YYYYMMDD_HHMMSS}.{ext} from before the store
+KEYED_FILENAME = re.compile(rf'^(?P<stem>.+)_[0-9a-f]{{{KEY_LENGTH}}}(?P<ext>\.\w+)$')
+LEGACY_FILENAME = re.compile(r'^(?P<stem>.+)_\d{8}_\d{6}(?P<ext>\.\w+)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    render_key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    city TEXT NOT NULL,
+    country TEXT NOT NULL,
+    theme TEXT,
+    created REAL NOT NULL
+)
+"""
+
+def render_key(city, country, theme, distance, **options):
+    """
+    Hex digest identifying one render. theme is the loaded theme dict, so
+    any change to its JSON gives a new key; options are further JSON-able
+    settings that change the output (format, dpi, network, ...).
+    """
+    payload = {
+        'place': geocode_cache.normalize_query(city, country),
+        'theme': theme,
+        'distance': distance,
+        'options': options,
+    }
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _connect(store_file):
+    """Open store_file, creating it and the table if needed."""
+    os.makedirs(os.path.dirname(store_file) or '.', exist_ok=True)
+    connection = sqlite3.connect(store_file, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(SCHEMA)
+    return connection
+
+def find_render(key, store_file=RENDER_STORE_FILE):
+    """
+    Path of the poster recorded under key, or None. Rows whose file has
+    been deleted are dropped, so the poster is rendered again.
+    """
+    if not os.path.exists(store_file):
+        return None
+    with closing(_connect(store_file)) as connection, connection:
+        row = connection.execute("SELECT filename FROM renders WHERE render_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(os.path.dirname(store_file), row[0])
+        if os.path.exists(path):
+            return path
+        connection.execute("DELETE FROM renders WHERE render_key = ?", (key,))
+    return None
+
+def record_render(key, path, city, country, theme=None, store_file=RENDER_STORE_FILE):
+    """Record the poster at path (inside the store's directory) under key."""
+    with closing(_connect(store_file)) as connection, connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO renders (render_key, filename, city, country, theme, created) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, os.path.basename(path), city, country, theme, time.time()))
+
+def _name_parts(match):
+    return unicodedata.normalize('NFC', match['stem']), match['ext'].lower()
+
+def find_superseded_posters(store_file=RENDER_STORE_FILE):
+    """
+    Legacy timestamped posters in the store's directory whose city, theme
+    and format now have a recorded render, so the old file can go.
+    Returns their paths.
+    """
+    if not os.path.exists(store_file):
+        return []
+    posters_dir = os.path.dirname(store_file)
+    with closing(_connect(store_file)) as connection:
+        filenames = [row[0] for row in connection.execute("SELECT filename FROM renders")]
+    replaced = {_name_parts(match) for match in map(KEYED_FILENAME.match, filenames)
+                if match and os.path.exists(os.path.join(posters_dir, match.string))}
+    superseded = []
+    for filename in sorted(os.listdir(posters_dir)):
+        match = LEGACY_FILENAME.match(filename)
+        if match and _name_parts(match) in replaced:
+            superseded.append(os.path.join(posters_dir, filename))
+    return superseded
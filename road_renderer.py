@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Road renderer that draws street networks straight from packed arrays.
+
+Every edge polyline lives in one (N, 2) coordinate buffer, with an offsets
+array marking where each edge starts. Roads are drawn as one LineCollection
+per road class, which avoids the GeoDataFrame, shapely and figure work that
+ox.plot_graph does just to draw lines.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import shapely
+from matplotlib.collections import LineCollection
+
+# coords: (N, 2) float array of x/y vertices for every edge, back to back
+# offsets: (E + 1,) int array, edge i spans coords[offsets[i]:offsets[i + 1]]
+# highways: (E,) array with the highway tag of every edge
+RoadArrays = namedtuple('RoadArrays', ['coords', 'offsets', 'highways'])
+
+def build_road_arrays(graph_arrays):
+    """
+    Build packed road arrays from geodata_cache.graph_to_arrays() output.
+    Edges without a geometry become a straight segment between their nodes.
+    """
+    node_ids = graph_arrays['node_ids']
+    node_xy = np.column_stack([graph_arrays['node_x'], graph_arrays['node_y']])
+    order = np.argsort(node_ids)
+
+    def node_positions(ids):
+        return order[np.searchsorted(node_ids, ids, sorter=order)]
+
+    geometry_counts = np.diff(graph_arrays['edge_offsets'])
+    has_geometry = geometry_counts > 0
+    counts = np.where(has_geometry, geometry_counts, 2)
+
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    coords = np.empty((offsets[-1], 2), dtype=np.float64)
+
+    # Geometry vertices are already stored back to back in edge order
+    row_has_geometry = np.repeat(has_geometry, counts)
+    coords[row_has_geometry] = graph_arrays['edge_coords']
+
+    straight = ~has_geometry
+    ends = np.empty((straight.sum(), 2, 2), dtype=np.float64)
+    ends[:, 0] = node_xy[node_positions(graph_arrays['edge_u'][straight])]
+    ends[:, 1] = node_xy[node_positions(graph_arrays['edge_v'][straight])]
+    coords[~row_has_geometry] = ends.reshape(-1, 2)
+
+    return RoadArrays(coords, offsets, graph_arrays['edge_highway'])
+
+def get_road_bounds(roads):
+    """Returns (left, bottom, right, top) of all road vertices."""
+    if len(roads.coords) == 0:
+        return (0.0, 0.0, 1.0, 1.0)
+    left, bottom = roads.coords.min(axis=0)
+    right, top = roads.coords.max(axis=0)
+    return (left, bottom, right, top)
+
+def get_view_bounds(bounds, padding=0.02):
+    """(left, bottom, right, top) of the view configure_axes() frames on bounds."""
+    left, bottom, right, top = bounds
+    padding_ns = (top - bottom) * padding
+    padding_ew = (right - left) * padding
+    return (left - padding_ew, bottom - padding_ns, right + padding_ew, top + padding_ns)
+
+def configure_axes(ax, bounds, padding=0.02):
+    """
+    Frame the axes on bounds the same way ox.plot_graph does: pad the view,
+    hide axes and spines, and correct the aspect ratio for lat/lon data.
+    """
+    left, bottom, right, top = get_view_bounds(bounds, padding)
+    ax.set_ylim((bottom, top))
+    ax.set_xlim((left, right))
+
+    ax.margins(0)
+    ax.tick_params(which='both', direction='in')
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+
+    cos_lat = np.cos(np.deg2rad((bottom + top) / 2))
+    ax.set_aspect(1 / cos_lat)
+
+def split_lines(roads, edge_indices):
+    """Returns the vertex arrays (views into roads.coords) of the given edges."""
+    starts = roads.offsets[edge_indices]
+    ends = roads.offsets[edge_indices + 1]
+    coords = roads.coords
+    return [coords[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+
+def merge_lines(roads, edge_indices, grid_size):
+    """
+    Merges the given edges into as few polylines as possible, for vector
+    output. Vertices are snapped to a grid_size grid, duplicate edges are
+    dropped, edges that meet end to end are joined, and the result is simplified to grid_size with the
+    pieces shorter than that dropped. Returns vertex arrays like split_lines().
+    """
+    if len(edge_indices) == 0:
+        return []
+    starts = roads.offsets[edge_indices]
+    counts = roads.offsets[edge_indices + 1] - starts
+    line_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=line_offsets[1:])
+    vertex_index = np.repeat(starts - line_offsets[:-1], counts) + np.arange(line_offsets[-1])
+    lines = shapely.linestrings(roads.coords[vertex_index], indices=np.repeat(np.arange(len(counts)), counts))
+
+    # Snap, then drop the reverse copies of two-way streets
+    lines = shapely.normalize(shapely.set_precision(lines, grid_size, mode='pointwise'))
+    lines = lines[shapely.length(lines) > 0]
+    _, first = np.unique(shapely.to_wkb(lines), return_index=True)
+    lines = lines[np.sort(first)]
+    if len(lines) == 0:
+        return []
+    merged = shapely.line_merge(shapely.multilinestrings(lines))
+    parts = shapely.get_parts(shapely.simplify(merged, grid_size, preserve_topology=False))
+    parts = parts[shapely.length(parts) >= grid_size]
+
+    coords, index = shapely.get_coordinates(parts, return_index=True)
+    return np.split(coords, np.flatnonzero(np.diff(index)) + 1) if len(coords) else []
+
+def draw_roads(ax, roads, road_classes, palette, widths, zorder=1):
+    """
+    Draw roads as one LineCollection per road class.
+    Less important classes are drawn first so major roads stay on top.
+    Returns a list indexed by road class with the collection for that class
+    (None when the class has no edges), for recoloring with set_color().
+    """
+    collections = [None] * len(palette)
+    for road_class in reversed(range(len(palette))):
+        edge_indices = np.flatnonzero(road_classes == road_class)
+        if len(edge_indices) == 0:
+            continue
+        collection = LineCollection(
+            split_lines(roads, edge_indices),
+            colors=[palette[road_class]],
+            linewidths=widths[road_class],
+            zorder=zorder,
+        )
+        ax.add_collection(collection, autolim=False)
+        collections[road_class] = collection
+    return collections
+
+def recolor_roads(collections, palette):
+    """Apply a new per-class palette to collections from draw_roads()."""
+    for road_class, collection in enumerate(collections):
+        if collection is not None:
+            collection.set_color([palette[road_class]])
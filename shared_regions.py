@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Shared map data downloads for nearby cities in a batch.
+
+Metro neighbours (Guadalajara and Zapopan, Mexico City and Tlalnepantla)
+have heavily overlapping map boxes at poster distances. plan_regions()
+groups such cities under one square region whenever downloading the region
+costs no more area than downloading every city on its own. The first
+city of a region to be fetched downloads the region once, and each member's
+roads and polygons are cut from it into the map data cache, so the other
+members' fetches (and their renders) are cache hits.
+"""
+
+import math
+import os
+import threading
+
+import geocode_cache
+from lazy_imports import lazy_import
+
+osm_loader = lazy_import('osm_loader')
+
+# A region is used only if its area is at most this fraction of the
+# member boxes' total area (it saves downloading at least the overlap)
+MAX_AREA_RATIO = 1.0
+MAX_REGION_FACTOR = 2.0  # region radius cap, in multiples of the largest member distance
+BBOX_MARGIN = 1.001  # keeps member box edges inside the region box despite rounding
+
+class Region:
+    """A square area (point, dist) fetched once for several member cities."""
+
+    def __init__(self, member, exclude_highways=None, road_loader='osmnx'):
+        self.members = [member]  # (job key, point, dist)
+        self.point = member[1]
+        self.dist = member[2]
+        self.member_area = (2 * member[2]) ** 2
+        self.exclude_highways = exclude_highways
+        self.road_loader = road_loader
+        self.lock = threading.Lock()
+        self.done = False
+
+def _covering_square(members):
+    """(point, dist) of the square bbox covering every member's bbox."""
+    boxes = [osm_loader.bbox_from_point(point, dist) for _, point, dist in members]
+    left = min(box[0] for box in boxes)
+    bottom = min(box[1] for box in boxes)
+    right = max(box[2] for box in boxes)
+    top = max(box[3] for box in boxes)
+    lat, lon = (bottom + top) / 2, (left + right) / 2
+    half_height = math.radians((top - bottom) / 2) * osm_loader.EARTH_RADIUS_M
+    half_width = math.radians((right - left) / 2) * osm_loader.EARTH_RADIUS_M * math.cos(math.radians(lat))
+    return (float(lat), float(lon)), math.ceil(max(half_height, half_width) * BBOX_MARGIN)
+
+def _job_key(job):
+    return (geocode_cache.normalize_query(job['city'], job['country']), job['distance'],
+            job.get('network', 'all'), job.get('road_loader', 'osmnx'))
+
+def plan_regions(members, exclude_highways=None, road_loader='osmnx'):
+    """
+    Greedily group members, (job key, point, dist) tuples, into Regions:
+    each member joins the region where it saves the most downloaded area,
+    or starts its own if no region would save any.
+    """
+    regions = []
+    for member in members:
+        best = None
+        for region in regions:
+            candidates = region.members + [member]
+            point, dist = _covering_square(candidates)
+            if dist > MAX_REGION_FACTOR * max(d for _, _, d in candidates):
+                continue
+            area = (2 * dist) ** 2
+            total = region.member_area + (2 * member[2]) ** 2
+            if area <= MAX_AREA_RATIO * total and (best is None or total - area > best[0]):
+                best = (total - area, region, point, dist)
+        if best is None:
+            regions.append(Region(member, exclude_highways, road_loader))
+            continue
+        _, region, region.point, region.dist = best
+        region.members.append(member)
+        region.member_area += (2 * member[2]) ** 2
+    return regions
+
+class SharedRegions:
+    """
+    Regions planned for a batch (see plan_shared_regions()), and the
+    hook fetch_job() calls before fetching a city.
+    """
+
+    def __init__(self, regions, cache_dir):
+        self.cache_dir = cache_dir
+        self._regions = {}  # job key -> Region with more than one member
+        for region in regions:
+            if len(region.members) > 1:
+                for key, _, _ in region.members:
+                    self._regions[key] = region
+
+    def __len__(self):
+        return len({id(region) for region in self._regions.values()})
+
+    def count_cities(self):
+        """Number of cities that get their map data from a shared region."""
+        return len(self._regions)
+
+    def ensure(self, job, throttle=None, profile=None):
+        """
+        Make sure every member of job's region is in the map data cache,
+        downloading the region once and cutting each member out of it.
+        Falls back to per-city downloads if the region download fails.
+        """
+        import create_map_poster
+        import poster_profile
+
+        region = None if job.get('osm_source') else self._regions.get(_job_key(job))
+        if region is None:
+            return
+        with region.lock:
+            if region.done:
+                return
+            region.done = True
+            missing = [(point, dist) for _, point, dist in region.members
+                       if not create_map_poster.is_map_data_cached(point, dist, self.cache_dir,
+                                                                   region.exclude_highways, region.road_loader)]
+            if not missing:
+                return
+            profile = profile or poster_profile.DISABLED
+            try:
+                with profile.stage('fetch.region', cities=len(region.members), dist=region.dist):
+                    data = create_map_poster.fetch_map_data(region.point, region.dist, cache_dir=self.cache_dir,
+                                                            throttle=throttle, show_progress=False,
+                                                            exclude_highways=region.exclude_highways,
+                                                            road_loader=region.road_loader)
+                with profile.stage('fetch.region.clip', cities=len(missing)):
+                    for point, dist in missing:
+                        create_map_poster.store_map_data(create_map_poster.clip_map_data(data, point, dist),
+                                                         point, dist, self.cache_dir, region.exclude_highways,
+                                                         region.road_loader)
+            except Exception as e:
+                print(f"⚠ Shared region download failed, fetching its cities one by one: {e}")
+
+def plan_shared_regions(jobs, cache_dir, throttle=None):
+    """
+    Geocode the cities of jobs that still have posters to render and plan
+    shared regions among jobs with the same distance, network and road
+    loader. Jobs with a local osm_source already share its index and are
+    left out, as are cities that fail to geocode (their own fetch reports
+    the error). Geocoding is rate limited by throttle (default: one
+    Nominatim request per second). Returns a SharedRegions for run_batch().
+    """
+    import batch_engine
+    import create_map_poster
+
+    throttle = throttle or batch_engine.RateLimiter(batch_engine.DEFAULT_REQUEST_INTERVAL).wait
+    groups = {}  # (distance, network, road_loader) -> members
+    for job in jobs:
+        if job.get('osm_source') or not batch_engine.split_existing_themes(job)[0]:
+            continue
+        try:
+            point = create_map_poster.get_coordinates(job['city'], job['country'], throttle=throttle,
+                                                      cache_file=os.path.join(cache_dir, "geocodes.json"))
+        except Exception:
+            continue
+        key = _job_key(job)
+        groups.setdefault(key[1:], []).append((key, point, job['distance']))
+
+    regions = []
+    for (distance, network, road_loader), members in groups.items():
+        exclude_highways = create_map_poster.get_excluded_highways(network, distance)
+        regions.extend(plan_regions(members, exclude_highways, road_loader))
+    return SharedRegions(regions, cache_dir)
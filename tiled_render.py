@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Tiled rendering for print sizes that do not fit in one Agg buffer.
+
+The poster figure is rasterized in horizontal bands: each band is drawn
+into its own Agg buffer with every drawing call shifted by a whole number
+of pixels, so it holds exactly that window of the full canvas, and every
+collection is cut down to the paths that can reach it.
+Each band is streamed into a PNG or TIFF writer and dropped, so peak memory
+depends on the band size, not on the print size.
+"""
+
+import os
+import struct
+import zlib
+
+import numpy as np
+from matplotlib.backend_bases import GraphicsContextBase
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.collections import Collection
+from matplotlib.path import Path
+from matplotlib.transforms import Affine2D, TransformedPath
+from PIL import Image
+
+BAND_BUFFER_BYTES = 16 * 1024 * 1024  # RGBA bytes rasterized per band (image resampling needs ~8x this)
+STRIP_ROWS = 64  # rows filtered and compressed at a time
+COMPRESSION_LEVEL = 6
+
+class PngBandWriter:
+    """
+    Writes an RGBA PNG row band by row band. Every row gets the cheapest
+    of the None/Sub/Up filters (the libpng heuristic), and compressed data
+    goes out as IDAT chunks as soon as zlib produces it.
+    """
+
+    def __init__(self, path, width, height, dpi=None):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._previous = np.zeros((1, width * 4), dtype=np.uint8)
+        self._compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        self._file = open(path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+        if dpi:
+            pixels_per_meter = int(round(dpi / 0.0254))
+            self._chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack('>I', len(data)) + kind + data)
+        self._file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def write(self, band):
+        """Append an (rows, width, 4) uint8 band."""
+        for start in range(0, len(band), STRIP_ROWS):
+            rows = band[start:start + STRIP_ROWS].reshape(-1, self.width * 4)
+            above = np.concatenate([self._previous, rows[:-1]])
+            candidates = np.stack([
+                rows,
+                rows - np.pad(rows, ((0, 0), (4, 0)))[:, :-4],  # Sub
+                rows - above,  # Up
+            ])
+            # Smallest sum of absolute signed bytes compresses best
+            cost = np.abs(candidates.view(np.int8).astype(np.int16)).sum(axis=2)
+            choice = cost.argmin(axis=0)
+            filtered = candidates[choice, np.arange(len(rows))]
+            data = np.column_stack([choice.astype(np.uint8), filtered])
+            compressed = self._compressor.compress(data.tobytes())
+            if compressed:
+                self._chunk(b'IDAT', compressed)
+            self._previous = rows[-1:]
+            self.rows_written += len(rows)
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}")
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+        self._file.close()
+
+class TiffBandWriter:
+    """
+    Writes an RGBA baseline TIFF as deflate-compressed strips of
+    STRIP_ROWS rows with horizontal differencing (Predictor 2). The IFD
+    goes after the strips, so nothing has to be known up front.
+    """
+
+    def __init__(self, path, width, height, dpi=None):
+        self.width = width
+        self.height = height
+        self.dpi = dpi or 72
+        self.rows_written = 0
+        self._pending = np.empty((0, width, 4), dtype=np.uint8)
+        self._offsets = []
+        self._byte_counts = []
+        self._file = open(path, 'wb')
+        self._file.write(b'II*\x00\x00\x00\x00\x00')  # IFD offset patched in close()
+
+    def _write_strip(self, rows):
+        differenced = rows.copy()
+        differenced[:, 1:] -= rows[:, :-1]
+        data = zlib.compress(differenced.tobytes(), COMPRESSION_LEVEL)
+        self._offsets.append(self._file.tell())
+        self._byte_counts.append(len(data))
+        self._file.write(data)
+        self.rows_written += len(rows)
+
+    def write(self, band):
+        """Append an (rows, width, 4) uint8 band."""
+        if len(self._pending):
+            band = np.concatenate([self._pending, band])
+        full = len(band) - len(band) % STRIP_ROWS
+        for start in range(0, full, STRIP_ROWS):
+            self._write_strip(band[start:start + STRIP_ROWS])
+        self._pending = band[full:].copy()
+
+    def close(self):
+        if len(self._pending):
+            self._write_strip(self._pending)
+        if self.rows_written != self.height:
+            raise ValueError(f"TIFF expects {self.height} rows, got {self.rows_written}")
+        if self._file.tell() % 2:
+            self._file.write(b'\x00')
+
+        strips = len(self._offsets)
+        entries = [  # (tag, type, count, value or data); types: 3 SHORT, 4 LONG, 5 RATIONAL
+            (256, 4, 1, self.width),
+            (257, 4, 1, self.height),
+            (258, 3, 4, struct.pack('<4H', 8, 8, 8, 8)),
+            (259, 3, 1, 8),  # Adobe deflate
+            (262, 3, 1, 2),  # RGB
+            (273, 4, strips, struct.pack(f'<{strips}I', *self._offsets)),
+            (277, 3, 1, 4),
+            (278, 4, 1, STRIP_ROWS),
+            (279, 4, strips, struct.pack(f'<{strips}I', *self._byte_counts)),
+            (282, 5, 1, struct.pack('<II', int(round(self.dpi * 100)), 100)),
+            (283, 5, 1, struct.pack('<II', int(round(self.dpi * 100)), 100)),
+            (284, 3, 1, 1),  # chunky pixels
+            (296, 3, 1, 2),  # resolution in inches
+            (317, 3, 1, 2),  # horizontal differencing
+            (338, 3, 1, 2),  # unassociated alpha
+        ]
+        ifd_offset = self._file.tell()
+        data_offset = ifd_offset + 2 + 12 * len(entries) + 4
+        ifd = struct.pack('<H', len(entries))
+        extra = b''
+        for tag, kind, count, value in entries:
+            if isinstance(value, bytes):
+                if len(value) <= 4:
+                    ifd += struct.pack('<HHI', tag, kind, count) + value.ljust(4, b'\x00')
+                    continue
+                ifd += struct.pack('<HHII', tag, kind, count, data_offset + len(extra))
+                extra += value + b'\x00' * (len(value) % 2)
+            elif kind == 3:
+                ifd += struct.pack('<HHIHH', tag, kind, count, value, 0)
+            else:
+                ifd += struct.pack('<HHII', tag, kind, count, value)
+        self._file.write(ifd + struct.pack('<I', 0) + extra)
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', ifd_offset))
+        self._file.close()
+
+BAND_WRITERS = {'.png': PngBandWriter, '.tif': TiffBandWriter, '.tiff': TiffBandWriter}
+
+def open_band_writer(path, width, height, dpi=None):
+    """The band writer for path's extension (.png, .tif or .tiff)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in BAND_WRITERS:
+        raise ValueError(f"Tiled output supports {', '.join(BAND_WRITERS)}, not {extension}")
+    return BAND_WRITERS[extension](path, width, height, dpi)
+
+class _ShiftedAgg:
+    """
+    Wraps the C++ Agg renderer of a band so every drawing call lands bottom
+    pixels lower (display coordinates count up from the bottom, text image
+    positions down from the top, where the band starts top pixels in).
+    """
+
+    def __init__(self, renderer, bottom, top):
+        self._renderer = renderer
+        self._bottom = bottom
+        self._top = top
+        self._shift = Affine2D().translate(0, -bottom)
+
+    def __getattr__(self, name):
+        return getattr(self._renderer, name)
+
+    def _shift_gc(self, gc):
+        """A copy of gc with its clip rectangle and clip path moved into the band."""
+        shifted = GraphicsContextBase()
+        shifted.copy_properties(gc)
+        clip_box = gc.get_clip_rectangle()
+        if clip_box is not None:
+            shifted.set_clip_rectangle(clip_box.frozen().translated(0, -self._bottom))
+        clip_path, clip_transform = gc.get_clip_path()
+        if clip_path is not None:
+            shifted.set_clip_path(TransformedPath(clip_path, clip_transform + self._shift))
+        return shifted
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        self._renderer.draw_path(self._shift_gc(gc), path, transform + self._shift, rgbFace)
+
+    def draw_markers(self, gc, marker_path, marker_trans, path, trans, rgbFace=None):
+        self._renderer.draw_markers(self._shift_gc(gc), marker_path, marker_trans, path, trans + self._shift,
+                                    rgbFace)
+
+    def draw_path_collection(self, gc, master_transform, *args):
+        self._renderer.draw_path_collection(self._shift_gc(gc), master_transform + self._shift, *args)
+
+    def draw_quad_mesh(self, gc, master_transform, *args):
+        self._renderer.draw_quad_mesh(self._shift_gc(gc), master_transform + self._shift, *args)
+
+    def draw_gouraud_triangles(self, gc, triangles, colors, transform):
+        self._renderer.draw_gouraud_triangles(self._shift_gc(gc), triangles, colors, transform + self._shift)
+
+    def draw_image(self, gc, x, y, image):
+        self._renderer.draw_image(self._shift_gc(gc), x, y - self._bottom, image)
+
+    def draw_text_image(self, image, x, y, angle, gc):
+        self._renderer.draw_text_image(image, x, y - self._top, angle, self._shift_gc(gc))
+
+class BandRenderer(RendererAgg):
+    """
+    Agg renderer for the rows [bottom, bottom + rows) of a canvas height
+    pixels tall (counted from the bottom, like display coordinates).
+    Artists lay themselves out on the full canvas and every call reaching
+    Agg is shifted by whole pixels, so the band holds exactly that window
+    of a full-canvas render, away from its edges (see save_tiled()).
+    """
+
+    def __init__(self, width, height, bottom, rows, dpi):
+        super().__init__(width, rows, dpi)
+        self.canvas_height = height
+        self._renderer = _ShiftedAgg(self._renderer, bottom, height - bottom - rows)
+        self._update_methods()
+
+    def get_canvas_width_height(self):
+        return self.width, self.canvas_height
+
+    def buffer_rgba(self):
+        return memoryview(self._renderer._renderer)
+
+def _path_extents(paths, transform):
+    """
+    (ymin, ymax) arrays over the display-space vertices of every path, and
+    (low, high) arrays with the display y range of every slanted segment.
+    """
+    if not paths:
+        return np.empty(0), np.empty(0), (np.empty(0), np.empty(0))
+    counts = np.fromiter((len(path.vertices) for path in paths), dtype=np.int64, count=len(paths))
+    if not counts.sum():
+        return np.full(len(paths), np.inf), np.full(len(paths), -np.inf), (np.empty(0), np.empty(0))
+    xy = transform.transform(np.concatenate([path.vertices for path in paths]))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    empty = counts == 0
+    clipped_starts = starts.clip(max=len(xy) - 1)
+    ymin = np.where(empty, np.inf, np.minimum.reduceat(xy[:, 1], clipped_starts))
+    ymax = np.where(empty, -np.inf, np.maximum.reduceat(xy[:, 1], clipped_starts))
+
+    # Segments run between consecutive vertices of a path, except into a MOVETO
+    segment = np.ones(len(xy), dtype=bool)
+    segment[starts[~empty]] = False
+    moves = [start + np.flatnonzero(path.codes == Path.MOVETO)
+             for start, path in zip(starts.tolist(), paths) if path.codes is not None]
+    if moves:
+        segment[np.concatenate(moves)] = False
+    ends = np.flatnonzero(segment[1:]) + 1
+    y0, y1 = xy[ends - 1, 1], xy[ends, 1]
+    slanted = (xy[ends - 1, 0] != xy[ends, 0]) & (y0 != y1)
+    return ymin, ymax, (np.minimum(y0, y1)[slanted], np.maximum(y0, y1)[slanted])
+
+def _get_overlap(segments, edge, limit):
+    """
+    Rows a band must extend past its edge at display y edge so that no
+    slanted segment Agg clips there reaches back over the edge: the
+    height of the tallest segment crossing it, at most limit.
+    """
+    tallest = 0.0
+    for low, high in segments:
+        crossing = (low < edge) & (high > edge)
+        tallest = max(tallest, float(np.max(high[crossing] - low[crossing], initial=0)))
+    return min(limit, int(np.ceil(tallest)))
+
+def _can_cull(collection):
+    """Whether dropping paths from collection leaves the others' styles unchanged (one style for all)."""
+    return all(len(values) <= 1 for values in (collection.get_facecolor(), collection.get_edgecolor(),
+                                                collection.get_linewidth(), collection.get_offsets()))
+
+def get_band_rows(width, band_bytes=BAND_BUFFER_BYTES, multiple=1):
+    """Rows per band so one RGBA band fits in band_bytes, rounded to multiple."""
+    rows = max(multiple, band_bytes // (width * 4))
+    return rows - rows % multiple
+
+def save_tiled(fig, ax, collections, output_file, dpi, facecolor, band_bytes=BAND_BUFFER_BYTES,
+               preview_width=None):
+    """
+    Rasterize fig band by band into output_file (.png, .tif or .tiff),
+    pixel for pixel the same as fig.savefig() at dpi. collections are the
+    data-space collections on ax; those with one style for all their paths
+    are cut down to the paths near each band. Everything else (text, fades)
+    is drawn in every band and should be axis-aligned or text, as Agg
+    rounds slanted edges it clips at a band's edge differently.
+    The figure is restored afterwards, so it can be recolored and saved
+    again. With preview_width, also returns a copy of the poster reduced
+    by a whole factor to no less than that width (for thumbnails), else
+    None.
+    """
+    original_dpi = fig.get_dpi()
+    original_facecolor = fig.get_facecolor()
+    original_paths = [collection.get_paths() for collection in collections]
+
+    fig.set_dpi(dpi)
+    fig.set_facecolor(facecolor)
+    width, height = (int(size) for size in fig.bbox.size)  # the canvas size savefig() uses
+    ax.apply_aspect()
+    to_display = ax.transData.frozen()
+    extents = [_path_extents(paths, to_display) for paths in original_paths]
+    # Strokes reach half a line width past a path, miter joins up to twice that
+    stroke_margin = 2 + max([np.max(collection.get_linewidth(), initial=0) for collection in collections],
+                            default=0) * 2 * dpi / 72
+
+    reduce_factor = max(1, width // preview_width) if preview_width else None
+    band_rows = get_band_rows(width, band_bytes, multiple=reduce_factor or 1)
+    segments = [segments for _, _, segments in extents]
+    preview_bands = []
+
+    writer = open_band_writer(output_file, width, height, dpi)
+    try:
+        for top in range(0, height, band_rows):
+            rows = min(band_rows, height - top)
+            bottom_px = height - top - rows  # band spans [bottom_px, bottom_px + rows) from the bottom
+            # A slanted edge Agg clips at the buffer's edge rasterizes a little
+            # differently along its whole length, so render extra rows past
+            # each band edge until no clipped segment reaches the band
+            low, high = bottom_px, bottom_px + rows
+            if low > 0:
+                low = max(0, low - _get_overlap(segments, low, band_rows) - int(np.ceil(stroke_margin)))
+            if high < height:
+                high = min(height, high + _get_overlap(segments, high, band_rows) + int(np.ceil(stroke_margin)))
+
+            for collection, paths, (ymin, ymax, _) in zip(collections, original_paths, extents):
+                if _can_cull(collection):
+                    visible = np.flatnonzero((ymax >= low - stroke_margin) & (ymin <= high + stroke_margin))
+                    Collection.set_paths(collection, [paths[i] for i in visible])
+
+            renderer = BandRenderer(width, height, low, high - low, dpi)
+            fig.draw(renderer)
+            band = np.asarray(renderer.buffer_rgba())[high - bottom_px - rows:high - bottom_px]
+            writer.write(band)
+            if reduce_factor:
+                preview_bands.append(Image.fromarray(band).reduce(reduce_factor))
+            del renderer, band
+        writer.close()
+    finally:
+        for collection, paths in zip(collections, original_paths):
+            Collection.set_paths(collection, paths)
+        fig.set_dpi(original_dpi)
+        fig.set_facecolor(original_facecolor)
+
+    if not preview_bands:
+        return None
+    preview = Image.new('RGBA', (preview_bands[0].width, sum(band.height for band in preview_bands)))
+    y = 0
+    for band in preview_bands:
+        preview.paste(band, (0, y))
+        y += band.height
+    return preview